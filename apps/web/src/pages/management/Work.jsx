@@ -20,6 +20,8 @@ import AdminNoticeManager from '../../components/management/AdminNoticeManager';
 
 // Use dynamic hostname for OCR backend
 const API_BASE = `http://${window.location.hostname}:8000`;
+// Pending marksheets fetched per page (lowest confidence first)
+const PENDING_PAGE_SIZE = 50;
 
 const Work = () => {
     // Get user from localStorage to check role
@@ -48,6 +50,8 @@ const Work = () => {
     // MODERATOR and others continue with marksheet verification below
     const [activeTab, setActiveTab] = useState('pending'); // 'pending' | 'history'
     const [pendingMarksheets, setPendingMarksheets] = useState([]);
+    const [pendingCursor, setPendingCursor] = useState(null); // query string of the next page, null on the last
+    const [loadingMore, setLoadingMore] = useState(false);
     const [verifiedMarksheets, setVerifiedMarksheets] = useState([]);
     const [loading, setLoading] = useState(true);
     const [selectedMarksheet, setSelectedMarksheet] = useState(null);
@@ -56,13 +60,22 @@ const Work = () => {
     const [actionLoading, setActionLoading] = useState(false);
 
 
-    // Fetch pending marksheets
+    // Fetch one page of pending marksheets; cursor is the query string from the previous page
+    const fetchPendingPage = async (cursor = '') => {
+        const res = await fetch(`${API_BASE}/api/admin/marksheets/pending?order=confidence&limit=${PENDING_PAGE_SIZE}${cursor}`);
+        const data = await res.json();
+        const hasMore = data.next_after_id !== null && data.next_after_id !== undefined;
+        setPendingCursor(hasMore
+            ? `&after_id=${data.next_after_id}&after_confidence=${encodeURIComponent(data.next_after_confidence)}`
+            : null);
+        return data.pending_marksheets || [];
+    };
+
+    // Fetch the first page of pending marksheets
     const fetchPendingMarksheets = async () => {
         setLoading(true);
         try {
-            const res = await fetch(`${API_BASE}/api/admin/marksheets/pending`);
-            const data = await res.json();
-            setPendingMarksheets(data.pending_marksheets || []);
+            setPendingMarksheets(await fetchPendingPage());
         } catch (error) {
             console.error('Error fetching pending marksheets:', error);
         } finally {
@@ -70,6 +83,23 @@ const Work = () => {
         }
     };
 
+    // Append the next page when the moderator asks for it
+    const loadMorePending = async () => {
+        if (!pendingCursor) return;
+        setLoadingMore(true);
+        try {
+            const page = await fetchPendingPage(pendingCursor);
+            setPendingMarksheets(prev => {
+                const seen = new Set(prev.map(m => m.upload_id));
+                return [...prev, ...page.filter(m => !seen.has(m.upload_id))];
+            });
+        } catch (error) {
+            console.error('Error fetching more pending marksheets:', error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     // Fetch verification history
     const fetchHistory = async () => {
         try {
@@ -192,7 +222,7 @@ const Work = () => {
                     Pending Queue
                     {pendingMarksheets.length > 0 && (
                         <span className="ml-1 px-2 py-0.5 bg-white/20 rounded-full text-sm">
-                            {pendingMarksheets.length}
+                            {pendingMarksheets.length}{pendingCursor ? '+' : ''}
                         </span>
                     )}
                 </button>
@@ -254,6 +284,11 @@ const Work = () => {
                                                 <Calendar size={12} />
                                                 {formatDate(ms.uploaded_at)}
                                             </span>
+                                            {ms.confidence !== undefined && ms.confidence !== null && (
+                                                <span className={`px-2 py-1 text-xs font-medium rounded-lg ${ms.confidence < 0.6 ? 'bg-amber-100 text-amber-700' : 'bg-green-50 text-green-600'}`}>
+                                                    Confidence {Math.round(ms.confidence * 100)}%
+                                                </span>
+                                            )}
                                         </div>
                                         {/* Student Request Message */}
                                         {ms.admin_comment && ms.admin_comment.includes('[STUDENT REQUEST:') && (
@@ -274,6 +309,18 @@ const Work = () => {
                             </div>
                         ))
                     )}
+                    {!loading && pendingCursor && (
+                        <div className="text-center pt-2">
+                            <button
+                                onClick={loadMorePending}
+                                disabled={loadingMore}
+                                className="inline-flex items-center gap-2 px-5 py-2.5 bg-white hover:bg-slate-50 text-slate-700 font-medium rounded-xl border border-slate-200 transition-colors disabled:opacity-50"
+                            >
+                                {loadingMore && <RefreshCw className="animate-spin" size={16} />}
+                                {loadingMore ? 'Loading...' : 'Load more'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             )}
 
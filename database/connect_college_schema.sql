@@ -336,6 +336,7 @@ CREATE TABLE marksheet_uploads (
     academic_year VARCHAR(10),
     image_url TEXT NOT NULL,
     raw_json_data JSON,
+    confidence DECIMAL(3,2) NOT NULL DEFAULT 0.00, -- lowest extracted_marks.confidence_score
     status ENUM('PROCESSING', 'VERIFICATION_PENDING', 'APPROVED', 'REJECTED') DEFAULT 'PROCESSING',
     uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     verified_at DATETIME,
@@ -346,9 +347,17 @@ CREATE TABLE marksheet_uploads (
     INDEX idx_user_id (user_id),
     INDEX idx_status (status),
     INDEX idx_semester (semester),
-    INDEX idx_board_type (board_type)
+    INDEX idx_board_type (board_type),
+    INDEX idx_status_confidence (status, confidence, upload_id)
 ) ENGINE=InnoDB;
 
+-- Existing databases:
+--   ALTER TABLE marksheet_uploads
+--       ADD COLUMN confidence DECIMAL(3,2) NOT NULL DEFAULT 0.00 AFTER raw_json_data,
+--       ADD INDEX idx_status_confidence (status, confidence, upload_id);
+--   UPDATE marksheet_uploads mu SET confidence = COALESCE(
+--       (SELECT MIN(em.confidence_score) FROM extracted_marks em WHERE em.upload_id = mu.upload_id), 0);
+
 -- Extracted Marks (AI-generated data - supports all board formats)
 CREATE TABLE extracted_marks (
     mark_id BIGINT AUTO_INCREMENT PRIMARY KEY,
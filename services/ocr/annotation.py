@@ -0,0 +1,195 @@
+"""
+Annotated marksheet images, rendered on demand.
+
+The pipeline keeps the detections it already made (logo, face and table boxes
+plus the board and validity flags) as a small JSON-safe record instead of
+drawing them for every upload. GET /process/{job_id}/annotated renders that
+record onto the stored display copy of the upload; no model runs again.
+
+Rendered JPEGs are cached in ANNOTATED_DIR and files older than
+ANNOTATED_TTL_SECONDS are swept away on later renders.
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+ANNOTATED_DIR = Path(os.getenv("OCR_ANNOTATED_DIR", "annotated"))
+ANNOTATED_TTL_SECONDS = int(os.getenv("OCR_ANNOTATED_TTL_SECONDS", "3600"))
+# Minimum gap between two sweeps of the cache directory
+SWEEP_INTERVAL_SECONDS = 60
+
+COLORS = {
+    'logo': (0, 255, 0),      # Green
+    'face': (255, 0, 0),      # Blue
+    'table': (0, 0, 255),     # Red
+    'text': (255, 255, 255)   # White
+}
+
+
+def ensure_portrait(image):
+    """Rotate counter-clockwise when wider than tall, as the detection stages do"""
+    height, width = image.shape[:2]
+    if width > height:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def annotation_record(results):
+    """
+    Detections of one process_single_marksheet() result needed to draw it later.
+
+    Returns:
+        dict: {"board_id", "board_name", "photo_detected", "logo_boxes",
+               "face_boxes", "tables": [[box, label, confidence], ...]}
+        Boxes are in full-resolution portrait coordinates.
+    """
+    logo = results.get("logo_detection", {})
+    face = results.get("face_detection", {})
+    tables = []
+    for table in results.get("table_detection", {}).get("table_coordinates", []):
+        coords = table["coordinates"]
+        label = 0 if table["table_type"] == "Information Table" else 1
+        tables.append([[coords["x1"], coords["y1"], coords["x2"], coords["y2"]], label, table["confidence"]])
+    return {
+        "board_id": logo.get("board_id", -1),
+        "board_name": logo.get("board_name"),
+        "photo_detected": face.get("photo_detected", 0),
+        "logo_boxes": [logo["box"]] if logo.get("box") is not None else [],
+        "face_boxes": face.get("boxes", []),
+        "tables": tables,
+    }
+
+
+def draw_annotations(image, logo_result, photo_detected, table_result, board_name=None,
+                     logo_boxes=(), face_boxes=(), table_data=()):
+    """
+    Draw detection boxes and the overall status onto a portrait BGR image in place.
+
+    Args:
+        image: Portrait-oriented BGR image at the resolution the boxes refer to
+        logo_result: Board class from logo detection (-1 when no logo)
+        photo_detected: 1 when a candidate photo was found
+        table_result: 1 when tables were found
+        board_name: Detected board name (ICSE may not contain a photo)
+        logo_boxes, face_boxes: [x1, y1, x2, y2] boxes
+        table_data: [(box, label, confidence), ...]
+    """
+    if logo_result != -1:
+        logger.info(f"Found {len(logo_boxes)} logo boxes")
+        for box in logo_boxes:
+            x1, y1, x2, y2 = box
+            cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), COLORS['logo'], 4)
+            cv2.putText(image, "LOGO", (int(x1), int(y1)-15),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, COLORS['logo'], 3)
+
+    if photo_detected == 1:
+        logger.info(f"Found {len(face_boxes)} faces")
+        for box in face_boxes:
+            x1, y1, x2, y2 = (int(v) for v in box)
+            cv2.rectangle(image, (x1, y1), (x2, y2), COLORS['face'], 4)
+            cv2.putText(image, "FACE", (x1, y1-15),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, COLORS['face'], 3)
+
+    if table_result == 1:
+        logger.info(f"Found {len(table_data)} table boxes")
+        for box, label, confidence in table_data:
+            x1, y1, x2, y2 = box
+            table_type = "INFO_TABLE" if label == 0 else "MARKS_TABLE"
+            # Draw thicker rectangle for better visibility
+            cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), COLORS['table'], 4)
+            # Draw label with confidence score
+            label_text = f"{table_type} ({confidence:.2f})"
+            cv2.putText(image, label_text, (int(x1), int(y1)-15),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, COLORS['table'], 3)
+
+    # Add overall status text (ICSE may not contain a photo on some marksheets)
+    is_icse = (str(board_name).upper() == "ICSE") if board_name else False
+    is_valid = (logo_result != -1 and table_result == 1 and (photo_detected == 1 or is_icse))
+    overall_status = "VALID MARKSHEET" if is_valid else "INVALID MARKSHEET"
+    status_color = (0, 255, 0) if overall_status == "VALID MARKSHEET" else (0, 0, 255)
+
+    cv2.putText(image, f"Status: {overall_status}", (10, 40),
+               cv2.FONT_HERSHEY_SIMPLEX, 1.5, status_color, 4)
+    return image
+
+
+def render_record(image_path, record, output_path):
+    """Draw an annotation_record() onto the image at image_path and write it to output_path"""
+    image = cv2.imread(str(image_path))
+    if image is None:
+        raise FileNotFoundError(f"Failed to read image: {image_path}")
+    image = ensure_portrait(image)
+    tables = record.get("tables", [])
+    draw_annotations(
+        image,
+        record.get("board_id", -1),
+        record.get("photo_detected", 0),
+        1 if tables else 0,
+        record.get("board_name"),
+        logo_boxes=record.get("logo_boxes", []),
+        face_boxes=record.get("face_boxes", []),
+        table_data=tables,
+    )
+    if not cv2.imwrite(str(output_path), image):
+        raise ValueError(f"Could not write {output_path}")
+    return output_path
+
+
+class AnnotationCache:
+    """Rendered annotated images on disk, keyed by job (and page), with TTL cleanup"""
+
+    def __init__(self, directory=ANNOTATED_DIR, ttl_seconds=ANNOTATED_TTL_SECONDS):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def path_for(self, key):
+        return self.directory / f"{key}_annotated.jpg"
+
+    def get_or_render(self, key, image_path, record):
+        """Path of the cached rendering for key, drawing it from record first if needed"""
+        self.sweep()
+        path = self.path_for(key)
+        if path.exists():
+            return path
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Render under a private name so concurrent requests never serve a partial file
+        tmp_path = self.directory / f"{key}_{threading.get_ident()}.tmp.jpg"
+        started = time.perf_counter()
+        try:
+            render_record(image_path, record, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        logger.info(f"Rendered annotated image {path} in {time.perf_counter() - started:.2f}s")
+        return path
+
+    def sweep(self, force=False):
+        """Delete renderings older than the TTL; returns the number removed"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+                return 0
+            self._last_sweep = now
+        if not self.directory.exists():
+            return 0
+        removed = 0
+        for path in self.directory.glob("*.jpg"):
+            try:
+                if now - path.stat().st_mtime > self.ttl_seconds:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info(f"Removed {removed} expired annotated images")
+        return removed
@@ -0,0 +1,357 @@
+"""
+Parallel directory batch mode for MarksheetProcessor.
+
+Images are split into small chunks and spread over a process pool. Each worker
+process loads the logo and table models once; per chunk it runs the logo and
+table detectors as batched CPU inference across all images of the chunk, then
+finishes every image (preprocessing, face, OCR, extraction) with those
+detections. Remote OCR calls from all workers share one bounded in-flight
+window. Every finished image is appended to a JSONL manifest in the output
+directory, so an interrupted run picks up where it stopped.
+
+    python batch.py --dir ./scans --output ./results --workers 4
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from scripts.metrics import STAGES
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+MANIFEST_NAME = "batch_manifest.jsonl"
+
+CPU_COUNT = os.cpu_count() or 1
+BATCH_WORKERS = max(1, int(os.getenv("OCR_BATCH_WORKERS", str(min(4, CPU_COUNT)))))
+BATCH_SIZE = max(1, int(os.getenv("OCR_BATCH_SIZE", "4")))
+BATCH_MAX_INFLIGHT_OCR = max(1, int(os.getenv("OCR_BATCH_MAX_INFLIGHT", "8")))
+START_METHOD = os.getenv("OCR_POOL_START_METHOD", "spawn")
+
+
+# =====================================================
+# Worker process side
+# =====================================================
+
+_processor = None
+_init_error = None
+
+
+def _limit_threads(threads):
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except Exception:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+
+
+def _init_batch_worker(logo_model_path, table_model_path, batched_logo, threads_per_worker, ocr_slots):
+    """Pool initializer: limit threads, share the OCR window and load the models once"""
+    global _processor, _init_error
+    _limit_threads(threads_per_worker)
+    try:
+        from scripts.ocr_client import set_inflight_limit
+        set_inflight_limit(ocr_slots)
+        from pipeline import MarksheetProcessor
+        _processor = MarksheetProcessor(logo_model_path, table_model_path, preload=True, batched_logo=batched_logo)
+        logger.info(f"Batch worker {os.getpid()} ready ({threads_per_worker} threads)")
+    except Exception as e:
+        _init_error = str(e)
+        logger.error(f"Batch worker {os.getpid()} failed to initialize: {e}")
+
+
+def _error_result(image_path, error):
+    return {"input_image": str(image_path), "overall_status": "error", "error": str(error), "timings": {}}
+
+
+def process_chunk(processor, image_paths, output_dir=None, save_intermediate=False):
+    """
+    Run one chunk of images through the pipeline with batched detection.
+
+    Args:
+        processor: MarksheetProcessor whose models are used
+        image_paths: Image paths of this chunk
+        output_dir: Directory for annotated images and debug artifacts
+        save_intermediate: Passed through to process_single_marksheet
+
+    Returns:
+        list: One result dict per image, in input order
+    """
+    from scripts.image_context import ImageContext
+    from scripts.detectLogo import detect_logo_detections_many
+    from scripts.predict_table import detect_tables_with_boxes_and_scores_many
+
+    results = {}
+    contexts = []
+    for image_path in image_paths:
+        try:
+            contexts.append((image_path, ImageContext.from_path(image_path)))
+        except Exception as e:
+            logger.info(f"Error reading {image_path}: {e}")
+            results[image_path] = _error_result(image_path, e)
+
+    # Batched detection; on failure every image falls back to its own inference
+    precomputed = [{"timings": {}} for _ in contexts]
+    if contexts:
+        try:
+            started = time.perf_counter()
+            logos = detect_logo_detections_many(
+                [ctx.proxy_portrait_gray for _, ctx in contexts],
+                processor.logo_model_path,
+                batched=processor.batched_logo,
+                scales=[ctx.proxy_scale for _, ctx in contexts]
+            )
+            logo_seconds = (time.perf_counter() - started) / len(contexts)
+            for item, logo in zip(precomputed, logos):
+                item["logo"] = logo
+                item["timings"]["logo"] = round(logo_seconds, 4)
+        except Exception as e:
+            logger.warning(f"Batched logo detection failed, falling back per image: {e}")
+        try:
+            started = time.perf_counter()
+            tables = detect_tables_with_boxes_and_scores_many(
+                [ctx.proxy_rgb_pil for _, ctx in contexts],
+                processor.table_model_path,
+                confidence_threshold=0.5,
+                info_threshold=0.5,
+                marks_threshold=0.8,
+                scales=[ctx.proxy_scale for _, ctx in contexts]
+            )
+            table_seconds = (time.perf_counter() - started) / len(contexts)
+            for item, table_data in zip(precomputed, tables):
+                item["tables"] = table_data
+                item["timings"]["table"] = round(table_seconds, 4)
+        except Exception as e:
+            logger.warning(f"Batched table detection failed, falling back per image: {e}")
+
+    for (image_path, ctx), item in zip(contexts, precomputed):
+        try:
+            results[image_path] = processor.process_single_marksheet(
+                image_path, output_dir, save_intermediate, ctx=ctx, precomputed=item
+            )
+        except Exception as e:
+            logger.info(f"Error processing {image_path}: {e}")
+            results[image_path] = _error_result(image_path, e)
+
+    return [results[image_path] for image_path in image_paths]
+
+
+def _run_chunk_in_worker(image_paths, output_dir, save_intermediate):
+    if _processor is None:
+        return [_error_result(p, f"Batch worker not initialized: {_init_error}") for p in image_paths]
+    return process_chunk(_processor, image_paths, output_dir, save_intermediate)
+
+
+# =====================================================
+# Manifest and reporting
+# =====================================================
+
+def load_manifest(manifest_path):
+    """Image names already finished (not errored) according to the manifest"""
+    done = set()
+    if not manifest_path.exists():
+        return done
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line
+                continue
+            if entry.get("status") != "error":
+                done.add(entry.get("image"))
+    return done
+
+
+def _manifest_entry(result):
+    return {
+        "image": Path(result.get("input_image", "")).name,
+        "status": result.get("overall_status"),
+        "board": result.get("logo_detection", {}).get("board_name"),
+        "final_json": result.get("extraction", {}).get("final_json"),
+        "error": result.get("error"),
+        "timings": result.get("timings", {}),
+        "finished_at": datetime.datetime.now().isoformat(),
+    }
+
+
+def stage_throughput(results, wall_seconds):
+    """
+    Aggregate per-stage timings of a batch run.
+
+    Returns:
+        dict: {stage: {"images", "total_seconds", "mean_seconds", "images_per_second"}},
+        plus "overall" with the wall-clock rate of the whole run
+    """
+    report = {}
+    stages = list(STAGES) + sorted({s for r in results for s in r.get("timings", {})} - set(STAGES))
+    for stage in stages:
+        samples = [r["timings"][stage] for r in results if stage in r.get("timings", {})]
+        if not samples:
+            continue
+        total = sum(samples)
+        report[stage] = {
+            "images": len(samples),
+            "total_seconds": round(total, 3),
+            "mean_seconds": round(total / len(samples), 4),
+            # Per worker: how many images one process gets through this stage per second
+            "images_per_second": round(len(samples) / total, 3) if total > 0 else None,
+        }
+    report["overall"] = {
+        "images": len(results),
+        "wall_seconds": round(wall_seconds, 3),
+        "images_per_second": round(len(results) / wall_seconds, 3) if wall_seconds > 0 else None,
+    }
+    return report
+
+
+def print_throughput_report(report):
+    logger.info(f"\n{'='*60}")
+    logger.info("STAGE THROUGHPUT")
+    logger.info(f"{'='*60}")
+    logger.info(f"{'stage':<12}{'images':>8}{'total s':>10}{'mean ms':>10}{'img/s':>9}")
+    for stage, row in report.items():
+        if stage == "overall":
+            continue
+        rate = f"{row['images_per_second']:.2f}" if row["images_per_second"] else "-"
+        logger.info(f"{stage:<12}{row['images']:>8}{row['total_seconds']:>10.1f}{row['mean_seconds']*1000:>10.0f}{rate:>9}")
+    overall = report["overall"]
+    rate = f"{overall['images_per_second']:.2f}" if overall["images_per_second"] else "-"
+    logger.info(f"Overall: {overall['images']} images in {overall['wall_seconds']:.1f}s ({rate} img/s)")
+
+
+# =====================================================
+# Driver
+# =====================================================
+
+def run_batch(processor, input_dir, output_dir=None, save_intermediate=False,
+              workers=None, batch_size=None, max_inflight_ocr=None, resume=True):
+    """
+    Process every image in input_dir in parallel.
+
+    Args:
+        processor: MarksheetProcessor (used in-process when workers == 1, and
+            for the model paths and logo mode otherwise)
+        input_dir: Directory containing input images
+        output_dir: Directory for results and the manifest (default: input_dir/results)
+        save_intermediate: Passed through to process_single_marksheet
+        workers: Worker processes (default OCR_BATCH_WORKERS)
+        batch_size: Images per batched detection call (default OCR_BATCH_SIZE)
+        max_inflight_ocr: Remote OCR jobs in flight across all workers (default OCR_BATCH_MAX_INFLIGHT)
+        resume: Skip images the manifest already records as finished
+
+    Returns:
+        tuple: (results of the images processed in this run, throughput report)
+    """
+    input_path = Path(input_dir)
+    output_path = Path(output_dir) if output_dir else input_path / "results"
+    output_path.mkdir(parents=True, exist_ok=True)
+    workers = workers or BATCH_WORKERS
+    batch_size = batch_size or BATCH_SIZE
+    max_inflight_ocr = max_inflight_ocr or BATCH_MAX_INFLIGHT_OCR
+
+    image_files = sorted(f for f in input_path.iterdir() if f.suffix.lower() in IMAGE_EXTENSIONS)
+    if not image_files:
+        logger.info(f"No images found in {input_dir}")
+        return [], stage_throughput([], 0.0)
+
+    manifest_path = output_path / MANIFEST_NAME
+    if resume:
+        done = load_manifest(manifest_path)
+    else:
+        done = set()
+        manifest_path.unlink(missing_ok=True)
+    todo = [str(f) for f in image_files if f.name not in done]
+    logger.info(f"Processing {len(todo)} marksheets ({len(image_files) - len(todo)} already in manifest) "
+                f"with {workers} workers, batch size {batch_size}")
+
+    chunks = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    all_results = []
+    started = time.perf_counter()
+
+    with open(manifest_path, 'a', encoding='utf-8') as manifest:
+        if manifest.tell() > 0 and not manifest_path.read_bytes().endswith(b"\n"):
+            manifest.write("\n")
+        def record(chunk_results):
+            for result in chunk_results:
+                all_results.append(result)
+                manifest.write(json.dumps(_manifest_entry(result), default=str) + "\n")
+            manifest.flush()
+            logger.info(f"Finished {len(all_results)}/{len(todo)}")
+
+        if workers == 1:
+            from scripts.ocr_client import set_inflight_limit
+            set_inflight_limit(threading.BoundedSemaphore(max_inflight_ocr))
+            for chunk in chunks:
+                record(process_chunk(processor, chunk, str(output_path), save_intermediate))
+        else:
+            mp_context = multiprocessing.get_context(START_METHOD)
+            ocr_slots = mp_context.BoundedSemaphore(max_inflight_ocr)
+            threads_per_worker = max(1, CPU_COUNT // workers)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp_context,
+                initializer=_init_batch_worker,
+                initargs=(processor.logo_model_path, processor.table_model_path,
+                          processor.batched_logo, threads_per_worker, ocr_slots),
+            ) as executor:
+                futures = {
+                    executor.submit(_run_chunk_in_worker, chunk, str(output_path), save_intermediate): chunk
+                    for chunk in chunks
+                }
+                for future in as_completed(futures):
+                    try:
+                        chunk_results = future.result()
+                    except Exception as e:
+                        logger.error(f"Batch chunk failed: {e}")
+                        chunk_results = [_error_result(p, e) for p in futures[future]]
+                    record(chunk_results)
+
+    report = stage_throughput(all_results, time.perf_counter() - started)
+    return all_results, report
+
+
+def main():
+    """Command-line interface for bulk runs"""
+    parser = argparse.ArgumentParser(description="Parallel marksheet batch processing")
+    parser.add_argument("--dir", type=str, required=True, help="Directory of marksheet images")
+    parser.add_argument("--output", type=str, help="Output directory for results and manifest")
+    parser.add_argument("--logo-model", type=str, default="models\\logo.pt", help="Path to logo detection model")
+    parser.add_argument("--table-model", type=str, default="models\\tt_finetuned", help="Path to table detection model")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=None, help="Images per batched detection call")
+    parser.add_argument("--max-inflight-ocr", type=int, default=None, help="Remote OCR jobs in flight across workers")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore and overwrite an existing manifest")
+    parser.add_argument("--save-intermediate", action="store_true", help="Save intermediate processing steps")
+    parser.add_argument("--batched-logo", action="store_true", default=None,
+                        help="Run all logo contrast variants as one batched inference")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from pipeline import MarksheetProcessor
+    processor = MarksheetProcessor(args.logo_model, args.table_model, batched_logo=args.batched_logo)
+    processor.process_batch(
+        args.dir, args.output, args.save_intermediate,
+        workers=args.workers, batch_size=args.batch_size,
+        max_inflight_ocr=args.max_inflight_ocr, resume=not args.no_resume
+    )
+
+
+if __name__ == "__main__":
+    main()
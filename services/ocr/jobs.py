@@ -0,0 +1,668 @@
+"""
+Background job queue for marksheet processing.
+
+Uploads are handed to a bounded process pool. Each worker process builds its
+own MarksheetProcessor (and therefore holds its own loaded models) once, and
+reports stage progress back over a queue. The API process keeps a small
+in-memory job table that the /process and /jobs endpoints read from, so the
+event loop never runs OpenCV/PyTorch work or blocking OCR calls itself.
+
+Workers are spawned and warmed right after startup (JobManager.warm_up) rather
+than on the first upload. Each one reports over the progress queue once its
+models are loaded, which is what /readyz waits for.
+
+A worker that dies (OOM kill, segfault) breaks the whole ProcessPoolExecutor.
+The manager then starts and warms a new pool: jobs that were on the broken
+one finish with 503 and a submit that hits it is rolled back and refused
+with PoolUnavailableError, so neither lingers in the queue.
+
+Workers return per-stage timings with every result and send their model load
+time over the progress queue; the API process records both in its /metrics
+histograms, since a worker's own registry is never scraped.
+
+Uploads arrive as content-addressed blobs (see storage.py) together with the
+name they were uploaded as. Workers never delete them; blobs and derived
+files are left to the retention sweeper, and the display copy for the UI is
+a hard link to the blob rather than a second copy.
+
+Workers do not draw annotated images. They return the detections instead
+(under "_annotation" in the content, removed before the result is stored) and
+the API renders them only when /process/{job_id}/annotated is requested.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from scripts.metrics import observe_stage, observe_timings, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing: bounded so that concurrent uploads queue instead of oversubscribing cores
+CPU_COUNT = os.cpu_count() or 1
+MAX_WORKERS = max(1, int(os.getenv("OCR_MAX_WORKERS", str(min(2, CPU_COUNT)))))
+MAX_QUEUED_JOBS = max(1, int(os.getenv("OCR_MAX_QUEUED_JOBS", "32")))
+JOB_TTL_SECONDS = int(os.getenv("OCR_JOB_TTL_SECONDS", "3600"))
+START_METHOD = os.getenv("OCR_POOL_START_METHOD", "spawn")
+
+# Fixed-format regions of the college marksheet (normalized cx, cy, w, h on the
+# alignment template, see scripts/template_align.py)
+COLLEGE_INFO_BOX = (0.395423, 0.163709, 0.653978, 0.128660)
+COLLEGE_MARKS_BOX = (0.492943, 0.472937, 0.849016, 0.492458)
+
+
+# Progress message stage sent once by every worker after its initializer ran
+WORKER_READY = "worker_ready"
+
+
+class QueueFullError(Exception):
+    """Raised when the number of unfinished jobs reaches MAX_QUEUED_JOBS"""
+
+
+class PoolUnavailableError(Exception):
+    """Raised when a worker died and the pool is being rebuilt"""
+
+
+class UnreadablePdfError(ValueError):
+    """Raised when the pages of a multi-page PDF cannot be counted"""
+
+
+# =====================================================
+# Worker process side
+# =====================================================
+
+_processor = None
+_init_error = None
+_progress_queue = None
+
+
+def _init_worker(progress_queue, logo_model_path, table_model_path, threads_per_worker):
+    """Pool initializer: limit per-process threads and load the models once per worker"""
+    global _processor, _init_error, _progress_queue
+    _progress_queue = progress_queue
+
+    try:
+        import cv2
+        cv2.setNumThreads(threads_per_worker)
+    except Exception:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except Exception:
+        pass
+
+    try:
+        started = time.perf_counter()
+        from pipeline import MarksheetProcessor
+        _report_timing("worker_import", time.perf_counter() - started)
+        started = time.perf_counter()
+        _processor = MarksheetProcessor(logo_model_path, table_model_path, preload=True)
+        _report_timing("model_load", time.perf_counter() - started)
+        logger.info(f"OCR worker {os.getpid()} ready ({threads_per_worker} threads)")
+    except Exception as e:
+        _init_error = str(e)
+        logger.error(f"OCR worker {os.getpid()} failed to initialize: {e}")
+
+    ocr_client = False
+    try:
+        from scripts import ocr
+        ocr_client = ocr.available()
+    except Exception as e:
+        logger.error(f"Failed to load OCR module: {e}")
+    if not ocr_client:
+        logger.warning(f"OCR worker {os.getpid()}: no OCR engine available (check the API key or OCR_ENGINE)")
+    _report_ready(ocr_client)
+
+
+def _report(job_id, stage):
+    if _progress_queue is None:
+        return
+    try:
+        _progress_queue.put_nowait((job_id, stage, time.time()))
+    except Exception:
+        pass
+
+
+def _report_ready(ocr_client):
+    if _progress_queue is None:
+        return
+    try:
+        _progress_queue.put_nowait((None, WORKER_READY, {
+            "pid": os.getpid(), "error": _init_error, "ocr_client": ocr_client, "at": time.time(),
+        }))
+    except Exception:
+        pass
+
+
+def _ping():
+    """No-op task; submitting one per worker makes the pool start them all"""
+    return os.getpid()
+
+
+def _report_timing(stage, seconds):
+    # Progress messages without a job id carry a timing for the API process histograms
+    if _progress_queue is None:
+        return
+    try:
+        _progress_queue.put_nowait((None, stage, seconds))
+    except Exception:
+        pass
+
+
+def _named_path(upload_path, upload_name, display_dir):
+    # Outputs are named after the upload, not after the blob's content hash
+    upload_path = Path(upload_path)
+    display_dir = Path(display_dir) if display_dir is not None else upload_path.parent
+    return display_dir / (upload_name or upload_path.name)
+
+
+def _process_image(job_id, image_path, display_filename, mode, expected_sem, timings, ctx=None, progress=None):
+    """
+    Run one decoded page through the college extractor or MarksheetProcessor.
+
+    Returns:
+        tuple: (http_status_code, response_content_dict)
+    """
+    from scripts.image_context import ImageContext
+    if ctx is None:
+        ctx = ImageContext.from_path(image_path)
+    if progress is None:
+        progress = lambda stage: _report(job_id, stage)
+
+    if mode == "college":
+        from scripts.college_extractor import process_fixed_format as college_process
+        from scripts.template_align import AlignmentError
+        progress("ocr")
+        try:
+            # Records "align" and "ocr" separately into timings
+            data = college_process(str(image_path), COLLEGE_INFO_BOX, COLLEGE_MARKS_BOX, ctx=ctx, timings=timings)
+        except AlignmentError as e:
+            # Rejected locally; nothing was sent to the OCR API
+            logger.info(f"College marksheet rejected: {e} {e.alignment}")
+            return 422, {"error": f"{e}. Please upload a flat, fully visible photo of the marksheet.",
+                         "alignment": e.alignment}
+
+        if expected_sem:
+            try:
+                extracted_sem = (data.get("college", {}) or {}).get("semester")
+                if extracted_sem and str(extracted_sem).strip().upper() != str(expected_sem).strip().upper():
+                    return 400, {"error": f"Uploaded marksheet belongs to Semester {extracted_sem}. Please upload Semester {expected_sem} marksheet."}
+            except Exception:
+                pass
+        return 200, {"board": "COLLEGE_FIXED", "data": data, "server_filename": display_filename}
+
+    if _processor is None:
+        logger.error(f"OCR processor not initialized. Error: {_init_error}")
+        return 500, {"detail": f"OCR processor not available. Init error: {_init_error}"}
+
+    result = _processor.process_single_marksheet(str(image_path), ctx=ctx, progress=progress, annotate=False)
+    timings.update(result.get("timings", {}))
+    annotation = result.get("annotation")
+    data = None
+    if 'extraction' in result:
+        data = result['extraction'].get('data')
+        if not data and result['extraction'].get('final_json'):
+            final_json_path = Path(result['extraction']['final_json'])
+            if final_json_path.exists():
+                with open(final_json_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+    board_name = result.get("logo_detection", {}).get("board_name", "")
+    if data is not None:
+        return 200, {
+            "board": board_name,
+            "data": data,
+            "server_filename": display_filename,
+            "_annotation": annotation
+        }
+    return 200, {
+        "server_filename": display_filename,
+        "board": board_name,
+        "data": {
+            "board": board_name,
+            "student_name": "OCR not available",
+            "subjects": [],
+            "note": "OCR extraction failed"
+        },
+        "_annotation": annotation
+    }
+
+
+def process_upload(job_id, upload_path, mode="school", expected_sem=None, upload_name=None, display_dir=None):
+    """
+    Worker entry point: run one stored upload through the pipeline.
+
+    Args:
+        job_id: Job identifier used for progress reports
+        upload_path: Path of the stored upload (image or PDF; only the first PDF page is used)
+        mode: "school" (MarksheetProcessor) or "college" (fixed-format extractor)
+        expected_sem: Semester the college marksheet must belong to (optional)
+        upload_name: Name the upload was stored under; names the display copy and outputs
+        display_dir: Directory served at /uploads (defaults to the upload's own directory)
+
+    Returns:
+        tuple: (http_status_code, response_content_dict, stage_timings_dict)
+    """
+    import cv2
+    from scripts.image_context import ImageContext
+    from storage import link_or_copy
+
+    _report(job_id, "started")
+    upload_path = Path(upload_path)
+    named_path = _named_path(upload_path, upload_name, display_dir)
+    timings = {}
+
+    if upload_path.suffix.lower() == ".pdf":
+        from scripts.pdf_pages import rasterize_page
+        _report(job_id, "pdf")
+        try:
+            with stage_timer("pdf", timings):
+                image, dpi = rasterize_page(upload_path, 0)  # First page
+        except Exception as e:
+            logger.error(f"Failed to convert PDF: {e}")
+            return 400, {"detail": f"PDF conversion failed: {str(e)}"}, timings
+        logger.info(f"PDF rasterized in memory: {upload_path.name} ({dpi} DPI)")
+        named_path = named_path.with_suffix(".jpg")
+
+    try:
+        # Persistent display copy for the UI, served from /uploads
+        display_filename = f"{named_path.stem}_display{named_path.suffix}"
+        display_path = named_path.parent / display_filename
+        if upload_path.suffix.lower() == ".pdf":
+            if not cv2.imwrite(str(display_path), image):
+                raise ValueError(f"Could not write {display_path}")
+            ctx = ImageContext(image, source=str(named_path))
+        else:
+            link_or_copy(upload_path, display_path)
+            ctx = ImageContext.from_path(upload_path)
+
+        status_code, content = _process_image(job_id, named_path, display_filename, mode, expected_sem, timings, ctx=ctx)
+        return status_code, content, timings
+    except Exception as e:
+        return 500, {"error": str(e)}, timings
+
+
+def process_pdf_page(job_id, pdf_path, page_index, page_total, mode="school", upload_name=None, display_dir=None):
+    """
+    Worker entry point for one page of a multi-page PDF.
+
+    The page is rasterized straight into memory at an adaptive DPI and handed
+    to the pipeline as an ImageContext; only the JPEG display copy for the UI
+    is written. Several pages of the same PDF run on different workers at once.
+
+    Returns:
+        tuple: (http_status_code, response_content_dict, stage_timings_dict)
+    """
+    import cv2
+    from scripts.image_context import ImageContext
+    from scripts.pdf_pages import rasterize_page
+
+    pdf_path = Path(pdf_path)
+    page_label = f"page {page_index + 1}/{page_total}"
+    _report(job_id, f"{page_label}: pdf")
+    timings = {}
+    try:
+        with stage_timer("pdf", timings):
+            image, dpi = rasterize_page(pdf_path, page_index)
+    except Exception as e:
+        logger.error(f"Failed to rasterize {page_label} of {pdf_path.name}: {e}")
+        return 400, {"page": page_index + 1, "detail": f"PDF conversion failed: {str(e)}"}, timings
+
+    try:
+        # Page images only exist in memory; the stem names this page's outputs
+        named_path = _named_path(pdf_path, upload_name, display_dir)
+        page_path = named_path.parent / f"{named_path.stem}_p{page_index + 1}.jpg"
+        display_filename = f"{page_path.stem}_display.jpg"
+        cv2.imwrite(str(page_path.parent / display_filename), image)
+
+        status_code, content = _process_image(
+            job_id, page_path, display_filename, mode, None, timings,
+            ctx=ImageContext(image, source=str(page_path)),
+            progress=lambda stage: _report(job_id, f"{page_label}: {stage}"),
+        )
+        content = {"page": page_index + 1, "dpi": dpi, **content}
+        return status_code, content, timings
+    except Exception as e:
+        return 500, {"page": page_index + 1, "error": str(e)}, timings
+
+
+# =====================================================
+# API process side
+# =====================================================
+
+class JobManager:
+    """Bounded process pool plus an in-memory table of job status"""
+
+    def __init__(self, max_workers=None, logo_model_path="models\\logo.pt", table_model_path="models\\tt_finetuned",
+                 display_dir=None):
+        self.max_workers = max_workers or MAX_WORKERS
+        # Where display copies go; None keeps them next to each upload
+        self.display_dir = Path(display_dir) if display_dir is not None else None
+        threads_per_worker = max(1, CPU_COUNT // self.max_workers)
+        self._mp_context = multiprocessing.get_context(START_METHOD)
+        self._progress = self._mp_context.Queue()
+        self._initargs = (self._progress, logo_model_path, table_model_path, threads_per_worker)
+        self._executor = self._new_executor()
+        self._jobs = {}
+        self._futures = {}
+        self._workers = {}
+        self._started_at = time.time()
+        self._warm_at = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._drain_thread = threading.Thread(target=self._drain_progress, name="ocr-job-progress", daemon=True)
+        self._drain_thread.start()
+        logger.info(f"Job pool started: {self.max_workers} workers x {threads_per_worker} threads ({START_METHOD})")
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._mp_context,
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+
+    def _rebuild_pool(self, broken):
+        """
+        Replace a pool that lost a worker (OOM kill, segfault) and warm the new one.
+
+        A broken ProcessPoolExecutor refuses every later submit, so without this
+        the service would stay down until restarted. Only the first caller that
+        sees a given broken executor rebuilds it.
+        """
+        with self._lock:
+            if self._closed or self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+            self._workers = {}
+            self._started_at = time.time()
+            self._warm_at = None
+        logger.error("OCR worker pool broken (a worker died); started a new pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.warm_up()
+
+    def submit(self, upload_path, mode="school", expected_sem=None, filename=None, multi_page=False, upload_name=None):
+        """
+        Queue an upload for processing and return its job id.
+
+        upload_path is left in place after the job; upload_name is the name the
+        display copy and outputs are derived from (defaults to the file's own).
+
+        With multi_page=True a PDF is split into one task per page (up to
+        PDF_MAX_PAGES) that run on the workers in parallel; the job result then
+        holds a "pages" array. expected_sem is not checked per page, since a
+        multi-page upload holds several semesters.
+        """
+        page_total = 0
+        if multi_page and Path(upload_path).suffix.lower() == ".pdf":
+            from scripts.pdf_pages import page_count, PDF_MAX_PAGES
+            try:
+                page_total = min(page_count(upload_path), PDF_MAX_PAGES)
+            except Exception as e:
+                raise UnreadablePdfError(str(e)) from e
+            if page_total < 1:
+                raise UnreadablePdfError("Empty PDF")
+
+        with self._lock:
+            self._purge_expired()
+            # Every page task occupies the queue like a job of its own
+            unfinished = sum(job["_tasks"] for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if unfinished + max(1, page_total) > MAX_QUEUED_JOBS:
+                raise QueueFullError(f"{unfinished} jobs already waiting, try again shortly")
+
+            job_id = uuid.uuid4().hex
+            display_dir = str(self.display_dir) if self.display_dir is not None else None
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "stage": None,
+                "mode": mode,
+                "filename": filename,
+                "pages": page_total or None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "status_code": None,
+                "result": None,
+                "_tasks": max(1, page_total),
+                "_upload_dir": self.display_dir or Path(upload_path).parent,
+                "_annotations": [None] * max(1, page_total),
+            }
+            if page_total:
+                self._jobs[job_id]["_page_results"] = [None] * page_total
+            executor = self._executor
+            futures = []
+            try:
+                if page_total:
+                    for index in range(page_total):
+                        futures.append(executor.submit(process_pdf_page, job_id, str(upload_path), index,
+                                                       page_total, mode, upload_name, display_dir))
+                else:
+                    futures.append(executor.submit(process_upload, job_id, str(upload_path), mode, expected_sem,
+                                                   upload_name, display_dir))
+            except BrokenProcessPool:
+                # Roll the job back so it neither lingers as "queued" nor fills the queue
+                for future in futures:
+                    future.cancel()
+                del self._jobs[job_id]
+                broken = True
+            else:
+                broken = False
+                self._futures[job_id] = futures
+
+        if broken:
+            self._rebuild_pool(executor)
+            raise PoolUnavailableError("OCR workers are restarting, try again shortly")
+
+        if page_total:
+            for index, future in enumerate(futures):
+                future.add_done_callback(
+                    lambda f, job_id=job_id, index=index: self._on_page_done(job_id, index, f, executor))
+        else:
+            futures[0].add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f, executor))
+        return job_id
+
+    def warm_up(self):
+        """Start every worker now so their models load before the first upload arrives"""
+        for _ in range(self.max_workers):
+            self._executor.submit(_ping)
+
+    def readiness(self):
+        """
+        Worker warm-up state for /readyz.
+
+        Returns:
+            dict: {"ready": every worker loaded its models, "workers": reported
+                   count, "expected": pool size, "errors": [...],
+                   "ocr_client": every worker has an OCR client,
+                   "warmup_seconds": pool start to last worker ready or None}
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+            warm_at = self._warm_at
+        errors = [f"worker {w['pid']}: {w['error']}" for w in workers if w["error"]]
+        return {
+            "ready": len(workers) >= self.max_workers and not errors,
+            "workers": len(workers),
+            "expected": self.max_workers,
+            "errors": errors,
+            "ocr_client": bool(workers) and all(w["ocr_client"] for w in workers),
+            "warmup_seconds": round(warm_at - self._started_at, 2) if warm_at else None,
+        }
+
+    def _worker_ready(self, info):
+        with self._lock:
+            self._workers[info["pid"]] = info
+            if len(self._workers) < self.max_workers or self._warm_at is not None:
+                return
+            self._warm_at = info["at"]
+        observe_stage("worker_warmup", self._warm_at - self._started_at)
+        logger.info(f"All {self.max_workers} OCR workers ready in {self._warm_at - self._started_at:.1f}s")
+
+    def get(self, job_id):
+        """Public status dict for a job (without its result), or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = {k: v for k, v in job.items() if k != "result" and not k.startswith("_")}
+        for key in ("created_at", "started_at", "finished_at"):
+            if status[key] is not None:
+                status[key] = datetime.datetime.fromtimestamp(status[key]).isoformat()
+        return status
+
+    def result(self, job_id):
+        """(status_code, content) of a finished job, or None while it is still pending"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ("done", "failed"):
+                return None
+            return job["status_code"], job["result"]
+
+    def annotation(self, job_id, page=1):
+        """
+        (display image path, annotation record) of a finished job's page, or
+        None when the job, the page or its detections are unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ("done", "failed"):
+                return None
+            annotations = job["_annotations"]
+            if not 1 <= page <= len(annotations) or annotations[page - 1] is None:
+                return None
+            return annotations[page - 1]
+
+    def _keep_annotation(self, job_id, index, content):
+        # Detections stay in the job table; clients only see the extraction result
+        record = content.pop("_annotation", None)
+        if record is None or not content.get("server_filename"):
+            return
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["_annotations"][index] = (job["_upload_dir"] / content["server_filename"], record)
+
+    async def wait(self, job_id):
+        """Await a job without blocking the event loop and return (status_code, content)"""
+        futures = self._futures.get(job_id) or []
+        if futures:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in futures), return_exceptions=True)
+        # The done callback may still be running on the executor thread
+        for _ in range(100):
+            outcome = self.result(job_id)
+            if outcome is not None:
+                return outcome
+            await asyncio.sleep(0.01)
+        return 500, {"error": "Job finished without a result"}
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            self._progress.put_nowait(None)
+        except Exception:
+            pass
+
+    def _on_done(self, job_id, future, executor=None):
+        try:
+            status_code, content, timings = future.result()
+            observe_timings(timings)
+            self._keep_annotation(job_id, 0, content)
+        except BrokenProcessPool as e:
+            logger.error(f"Job {job_id} lost its worker: {e}")
+            status_code, content = 503, {"error": "OCR worker died while processing, please retry"}
+            self._rebuild_pool(executor)
+        except Exception as e:
+            logger.error(f"Job {job_id} crashed: {e}")
+            status_code, content = 500, {"error": str(e)}
+        self._finish(job_id, status_code, content)
+
+    def _on_page_done(self, job_id, index, future, executor=None):
+        try:
+            status_code, content, timings = future.result()
+            observe_timings(timings)
+            self._keep_annotation(job_id, index, content)
+        except BrokenProcessPool as e:
+            logger.error(f"Job {job_id} page {index + 1} lost its worker: {e}")
+            status_code, content = 503, {"page": index + 1, "error": "OCR worker died while processing, please retry"}
+            self._rebuild_pool(executor)
+        except Exception as e:
+            logger.error(f"Job {job_id} page {index + 1} crashed: {e}")
+            status_code, content = 500, {"page": index + 1, "error": str(e)}
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            pages = job["_page_results"]
+            pages[index] = {"status_code": status_code, **content}
+            if any(page is None for page in pages):
+                return
+
+        succeeded = [page for page in pages if page["status_code"] < 400]
+        status_code = 200 if succeeded else pages[0]["status_code"]
+        self._finish(job_id, status_code, {
+            "page_count": len(pages),
+            "pages_processed": len(succeeded),
+            # First readable page keeps single-page clients working
+            "server_filename": succeeded[0].get("server_filename") if succeeded else None,
+            "pages": pages,
+        })
+
+    def _finish(self, job_id, status_code, content):
+        status = "done" if status_code < 500 else "failed"
+        with self._lock:
+            job = self._jobs.get(job_id)
+            self._futures.pop(job_id, None)
+            if job is None:
+                return
+            job.update({
+                "status": status,
+                "stage": "done",
+                "finished_at": time.time(),
+                "status_code": status_code,
+                "result": content,
+            })
+        logger.info(f"Job {job_id} {status} ({status_code})")
+
+    def _drain_progress(self):
+        while not self._closed:
+            try:
+                message = self._progress.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            job_id, stage, at = message
+            if job_id is None:
+                if stage == WORKER_READY:
+                    self._worker_ready(at)
+                else:
+                    observe_stage(stage, at)
+                continue
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in ("done", "failed"):
+                    continue
+                if job["status"] == "queued":
+                    job["status"] = "running"
+                    job["started_at"] = at
+                    observe_stage("queue_wait", max(0.0, at - job["created_at"]))
+                job["stage"] = stage
+
+    def _purge_expired(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
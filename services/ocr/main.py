@@ -1,23 +1,30 @@
 """
 DOC OC Backend - FastAPI service for marksheet OCR processing
 Connects to connect_college MySQL database
+
+Startup is kept cheap: this process only serves HTTP and never imports torch,
+transformers or ultralytics. The models load in the pool workers, which are
+spawned and warmed in the background as soon as the app starts. The database
+pool connects in the background too and retries until it is reachable.
+/healthz answers as soon as the app serves requests. /readyz answers 200 only
+once every worker has its models loaded and the database responds.
 """
 
-from fastapi import FastAPI, File, UploadFile, Query, HTTPException
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from pydantic import BaseModel
-import shutil
 import os
 import logging
 from pathlib import Path
 import sys
 import uuid
+import asyncio
 from typing import Optional
-import mysql.connector
-import mysql.connector
-from mysql.connector import pooling
-import datetime
+from decimal import Decimal
 
 # Setup logging
 import tempfile
@@ -42,69 +49,33 @@ sys.path.insert(0, str(docroot / 'scripts'))
 logger.info(f"Working directory: {docroot}")
 logger.info(f"Scripts path: {docroot / 'scripts'}")
 
-# Preload preprocess module
-try:
-    import importlib.util
-    preprocess_path = docroot / 'preprocess.py'
-    if preprocess_path.exists():
-        spec = importlib.util.spec_from_file_location('preprocess', str(preprocess_path))
-        module = importlib.util.module_from_spec(spec)
-        assert spec and spec.loader
-        spec.loader.exec_module(module)
-        sys.modules['preprocess'] = module
-        logger.info("Loaded preprocess module")
-except Exception as e:
-    logger.warning(f"Could not load preprocess module: {e}")
-
-# Preload OCR module to verify API key on startup
-try:
-    from scripts import ocr
-    logger.info(f"OCR module loaded - client available: {ocr.client is not None}")
-except Exception as e:
-    logger.error(f"Failed to load OCR module: {e}")
-
-# Load pipeline module
-init_error = None
-try:
-    import importlib.util
-    pipeline_path = docroot / 'pipeline.py'
-    spec = importlib.util.spec_from_file_location('pipeline_main', str(pipeline_path))
-    pipeline_module = importlib.util.module_from_spec(spec)
-    assert spec and spec.loader
-    spec.loader.exec_module(pipeline_module)
-    MarksheetProcessor = getattr(pipeline_module, 'MarksheetProcessor')
-    logger.info("Loaded pipeline module with MarksheetProcessor")
-except Exception as e:
-    logger.warning(f"Could not load pipeline: {e}")
-    init_error = str(e)
-    MarksheetProcessor = None
+# The preprocess and OCR modules are imported by the pool workers, which also
+# check the OCR API key during warm-up (reported on /readyz)
+
+# Marksheet processing runs in a bounded worker pool (see jobs.py). The pool is
+# created on startup rather than at import so spawned workers that re-import
+# this module do not start pools of their own
+from jobs import JobManager, PoolUnavailableError, QueueFullError, UnreadablePdfError
+job_manager = None
+
+# Uploads are stored by content hash; derived files are swept in the background
+from storage import (UploadStore, RetentionSweeper, UploadTooLarge, UnsupportedUpload, MalformedUpload,
+                     STORAGE_DIR, UPLOAD_OVERHEAD_BYTES)
+retention = None
+
+# Annotated images are drawn from cached detections only when requested
+from annotation import AnnotationCache
+annotation_cache = AnnotationCache()
+
+from scripts.metrics import HTTP_REQUEST_SECONDS, CONTENT_TYPE_LATEST, observe_stage, render_latest
+from scripts.field_confidence import document_confidence, recorded_scores, subject_confidence
 
 # =====================================================
-# MySQL Database Configuration
+# Database (async pool, see db.py)
 # =====================================================
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'aditya',  # Update with your MySQL password
-    'database': 'connect_college'
-}
-
-db_pool = None
-try:
-    db_pool = pooling.MySQLConnectionPool(
-        pool_name="ocr_pool",
-        pool_size=5,
-        **DB_CONFIG
-    )
-    print("✅ Connected to MySQL database: connect_college")
-except Exception as e:
-    print(f"⚠️ Warning: Could not connect to MySQL: {e}")
-
-def get_db_connection():
-    if db_pool is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    return db_pool.get_connection()
+from db import Database, DatabaseUnavailable, PoolTimeoutError
+db = Database()
 
 # =====================================================
 # Pydantic Models
@@ -122,8 +93,13 @@ class SubmitData(BaseModel):
 # FastAPI App Setup
 # =====================================================
 
-UPLOAD_DIR = docroot / 'uploads'
+# OCR_UPLOAD_DIR may be absolute (e.g. a volume shared with OCR_STORAGE_DIR)
+UPLOAD_DIR = docroot / os.getenv("OCR_UPLOAD_DIR", "uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Blobs must share a filesystem with UPLOAD_DIR for display copies to be hard links
+upload_store = UploadStore(UPLOAD_DIR, docroot / STORAGE_DIR)
+# Decode image uploads in memory before queueing, so corrupt files never reach a worker
+DECODE_UPLOADS = os.getenv("OCR_DECODE_UPLOADS", "0").strip().lower() in ("1", "true", "yes")
 
 app = FastAPI(title="DOC OC API", version="1.0.0")
 
@@ -138,7 +114,97 @@ app.add_middleware(
 from fastapi.staticfiles import StaticFiles
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
-processor = MarksheetProcessor() if MarksheetProcessor else None
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Reject declared oversize bodies before reading any of them; bodies without a
+    # length are cut off while /process streams them (UploadStore.ingest_form)
+    length = request.headers.get("content-length")
+    if request.method == "POST" and length and length.isdigit() \
+            and int(length) > upload_store.max_bytes + UPLOAD_OVERHEAD_BYTES:
+        return JSONResponse(status_code=413, content={
+            "detail": f"Upload exceeds the {upload_store.max_bytes / 1024 / 1024:g} MB limit"})
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the series count bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status_code,
+        )
+
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable(request: Request, exc: DatabaseUnavailable):
+    return JSONResponse(status_code=500, content={"detail": "Database not configured"})
+
+@app.exception_handler(PoolTimeoutError)
+async def database_busy(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "2"})
+
+@app.on_event("startup")
+async def start_job_pool():
+    global job_manager
+    # Each worker loads and warms the models once and reuses them for every job
+    job_manager = JobManager(display_dir=UPLOAD_DIR)
+    job_manager.warm_up()
+
+@app.on_event("startup")
+async def start_retention_sweeper():
+    global retention
+    retention = RetentionSweeper(upload_store, processed_dir=docroot / 'processed')
+    retention.start()
+
+DB_RETRY_SECONDS = float(os.getenv("DB_RETRY_SECONDS", "10"))
+db_connect_task = None
+
+async def connect_db():
+    """Connect the pool without holding up startup, retrying until the database is reachable"""
+    while True:
+        if await db.start():
+            print("✅ Connected to database: connect_college")
+            return
+        print(f"⚠️ Warning: Could not connect to database: {db.error} (retrying in {DB_RETRY_SECONDS:g}s)")
+        await asyncio.sleep(DB_RETRY_SECONDS)
+
+@app.on_event("startup")
+async def start_db_pool():
+    global db_connect_task
+    db_connect_task = asyncio.create_task(connect_db())
+
+@app.on_event("startup")
+async def report_startup_time():
+    # Registered last, so this covers every startup handler above
+    startup_seconds = time.perf_counter() - IMPORT_STARTED
+    STARTUP_TIMINGS["startup_seconds"] = round(startup_seconds, 3)
+    observe_stage("api_startup", startup_seconds)
+    logger.info(f"API serving {startup_seconds:.2f}s after import started "
+                f"(imports {STARTUP_TIMINGS['import_seconds']:.2f}s); models warming in the background")
+
+@app.on_event("shutdown")
+async def stop_job_pool():
+    if job_manager is not None:
+        job_manager.shutdown()
+
+@app.on_event("shutdown")
+async def stop_retention_sweeper():
+    if retention is not None:
+        retention.stop()
+
+@app.on_event("shutdown")
+async def stop_db_pool():
+    if db_connect_task is not None:
+        db_connect_task.cancel()
+    await db.close()
 
 # =====================================================
 # API Endpoints
@@ -148,330 +214,481 @@ processor = MarksheetProcessor() if MarksheetProcessor else None
 async def root():
     return {"message": "DOC OC API is running", "status": "ok"}
 
-@app.post("/process")
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok", "uptime_seconds": round(time.perf_counter() - IMPORT_STARTED, 1), **STARTUP_TIMINGS}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: every OCR worker has loaded its models and the database answers"""
+    workers = job_manager.readiness() if job_manager is not None else {"ready": False}
+    database = await db.ping()
+    ready = workers["ready"] and database
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "status": "ready" if ready else "starting",
+        "workers": workers,
+        "database": database,
+        **STARTUP_TIMINGS,
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """Stage and request latency histograms in the Prometheus text format"""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def _with_job_links(job_id, content):
+    """Add the job id and, where detections were kept, the annotated image URL(s) to a job result"""
+    content = {**content, "job_id": job_id}
+    if "pages" in content:
+        content["pages"] = [
+            {**page, "annotated_url": f"/process/{job_id}/annotated?page={page['page']}"}
+            if job_manager.annotation(job_id, page.get("page", 0)) is not None else page
+            for page in content["pages"]
+        ]
+    elif job_manager.annotation(job_id) is not None:
+        content["annotated_url"] = f"/process/{job_id}/annotated"
+    return content
+
+# /process parses its multipart body itself, so the form is described for the docs here
+PROCESS_REQUEST_BODY = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
+
+@app.post("/process", openapi_extra=PROCESS_REQUEST_BODY)
 async def process_marksheet(
-    file: UploadFile = File(...),
+    request: Request,
     mode: str = Query("school"),
     expected_sem: Optional[str] = Query(None),
+    wait: bool = Query(True),
+    multi_page: bool = Query(False),
 ):
-    """Process a marksheet image and extract data using OCR"""
-    logger.info(f"Received /process request. File: {file.filename}, Mode: {mode}")
-    if processor is None:
-        logger.error(f"OCR processor not initialized. Error: {init_error}")
-        raise HTTPException(status_code=500, detail=f"OCR processor not available. Init error: {init_error}")
-    
-    suffix = Path(file.filename).suffix
-    
-    # Create meaningful filename: YYYYMMDD_HHMMSS_OriginalName.ext
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    # Sanitize original filename (alphanumeric, dots, dashes, underscores)
-    clean_name = "".join(c for c in Path(file.filename).stem if c.isalnum() or c in "._- ")[:30].replace(" ", "_")
-    if not clean_name:
-        clean_name = "upload"
-        
-    temp_filename = f"{timestamp}_{clean_name}{suffix}"
-    temp_path = UPLOAD_DIR / temp_filename
+    """Process a marksheet image and extract data using OCR
     
-    with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    The upload is queued on the worker pool. With wait=true (default) the
+    response is the extraction result; with wait=false a job id is returned
+    immediately and progress is available from /jobs/{job_id}.
     
-    # PDF to image conversion
-    # PDF to image conversion
-    if suffix.lower() == ".pdf":
-        try:
-            import fitz  # PyMuPDF
-            logger.info(f"Converting PDF to image: {temp_path}")
-            doc = fitz.open(temp_path)
-            if doc.page_count < 1:
-                raise ValueError("Empty PDF")
-            page = doc.load_page(0)  # First page
-            pix = page.get_pixmap(dpi=300)
-            
-            # New filename
-            img_path = UPLOAD_DIR / f"{Path(temp_filename).stem}.jpg"
-            pix.save(str(img_path))
-            doc.close()
-            
-            # Cleanup PDF
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
-            
-            temp_path = img_path
-            logger.info(f"PDF converted successfully to: {temp_path}")
-            
-        except Exception as e:
-            logger.error(f"Failed to convert PDF: {e}")
-            raise HTTPException(status_code=400, detail=f"PDF conversion failed: {str(e)}")
+    PDFs are read from their first page unless multi_page=true, in which case
+    every page is processed in parallel and the result has a "pages" array
+    with one entry (board, data, server_filename, status_code) per page.
+    
+    The upload is the "file" field of a multipart form. It is stored while it
+    arrives, and its format is taken from its leading bytes, not its name:
+    anything but an image or a PDF gets 415 after the first bytes, and the
+    request gets 413 as soon as the body passes OCR_MAX_UPLOAD_MB.
+    """
+    logger.info(f"Received /process request. Mode: {mode}")
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="OCR worker pool not started")
     
+    # Sniffed, size-checked and stored by content hash as YYYYMMDD_HHMMSS_OriginalName.ext (see storage.py)
     try:
-        # Create a persistent display copy for UI (in case pipeline deletes original)
-        display_filename = f"{Path(temp_path).stem}_display{Path(temp_path).suffix}"
-        display_path = UPLOAD_DIR / display_filename
-        shutil.copy(temp_path, display_path)
-
-        if mode == "college":
-            from scripts.college_extractor import process_fixed_format as college_process
-            info_box = (0.395423, 0.163709, 0.653978, 0.128660)
-            marks_box = (0.492943, 0.472937, 0.849016, 0.492458)
-            data = college_process(str(temp_path), info_box, marks_box)
-            
-            if expected_sem:
-                try:
-                    extracted_sem = (data.get("college", {}) or {}).get("semester")
-                    if extracted_sem and str(extracted_sem).strip().upper() != str(expected_sem).strip().upper():
-                        return JSONResponse(
-                            content={"error": f"Uploaded marksheet belongs to Semester {extracted_sem}. Please upload Semester {expected_sem} marksheet."},
-                            status_code=400
-                        )
-                except Exception:
-                    pass
-            return JSONResponse(content={"board": "COLLEGE_FIXED", "data": data, "server_filename": display_filename})
-        else:
-            result = processor.process_single_marksheet(str(temp_path))
-            data = None
-            if 'extraction' in result:
-                data = result['extraction'].get('data')
-                if not data and result['extraction'].get('final_json'):
-                    final_json_path = Path(result['extraction']['final_json'])
-                    if final_json_path.exists():
-                        import json
-                        with open(final_json_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-            if data is not None:
-                return JSONResponse(content={
-                    "board": result.get("logo_detection", {}).get("board_name", ""), 
-                    "data": data,
-                    "server_filename": display_filename
-                })
-            else:
-                board_name = result.get("logo_detection", {}).get("board_name", "")
-                return JSONResponse(content={
-                    "server_filename": display_filename,
-                    "board": board_name,
-                    "data": {
-                        "board": board_name,
-                        "student_name": "OCR not available",
-                        "subjects": [],
-                        "note": "OCR extraction failed"
-                    }
-                })
-    except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
-    finally:
+        stored = await upload_store.ingest_form(
+            request.stream(), request.headers.get("content-type"), "file", DECODE_UPLOADS)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedUpload as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except MalformedUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Stored upload {stored.filename} as {stored.path.name} ({stored.size} bytes)")
+    
+    if DECODE_UPLOADS and not stored.is_pdf:
+        from scripts.image_context import ImageContext
         try:
-            os.remove(temp_path)
-        except Exception:
-            pass
+            await asyncio.to_thread(ImageContext.from_bytes, stored.data, stored.name)
+        except ValueError as e:
+            upload_store.discard(stored)
+            raise HTTPException(status_code=415, detail=str(e))
+    
+    try:
+        job_id = await asyncio.to_thread(
+            job_manager.submit, stored.path,
+            mode=mode, expected_sem=expected_sem, filename=stored.filename, multi_page=multi_page,
+            upload_name=stored.name
+        )
+    except (QueueFullError, PoolUnavailableError) as e:
+        upload_store.discard(stored)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except UnreadablePdfError as e:
+        upload_store.discard(stored)
+        raise HTTPException(status_code=400, detail=f"PDF conversion failed: {str(e)}")
+    
+    if not wait:
+        return JSONResponse(status_code=202, content={
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result",
+        })
+    
+    status_code, content = await job_manager.wait(job_id)
+    if status_code >= 400 and "detail" in content:
+        raise HTTPException(status_code=status_code, detail=content["detail"])
+    if status_code < 400:
+        content = _with_job_links(job_id, content)
+    return JSONResponse(content=content, status_code=status_code)
+
+@app.get("/process/{job_id}/annotated")
+async def get_annotated_image(job_id: str, page: int = Query(1, ge=1)):
+    """Annotated marksheet (logo, photo and table boxes) of a finished job
+    
+    Drawn on first request from the detections the job already made, without
+    running any model, and cached on disk for OCR_ANNOTATED_TTL_SECONDS.
+    Multi-page jobs take the 1-based page number.
+    """
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="OCR worker pool not started")
+    status = job_manager.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] not in ("done", "failed"):
+        return JSONResponse(status_code=202, content=status)
+    source = job_manager.annotation(job_id, page)
+    if source is None:
+        raise HTTPException(status_code=404, detail="No detections to annotate for this job")
+    image_path, record = source
+    try:
+        path = await asyncio.to_thread(annotation_cache.get_or_render, f"{job_id}_p{page}", image_path, record)
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Uploaded image is no longer available")
+    return FileResponse(path, media_type="image/jpeg")
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Status and current stage of a queued /process job"""
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="OCR worker pool not started")
+    status = job_manager.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Result of a finished /process job (202 with the status while it is still running)"""
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="OCR worker pool not started")
+    status = job_manager.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    outcome = job_manager.result(job_id)
+    if outcome is None:
+        return JSONResponse(status_code=202, content=status)
+    status_code, content = outcome
+    if status_code >= 400 and "detail" in content:
+        raise HTTPException(status_code=status_code, detail=content["detail"])
+    if status_code < 400:
+        content = _with_job_links(job_id, content)
+    return JSONResponse(content=content, status_code=status_code)
 
 @app.post("/create_user")
 async def create_user(user: UserCreate):
     """Create a new user"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        # Check if user exists
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (user.email,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="User already exists")
-        
-        # Create user with default password
-        cursor.execute("""
-            INSERT INTO users (email, password_hash, full_name, role)
-            VALUES (%s, %s, %s, 'STUDENT')
-        """, (user.email, '$2a$10$defaulthash', user.username))
-        conn.commit()
+        async with db.transaction() as conn:
+            # Check if user exists
+            if await conn.fetchone("SELECT user_id FROM users WHERE email = %s", (user.email,)):
+                raise HTTPException(status_code=400, detail="User already exists")
+            
+            # Create user with default password
+            created = await conn.execute("""
+                INSERT INTO users (email, password_hash, full_name, role)
+                VALUES (%s, %s, %s, 'STUDENT')
+            """, (user.email, '$2a$10$defaulthash', user.username))
         
-        return {"user_id": cursor.lastrowid, "message": "User created successfully"}
-    except HTTPException:
+        return {"user_id": created.lastrowid, "message": "User created successfully"}
+    except (HTTPException, DatabaseUnavailable, PoolTimeoutError):
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.get("/user/{email}")
 async def get_user(email: str):
     """Get user by email"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("""
+    async with db.connection() as conn:
+        user = await conn.fetchone("""
             SELECT user_id, email, full_name, role FROM users WHERE email = %s
         """, (email,))
-        user = cursor.fetchone()
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        return user
-    finally:
-        cursor.close()
-        conn.close()
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return user
+
+UPLOAD_COLUMNS = (
+    "user_id", "semester", "board_type", "marksheet_type", "student_name_extracted",
+    "roll_number", "enrollment_number", "father_name", "mother_name", "school_name",
+    "school_code", "course_name", "session", "image_url", "raw_json_data", "confidence"
+)
+
+def _marksheet_rows(ms, user_id):
+    """
+    Translate one submitted marksheet into table rows.
+
+    Returns:
+        tuple: (upload row, [extracted_marks rows without upload_id], semester_results row
+        without upload_id or None), or None when no semester can be determined.
+        The upload row ends with the lowest row confidence, which orders the
+        admin verification queue.
+    """
+    import json as json_lib
+    import re
+    filename = ms.get("filename", "")
+    ms_data = ms.get("data", {})
+    board = ms.get("board", ms_data.get("board", "OTHER")).upper()
+    
+    # Determine semester and marksheet type
+    type_id = ms.get("type_identifier")
+    semester = 0
+    marksheet_type = "OTHER"
+    
+    if type_id == "10TH":
+        semester = 10
+        marksheet_type = "10TH"
+    elif type_id == "12TH":
+        semester = 12
+        marksheet_type = "12TH"
+    elif type_id == "SEMESTER":
+        marksheet_type = "SEMESTER"
+        semester = int(ms.get("semester_override", 0))
+    else:
+        # Fallback to filename logic (legacy)
+        if "10th" in filename.lower():
+            semester = 10
+            marksheet_type = "10TH"
+        elif "12th" in filename.lower():
+            semester = 12
+            marksheet_type = "12TH"
+        else:
+            match = re.search(r'semester_(\d+)', filename.lower())
+            if match:
+                semester = int(match.group(1))
+                marksheet_type = "SEMESTER"
+    
+    if semester == 0:
+        return None
+    
+    # Normalize board type for DB enum
+    board_type = "OTHER"
+    if "CBSE" in board:
+        board_type = "CBSE"
+    elif "ICSE" in board:
+        board_type = "ICSE"
+    elif "UTTARAKHAND" in board or "UK" in board:
+        board_type = "UTTARAKHAND"
+    elif "COLLEGE" in board:
+        board_type = "COLLEGE"
+    
+    # Extract student metadata based on board type
+    student = ms_data.get("student", {}) or {}
+    college = ms_data.get("college", {}) or {}
+    upload_row = (
+        user_id, semester, board_type, marksheet_type,
+        ms_data.get("student_name") or student.get("name"),
+        ms_data.get("roll_number") or ms_data.get("unique_id") or student.get("roll_no"),
+        student.get("enrollment_no"),
+        ms_data.get("father_name") or student.get("father_name"),
+        ms_data.get("mother_name"),
+        ms_data.get("school_name"),
+        ms_data.get("school_code"),
+        college.get("course"),
+        college.get("session"),
+        filename,
+        json_lib.dumps(ms_data)
+    )
+    
+    # Extracted marks with all breakdown fields. Each row is scored again from
+    # the submitted values (which the student may have edited); the score the
+    # extraction recorded for the row can only lower it.
+    subjects = ms_data.get("subjects") or []
+    mark_rows = []
+    for subj, recorded in zip(subjects, recorded_scores(subjects, ms_data.get("field_confidence"))):
+        confidence, _ = subject_confidence(subj)
+        if recorded is not None:
+            confidence = min(confidence, recorded)
+        mark_rows.append((
+            subj.get("name", subj.get("subject_name", "Unknown")),
+            subj.get("code"),
+            subj.get("total_marks") or subj.get("marks") or subj.get("total"),
+            subj.get("max_marks", 100),
+            subj.get("theory_marks"),
+            subj.get("practical_marks"),
+            subj.get("internal_marks"),
+            subj.get("external_marks"),
+            subj.get("credits"),
+            subj.get("grade"),
+            subj.get("grade_point"),
+            subj.get("marks_in_words") or subj.get("total_in_words"),
+            confidence
+        ))
+    upload_row += (document_confidence([row[-1] for row in mark_rows]),)
+    
+    # For college marksheets, semester results (SGPA, CGPA)
+    result_row = None
+    result_data = ms_data.get("result", {})
+    if board_type == "COLLEGE" and result_data:
+        result_row = (
+            result_data.get("total_credits_registered"),
+            result_data.get("total_credits_earned"),
+            result_data.get("sgpa"),
+            result_data.get("cgpa"),
+            result_data.get("status")
+        )
+    
+    return upload_row, mark_rows, result_row
+
+async def _inserted_upload_ids(conn, user_id, first_id, upload_rows):
+    """
+    Upload ids of the rows just inserted by one multi-row INSERT, in input order.
+    
+    InnoDB only guarantees consecutive ids for a multi-row insert in some
+    auto-increment lock modes, so the rows are read back (visible inside this
+    transaction) and matched on semester, type and image instead of assuming
+    first_id + i.
+    """
+    rows = await conn.fetchall("""
+        SELECT upload_id, semester, marksheet_type, image_url
+        FROM marksheet_uploads
+        WHERE user_id = %s AND upload_id >= %s
+        ORDER BY upload_id
+    """, (user_id, first_id))
+    candidates = {}
+    for row in rows:
+        key = (row['semester'], row['marksheet_type'], row['image_url'])
+        candidates.setdefault(key, []).append(row['upload_id'])
+    
+    upload_ids = []
+    for upload_row in upload_rows:
+        key = (upload_row[1], upload_row[3], upload_row[13])
+        ids = candidates.get(key)
+        if not ids:
+            raise RuntimeError(f"Inserted upload not found for semester {upload_row[1]} ({upload_row[13]})")
+        upload_ids.append(ids.pop(0))
+    return upload_ids
 
 @app.post("/submit_marksheets")
 async def submit_marksheets(data: SubmitData):
-    """Submit extracted marksheet data to database with full schema support"""
-    import json as json_lib
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    """
+    Submit extracted marksheet data to database with full schema support
+    
+    All marksheets of the request are written in one transaction: a single
+    multi-row insert for the uploads and executemany batches for subject marks
+    and semester results.
+    """
+    submit_started = time.perf_counter()
+    timings = {}
     
     try:
-        # Get user by email
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (data.user_email,))
-        user = cursor.fetchone()
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = user['user_id']
-        saved_count = 0
-        
-        for ms in data.marksheets:
-            filename = ms.get("filename", "")
-            ms_data = ms.get("data", {})
-            board = ms.get("board", ms_data.get("board", "OTHER")).upper()
-            
-            # Determine semester and marksheet type
-            type_id = ms.get("type_identifier")
-            semester = 0
-            marksheet_type = "OTHER"
-            
-            if type_id == "10TH":
-                semester = 10
-                marksheet_type = "10TH"
-            elif type_id == "12TH":
-                semester = 12
-                marksheet_type = "12TH"
-            elif type_id == "SEMESTER":
-                marksheet_type = "SEMESTER"
-                semester = int(ms.get("semester_override", 0))
-            else:
-                # Fallback to filename logic (legacy)
-                if "10th" in filename.lower():
-                    semester = 10
-                    marksheet_type = "10TH"
-                elif "12th" in filename.lower():
-                    semester = 12
-                    marksheet_type = "12TH"
-                else:
-                    import re
-                    match = re.search(r'semester_(\d+)', filename.lower())
-                    if match:
-                        semester = int(match.group(1))
-                        marksheet_type = "SEMESTER"
+        async with db.transaction() as conn:
+            # Get user by email
+            user = await conn.fetchone("SELECT user_id FROM users WHERE email = %s", (data.user_email,))
             
-            if semester == 0:
-                continue
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
             
-            # Normalize board type for DB enum
-            board_type = "OTHER"
-            if "CBSE" in board:
-                board_type = "CBSE"
-            elif "ICSE" in board:
-                board_type = "ICSE"
-            elif "UTTARAKHAND" in board or "UK" in board:
-                board_type = "UTTARAKHAND"
-            elif "COLLEGE" in board:
-                board_type = "COLLEGE"
+            user_id = user['user_id']
             
-            # Extract student metadata based on board type
-            student_name = ms_data.get("student_name") or (ms_data.get("student", {}) or {}).get("name")
-            roll_number = ms_data.get("roll_number") or ms_data.get("unique_id") or (ms_data.get("student", {}) or {}).get("roll_no")
-            enrollment_number = (ms_data.get("student", {}) or {}).get("enrollment_no")
-            father_name = ms_data.get("father_name") or (ms_data.get("student", {}) or {}).get("father_name")
-            mother_name = ms_data.get("mother_name")
-            school_name = ms_data.get("school_name")
-            school_code = ms_data.get("school_code")
-            course_name = (ms_data.get("college", {}) or {}).get("course")
-            session = (ms_data.get("college", {}) or {}).get("session")
+            # Build every row up front so the database sees only batched statements
+            prepare_started = time.perf_counter()
+            parsed = [rows for rows in (_marksheet_rows(ms, user_id) for ms in data.marksheets) if rows is not None]
+            timings["prepare_ms"] = round((time.perf_counter() - prepare_started) * 1000, 2)
             
-            # Insert upload record with all new columns
-            cursor.execute("""
-                INSERT INTO marksheet_uploads 
-                (user_id, semester, board_type, marksheet_type, student_name_extracted, 
-                 roll_number, enrollment_number, father_name, mother_name, school_name, 
-                 school_code, course_name, session, image_url, raw_json_data, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'VERIFICATION_PENDING')
-            """, (
-                user_id, semester, board_type, marksheet_type, student_name,
-                roll_number, enrollment_number, father_name, mother_name, school_name,
-                school_code, course_name, session, filename, json_lib.dumps(ms_data)
-            ))
-            upload_id = cursor.lastrowid
-            
-            # Insert extracted marks with all breakdown fields
-            subjects = ms_data.get("subjects", [])
-            for subj in subjects:
-                cursor.execute("""
-                    INSERT INTO extracted_marks 
-                    (upload_id, subject_name_raw, subject_code, marks_obtained, marks_total,
-                     theory_marks, practical_marks, internal_marks, external_marks,
-                     credits, grade, grade_point, marks_in_words, confidence_score)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    upload_id,
-                    subj.get("name", subj.get("subject_name", "Unknown")),
-                    subj.get("code"),
-                    subj.get("total_marks") or subj.get("marks") or subj.get("total"),
-                    subj.get("max_marks", 100),
-                    subj.get("theory_marks"),
-                    subj.get("practical_marks"),
-                    subj.get("internal_marks"),
-                    subj.get("external_marks"),
-                    subj.get("credits"),
-                    subj.get("grade"),
-                    subj.get("grade_point"),
-                    subj.get("marks_in_words") or subj.get("total_in_words"),
-                    0.9
-                ))
-            
-            # For college marksheets, save semester results (SGPA, CGPA)
-            if board_type == "COLLEGE":
-                result_data = ms_data.get("result", {})
-                if result_data:
-                    cursor.execute("""
+            row_counts = {"marksheet_uploads": 0, "extracted_marks": 0, "semester_results": 0}
+            if parsed:
+                write_started = time.perf_counter()
+                upload_rows = [upload_row for upload_row, _, _ in parsed]
+                placeholders = "(" + ", ".join(["%s"] * len(UPLOAD_COLUMNS)) + ", 'VERIFICATION_PENDING')"
+                inserted = await conn.execute(
+                    f"INSERT INTO marksheet_uploads ({', '.join(UPLOAD_COLUMNS)}, status) VALUES "
+                    + ", ".join([placeholders] * len(upload_rows)),
+                    [value for upload_row in upload_rows for value in upload_row]
+                )
+                row_counts["marksheet_uploads"] = inserted.rowcount
+                upload_ids = await _inserted_upload_ids(conn, user_id, inserted.lastrowid, upload_rows)
+                
+                mark_rows = [(upload_id,) + mark_row
+                             for upload_id, (_, marks, _) in zip(upload_ids, parsed)
+                             for mark_row in marks]
+                if mark_rows:
+                    await conn.executemany("""
+                        INSERT INTO extracted_marks 
+                        (upload_id, subject_name_raw, subject_code, marks_obtained, marks_total,
+                         theory_marks, practical_marks, internal_marks, external_marks,
+                         credits, grade, grade_point, marks_in_words, confidence_score)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """, mark_rows)
+                    row_counts["extracted_marks"] = len(mark_rows)
+                
+                result_rows = [(upload_id,) + result_row
+                               for upload_id, (_, _, result_row) in zip(upload_ids, parsed)
+                               if result_row is not None]
+                if result_rows:
+                    await conn.executemany("""
                         INSERT INTO semester_results 
                         (upload_id, total_credits_registered, total_credits_earned, sgpa, cgpa, result_status)
                         VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (
-                        upload_id,
-                        result_data.get("total_credits_registered"),
-                        result_data.get("total_credits_earned"),
-                        result_data.get("sgpa"),
-                        result_data.get("cgpa"),
-                        result_data.get("status")
-                    ))
+                    """, result_rows)
+                    row_counts["semester_results"] = len(result_rows)
+                timings["write_ms"] = round((time.perf_counter() - write_started) * 1000, 2)
             
-            saved_count += 1
+            # Leaving the block commits the transaction
+            commit_started = time.perf_counter()
+        timings["commit_ms"] = round((time.perf_counter() - commit_started) * 1000, 2)
+        timings["total_ms"] = round((time.perf_counter() - submit_started) * 1000, 2)
         
-        conn.commit()
-        return {"message": f"Successfully saved {saved_count} marksheets", "saved_count": saved_count}
+        saved_count = row_counts["marksheet_uploads"]
+        logger.info(f"Saved {saved_count} marksheets for {data.user_email}: {row_counts} in {timings['total_ms']}ms")
+        return {
+            "message": f"Successfully saved {saved_count} marksheets",
+            "saved_count": saved_count,
+            "rows": row_counts,
+            "timings": timings
+        }
         
-    except HTTPException:
+    except (HTTPException, DatabaseUnavailable, PoolTimeoutError):
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        cursor.close()
-        conn.close()
+        observe_stage("db_submit", time.perf_counter() - submit_started)
+
+MARK_COLUMNS = """mark_id, upload_id, subject_name_raw, subject_code, marks_obtained, marks_total,
+                  theory_marks, practical_marks, internal_marks, external_marks,
+                  credits, grade, grade_point, marks_in_words, confidence_score, is_corrected_by_user"""
+
+PENDING_PAGE_LIMIT = 100
+PENDING_PAGE_MAX = 500
+
+async def _rows_by_upload(conn, sql, upload_ids):
+    """Run sql (with an {ids} IN-list placeholder) once for all upload ids and group rows by upload_id"""
+    grouped = {upload_id: [] for upload_id in upload_ids}
+    if not upload_ids:
+        return grouped
+    rows = await conn.fetchall(sql.format(ids=", ".join(["%s"] * len(upload_ids))), tuple(upload_ids))
+    for row in rows:
+        grouped.setdefault(row['upload_id'], []).append(row)
+    return grouped
+
+def _upload_filters(board_type=None, semester=None, alias=""):
+    """WHERE fragments and params for the optional board/semester filters"""
+    clauses, params = [], []
+    if board_type:
+        clauses.append(f"{alias}board_type = %s")
+        params.append(board_type.upper())
+    if semester is not None:
+        clauses.append(f"{alias}semester = %s")
+        params.append(semester)
+    return clauses, params
 
 @app.get("/user_marksheets/{email}")
-async def get_user_marksheets(email: str):
-    """Get all marksheets for a user with full data"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
+async def get_user_marksheets(email: str, board_type: Optional[str] = Query(None), semester: Optional[int] = Query(None)):
+    """Get all marksheets for a user with full data (optionally one board type or semester)"""
+    async with db.connection() as conn:
         logger.info(f"Fetching marksheets for email: {email}")
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        user = await conn.fetchone("SELECT user_id FROM users WHERE email = %s", (email,))
         
         if not user:
             logger.warning(f"User not found for request: {email}")
@@ -479,70 +696,119 @@ async def get_user_marksheets(email: str):
         
         logger.info(f"Found user_id: {user['user_id']} for email: {email}")
 
-        cursor.execute("""
+        clauses, params = _upload_filters(board_type, semester)
+        marksheets = await conn.fetchall(f"""
             SELECT upload_id, semester, board_type, marksheet_type, student_name_extracted,
                    roll_number, enrollment_number, father_name, mother_name, school_name,
                    school_code, course_name, session, academic_year, image_url, status,
                    uploaded_at, verified_at, admin_comment
             FROM marksheet_uploads
-            WHERE user_id = %s
+            WHERE {" AND ".join(["user_id = %s"] + clauses)}
             ORDER BY semester ASC
-        """, (user['user_id'],))
-        marksheets = cursor.fetchall()
+        """, (user['user_id'], *params))
         logger.info(f"Retrieved {len(marksheets)} marksheets from DB")
         
-        for ms in marksheets:
-            # Get extracted marks with all breakdown fields
-            cursor.execute("""
-                SELECT mark_id, subject_name_raw, subject_code, marks_obtained, marks_total,
-                       theory_marks, practical_marks, internal_marks, external_marks,
-                       credits, grade, grade_point, marks_in_words, confidence_score, is_corrected_by_user
-                FROM extracted_marks
-                WHERE upload_id = %s
-            """, (ms['upload_id'],))
-            ms['marks'] = cursor.fetchall()
-            
-            # For college marksheets, get semester results
-            if ms.get('board_type') == 'COLLEGE':
-                cursor.execute("""
-                    SELECT total_credits_registered, total_credits_earned, sgpa, cgpa, result_status
-                    FROM semester_results WHERE upload_id = %s
-                """, (ms['upload_id'],))
-                result = cursor.fetchone()
-                ms['semester_result'] = result
-        
-        return {"marksheets": marksheets}
-        
-    finally:
-        cursor.close()
-        conn.close()
+        # Extracted marks and college semester results for all uploads in one query each
+        upload_ids = [ms['upload_id'] for ms in marksheets]
+        marks = await _rows_by_upload(conn, f"""
+            SELECT {MARK_COLUMNS}
+            FROM extracted_marks
+            WHERE upload_id IN ({{ids}})
+            ORDER BY mark_id
+        """, upload_ids)
+        college_ids = [ms['upload_id'] for ms in marksheets if ms.get('board_type') == 'COLLEGE']
+        results = await _rows_by_upload(conn, """
+            SELECT upload_id, total_credits_registered, total_credits_earned, sgpa, cgpa, result_status
+            FROM semester_results WHERE upload_id IN ({ids})
+        """, college_ids)
+    
+    for ms in marksheets:
+        ms['marks'] = [{k: v for k, v in row.items() if k != 'upload_id'} for row in marks[ms['upload_id']]]
+        if ms.get('board_type') == 'COLLEGE':
+            rows = results.get(ms['upload_id'])
+            ms['semester_result'] = {k: v for k, v in rows[0].items() if k != 'upload_id'} if rows else None
+    
+    return {"marksheets": marksheets}
 
 @app.get("/api/admin/marksheets/pending")
-async def get_pending_marksheets():
-    """Get all marksheets pending verification (Admin)"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+async def get_pending_marksheets(
+    after_id: Optional[int] = Query(None, description="Return uploads after this upload_id (keyset cursor)"),
+    limit: int = Query(PENDING_PAGE_LIMIT, ge=1, le=PENDING_PAGE_MAX),
+    board_type: Optional[str] = Query(None),
+    semester: Optional[int] = Query(None),
+    order: str = Query("oldest", description="oldest, or confidence (least confident extraction first)"),
+    after_confidence: Optional[float] = Query(None, description="Cursor score for order=confidence")
+):
+    """
+    Get marksheets pending verification (Admin), one page at a time
     
-    try:
-        cursor.execute("""
-            SELECT mu.*, u.full_name, u.email
-            FROM marksheet_uploads mu
-            JOIN users u ON mu.user_id = u.user_id
-            WHERE mu.status = 'VERIFICATION_PENDING'
-            ORDER BY mu.uploaded_at ASC
-        """)
-        marksheets = cursor.fetchall()
-        
-        for ms in marksheets:
-            cursor.execute("""
-                SELECT * FROM extracted_marks WHERE upload_id = %s
-            """, (ms['upload_id'],))
-            ms['marks'] = cursor.fetchall()
+    order=oldest (default) returns uploads oldest first. Pages are keyed on
+    upload_id: pass the returned next_after_id as after_id to fetch the next
+    page. Status and board filters are served by the idx_status /
+    idx_board_type indexes (which carry upload_id as their primary-key
+    suffix, so no sort is needed).
+    
+    order=confidence is the verification queue: uploads whose least confident
+    subject row scored lowest come first (uploads without rows first of all).
+    The score is stored on the upload at submit time and pages are keyed on
+    (confidence, upload_id) through idx_status_confidence: pass
+    next_after_confidence and next_after_id back as after_confidence and
+    after_id (both or neither).
+    """
+    if order not in ("oldest", "confidence"):
+        raise HTTPException(status_code=400, detail="order must be oldest or confidence")
+    if order == "confidence" and (after_id is None) != (after_confidence is None):
+        raise HTTPException(status_code=400, detail="after_id and after_confidence must be given together")
+    clauses, params = _upload_filters(board_type, semester, alias="mu.")
+    clauses.insert(0, "mu.status = 'VERIFICATION_PENDING'")
+    
+    async with db.connection() as conn:
+        # One extra row tells whether another page exists
+        if order == "confidence":
+            if after_id is not None:
+                # Expanded rather than a row comparison so the index range applies;
+                # the column is DECIMAL, so the cursor is compared exactly
+                cursor = Decimal(str(after_confidence))
+                clauses.append("(mu.confidence > %s OR (mu.confidence = %s AND mu.upload_id > %s))")
+                params.extend([cursor, cursor, after_id])
+            marksheets = await conn.fetchall(f"""
+                SELECT mu.*, u.full_name, u.email
+                FROM marksheet_uploads mu
+                JOIN users u ON mu.user_id = u.user_id
+                WHERE {" AND ".join(clauses)}
+                ORDER BY mu.confidence ASC, mu.upload_id ASC
+                LIMIT %s
+            """, (*params, limit + 1))
+        else:
+            if after_id is not None:
+                clauses.append("mu.upload_id > %s")
+                params.append(after_id)
+            marksheets = await conn.fetchall(f"""
+                SELECT mu.*, u.full_name, u.email
+                FROM marksheet_uploads mu
+                JOIN users u ON mu.user_id = u.user_id
+                WHERE {" AND ".join(clauses)}
+                ORDER BY mu.upload_id ASC
+                LIMIT %s
+            """, (*params, limit + 1))
+        has_more = len(marksheets) > limit
+        marksheets = marksheets[:limit]
         
-        return {"pending_marksheets": marksheets}
-    finally:
-        cursor.close()
-        conn.close()
+        marks = await _rows_by_upload(conn, """
+            SELECT * FROM extracted_marks WHERE upload_id IN ({ids}) ORDER BY mark_id
+        """, [ms['upload_id'] for ms in marksheets])
+    
+    for ms in marksheets:
+        ms['marks'] = marks[ms['upload_id']]
+    
+    page = {
+        "pending_marksheets": marksheets,
+        "next_after_id": marksheets[-1]['upload_id'] if has_more else None,
+        "limit": limit
+    }
+    if order == "confidence":
+        page["next_after_confidence"] = marksheets[-1]['confidence'] if has_more else None
+    return page
 
 @app.post("/api/admin/marksheets/{upload_id}/verify")
 async def verify_marksheet(upload_id: int, status: str = Query(...), admin_id: int = Query(...), comment: Optional[str] = Query(None)):
@@ -550,30 +816,20 @@ async def verify_marksheet(upload_id: int, status: str = Query(...), admin_id: i
     if status not in ['APPROVED', 'REJECTED']:
         raise HTTPException(status_code=400, detail="Status must be APPROVED or REJECTED")
     
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("""
+    async with db.connection() as conn:
+        await conn.execute("""
             UPDATE marksheet_uploads 
             SET status = %s, verified_at = NOW(), verified_by = %s, admin_comment = %s
             WHERE upload_id = %s
         """, (status, admin_id, comment, upload_id))
-        conn.commit()
-        
-        return {"message": f"Marksheet {status.lower()}", "upload_id": upload_id}
-    finally:
-        cursor.close()
-        conn.close()
+    
+    return {"message": f"Marksheet {status.lower()}", "upload_id": upload_id}
 
 @app.get("/api/admin/marksheets/history")
 async def get_verification_history():
     """Get all verified/rejected marksheets (Admin history)"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("""
+    async with db.connection() as conn:
+        marksheets = await conn.fetchall("""
             SELECT mu.*, u.full_name, u.email, v.full_name as verifier_name
             FROM marksheet_uploads mu
             JOIN users u ON mu.user_id = u.user_id
@@ -582,11 +838,7 @@ async def get_verification_history():
             ORDER BY mu.verified_at DESC
             LIMIT 100
         """)
-        marksheets = cursor.fetchall()
-        return {"history": marksheets}
-    finally:
-        cursor.close()
-        conn.close()
+    return {"history": marksheets}
 
 # =====================================================
 # Student Request Endpoints
@@ -602,13 +854,9 @@ class StudentRequest(BaseModel):
 @app.post("/api/student/request")
 async def submit_student_request(request: StudentRequest):
     """Submit a re-upload or correction request from student"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
+    async with db.transaction() as conn:
         # Get user id
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (request.user_email,))
-        user = cursor.fetchone()
+        user = await conn.fetchone("SELECT user_id FROM users WHERE email = %s", (request.user_email,))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -623,46 +871,35 @@ async def submit_student_request(request: StudentRequest):
         if request.correction_data:
             import json
             correction_json = json.dumps(request.correction_data)
-            cursor.execute("""
+            updated = await conn.execute("""
                 UPDATE marksheet_uploads 
                 SET status = %s, admin_comment = %s, raw_json_data = %s
                 WHERE upload_id = %s AND user_id = %s
             """, (new_status, request_note, correction_json, request.upload_id, user['user_id']))
         else:
-            cursor.execute("""
+            updated = await conn.execute("""
                 UPDATE marksheet_uploads 
                 SET status = %s, admin_comment = %s
                 WHERE upload_id = %s AND user_id = %s
             """, (new_status, request_note, request.upload_id, user['user_id']))
         
-        if cursor.rowcount == 0:
+        if updated.rowcount == 0:
             raise HTTPException(status_code=404, detail="Marksheet not found or not owned by user")
-        
-        conn.commit()
-        return {"message": "Request submitted successfully", "upload_id": request.upload_id}
-    finally:
-        cursor.close()
-        conn.close()
+    
+    return {"message": "Request submitted successfully", "upload_id": request.upload_id}
 
 @app.get("/api/admin/requests/pending")
 async def get_pending_requests():
     """Get all marksheets with pending student requests"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute("""
+    async with db.connection() as conn:
+        requests = await conn.fetchall("""
             SELECT mu.*, u.full_name, u.email
             FROM marksheet_uploads mu
             JOIN users u ON mu.user_id = u.user_id
             WHERE mu.admin_comment LIKE '[STUDENT REQUEST:%'
             ORDER BY mu.uploaded_at DESC
         """)
-        requests = cursor.fetchall()
-        return {"pending_requests": requests}
-    finally:
-        cursor.close()
-        conn.close()
+    return {"pending_requests": requests}
 
 @app.post("/api/admin/requests/{upload_id}/handle")
 async def handle_student_request(upload_id: int, action: str = Query(...), admin_id: int = Query(...), comment: Optional[str] = Query(None)):
@@ -670,31 +907,28 @@ async def handle_student_request(upload_id: int, action: str = Query(...), admin
     if action not in ['APPROVE_REUPLOAD', 'DENY']:
         raise HTTPException(status_code=400, detail="Action must be APPROVE_REUPLOAD or DENY")
     
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
+    async with db.connection() as conn:
         if action == 'APPROVE_REUPLOAD':
             # Allow student to re-upload by setting status back to processing
-            cursor.execute("""
+            await conn.execute("""
                 UPDATE marksheet_uploads 
                 SET status = 'PROCESSING', admin_comment = %s, verified_at = NOW(), verified_by = %s
                 WHERE upload_id = %s
             """, (f"Re-upload approved. {comment or ''}", admin_id, upload_id))
         else:
             # Deny the request
-            cursor.execute("""
+            await conn.execute("""
                 UPDATE marksheet_uploads 
                 SET status = 'APPROVED', admin_comment = %s, verified_at = NOW(), verified_by = %s
                 WHERE upload_id = %s
             """, (f"Request denied. {comment or ''}", admin_id, upload_id))
-        
-        conn.commit()
-        return {"message": f"Request {action.lower()}", "upload_id": upload_id}
-    finally:
-        cursor.close()
-        conn.close()
+    
+    return {"message": f"Request {action.lower()}", "upload_id": upload_id}
+
 
+# Everything above runs at import; the startup handlers add their own time
+STARTUP_TIMINGS = {"import_seconds": round(time.perf_counter() - IMPORT_STARTED, 3)}
+observe_stage("api_import", STARTUP_TIMINGS["import_seconds"])
 
 # =====================================================
 # Run Server
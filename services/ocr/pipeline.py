@@ -6,6 +6,7 @@ Integrates preprocessing, logo detection, face detection, and table verification
 import os
 import sys
 import json
+import time
 import argparse
 from pathlib import Path
 import cv2
@@ -20,15 +21,19 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
 
 # Import core modules
 from preprocess import preprocess_marksheet
-from scripts.detectLogo import detect_logo
+from scripts.detectLogo import detect_logo_detection
 from scripts.facedetector import detect_candidate_photo
-from scripts.predict_table import process_single_image as detect_tables
+from scripts.predict_table import detect_tables_with_boxes_and_scores
+from scripts import model_registry
+from scripts.image_context import ImageContext
+from scripts.metrics import observe_stage
+from annotation import annotation_record, draw_annotations
 # Defer OCR/extractor imports to runtime to avoid import-time failures when env/config missing
 # from scripts.ocr import process_image_with_tables as ocr_process_image_with_tables
 # from scripts.extractor import create_final_results_dir as extractor_create_results_dir, process_file as extractor_process_file
 
 
-def create_annotated_image(image_path, logo_result, face_result, table_result, output_path, logo_model_path, table_model_path, board_name=None):
+def create_annotated_image(image_path, logo_result, face_result, table_result, output_path, logo_model_path, table_model_path, board_name=None, ctx=None, logo_boxes=None, table_data=None):
     """
     Create a single annotated image with all detections marked with bounding boxes
     
@@ -41,94 +46,58 @@ def create_annotated_image(image_path, logo_result, face_result, table_result, o
         logo_model_path: Path to logo detection model
         table_model_path: Path to table detection model
         board_name: Detected board name (e.g., "ICSE", "CBSE", "Uttarakhand")
+        ctx: Optional ImageContext with the already decoded image
+        logo_boxes: Logo boxes from the detection stage ([x1, y1, x2, y2] list);
+            the logo model is only re-run when this is None
+        table_data: Table detections from the detection stage ([(box, label, confidence), ...]);
+            the table model is only re-run when this is None
     """
-    # Load the original image
-    logger.info(f"Loading image for annotation: {image_path}")
-    image = cv2.imread(image_path)
-    if image is None:
-        logger.info(f"Failed to load image: {image_path}")
-        return False
-    
-    logger.info(f"Image loaded successfully, shape: {image.shape}")
-    
-    # Ensure portrait orientation
-    height, width = image.shape[:2]
-    if width > height:
-        image = cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    if ctx is not None:
+        # Draw on a copy so the shared portrait image stays clean for other stages
+        image = ctx.portrait.copy()
+    else:
+        # Load the original image
+        logger.info(f"Loading image for annotation: {image_path}")
+        image = cv2.imread(image_path)
+        if image is None:
+            logger.info(f"Failed to load image: {image_path}")
+            return False
+        
+        # Ensure portrait orientation
+        height, width = image.shape[:2]
+        if width > height:
+            image = cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
     
-    # Define colors for different annotations
-    colors = {
-        'logo': (0, 255, 0),      # Green
-        'face': (255, 0, 0),      # Blue  
-        'table': (0, 0, 255),     # Red
-        'text': (255, 255, 255)   # White
-    }
+    logger.info(f"Annotating image, shape: {image.shape}")
     
-    # Draw logo detection boxes
-    if logo_result != -1:
+    # Boxes normally come from the detection stages; a model only runs again
+    # for callers that do not pass them
+    if logo_result != -1 and logo_boxes is None:
         try:
-            from detectLogo import detect_logo_with_boxes
+            from scripts.detectLogo import detect_logo_with_boxes
             logger.info(f"Detecting logo boxes for result: {logo_result}")
-            logo_boxes = detect_logo_with_boxes(image_path, logo_model_path)
-            logger.info(f"Found {len(logo_boxes)} logo boxes")
-            for box in logo_boxes:
-                x1, y1, x2, y2 = box
-                cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), colors['logo'], 4)
-                cv2.putText(image, "LOGO", (int(x1), int(y1)-15), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, colors['logo'], 3)
+            logo_boxes = detect_logo_with_boxes(image_path, logo_model_path, ctx=ctx)
         except Exception as e:
             logger.info(f"Logo detection failed: {e}")
-            pass  # If logo detection fails, continue without boxes
     
-    # Draw face detection boxes
-    if face_result["photo_detected"] == 1:
+    face_boxes = face_result.get("boxes")
+    if face_result["photo_detected"] == 1 and face_boxes is None:
         try:
-            # Crop to top 30% where photos usually appear
-            height = image.shape[0]
-            img_cropped = image[:int(height * 0.3), :]
-            gray = cv2.cvtColor(img_cropped, cv2.COLOR_BGR2GRAY)
-            
-            # Use Haar cascade face detector
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-            
-            logger.info(f"Found {len(faces)} faces")
-            for (x, y, w, h) in faces:
-                cv2.rectangle(image, (x, y), (x+w, y+h), colors['face'], 4)
-                cv2.putText(image, "FACE", (x, y-15), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, colors['face'], 3)
+            face_boxes = detect_candidate_photo(image_path, logo_result, ctx=ctx)["boxes"]
         except Exception as e:
             logger.info(f"Face detection failed: {e}")
-            pass  # If face detection fails, continue without boxes
     
-    # Draw table detection boxes
-    if table_result == 1:
+    if table_result == 1 and table_data is None:
         try:
-            from predict_table import detect_tables_with_boxes_and_scores
             logger.info(f"Detecting table boxes for result: {table_result}")
-            table_data = detect_tables_with_boxes_and_scores(image_path, table_model_path)
-            logger.info(f"Found {len(table_data)} table boxes")
-            for i, (box, label, confidence) in enumerate(table_data):
-                x1, y1, x2, y2 = box
-                table_type = "INFO_TABLE" if label == 0 else "MARKS_TABLE"
-                # Draw thicker rectangle for better visibility
-                cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), colors['table'], 4)
-                # Draw label with confidence score
-                label_text = f"{table_type} ({confidence:.2f})"
-                cv2.putText(image, label_text, (int(x1), int(y1)-15), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, colors['table'], 3)
+            table_data = detect_tables_with_boxes_and_scores(image_path, table_model_path, ctx=ctx)
         except Exception as e:
             logger.info(f"Table detection failed: {e}")
-            pass  # If table detection fails, continue without boxes
     
-    # Add overall status text (ICSE may not contain a photo on some marksheets)
-    is_icse = (str(board_name).upper() == "ICSE") if board_name else False
-    is_valid = (logo_result != -1 and table_result == 1 and (face_result["photo_detected"] == 1 or is_icse))
-    overall_status = "VALID MARKSHEET" if is_valid else "INVALID MARKSHEET"
-    status_color = (0, 255, 0) if overall_status == "VALID MARKSHEET" else (0, 0, 255)
-    
-    cv2.putText(image, f"Status: {overall_status}", (10, 40), 
-               cv2.FONT_HERSHEY_SIMPLEX, 1.5, status_color, 4)
+    draw_annotations(
+        image, logo_result, face_result["photo_detected"], table_result, board_name,
+        logo_boxes=logo_boxes or [], face_boxes=face_boxes or [], table_data=table_data or []
+    )
     
     # Save annotated image
     logger.info(f"Saving annotated image to: {output_path}")
@@ -141,19 +110,57 @@ def create_annotated_image(image_path, logo_result, face_result, table_result, o
         return False
 
 
+def _notify(progress, stage):
+    """Report a stage transition to an optional progress callback without failing the pipeline"""
+    if progress is None:
+        return
+    try:
+        progress(stage)
+    except Exception as e:
+        logger.debug(f"Progress callback failed for stage {stage}: {e}")
+
+
+class _StageClock:
+    """Wall time per pipeline stage, measured from one stage start to the next and recorded in the stage histogram"""
+    
+    def __init__(self, timings, progress=None):
+        self.timings = timings
+        self.progress = progress
+        self._stage = None
+        self._started = None
+    
+    def start(self, stage):
+        self.stop()
+        _notify(self.progress, stage)
+        self._stage = stage
+        self._started = time.perf_counter()
+    
+    def stop(self):
+        if self._stage is not None:
+            elapsed = time.perf_counter() - self._started
+            self.timings[self._stage] = round(self.timings.get(self._stage, 0.0) + elapsed, 4)
+            observe_stage(self._stage, elapsed)
+            self._stage = None
+
+
 class MarksheetProcessor:
     """Complete marksheet processing pipeline"""
     
-    def __init__(self, logo_model_path="models\\logo.pt", table_model_path="models\\tt_finetuned"):
+    def __init__(self, logo_model_path="models\\logo.pt", table_model_path="models\\tt_finetuned", preload=False, batched_logo=None):
         """
         Initialize the marksheet processor
         
         Args:
             logo_model_path: Path to logo detection model
             table_model_path: Path to table detection model
+            preload: Load both models into the process-wide registry and run a
+                warm-up inference now instead of on the first request
+            batched_logo: Score all logo contrast variants in one batched YOLO pass
+                (None uses the LOGO_BATCHED_CONTRAST environment setting)
         """
         self.logo_model_path = logo_model_path
         self.table_model_path = table_model_path
+        self.batched_logo = batched_logo
         
         # Verify model paths exist
         if not os.path.exists(logo_model_path):
@@ -161,19 +168,58 @@ class MarksheetProcessor:
         
         if not os.path.exists(table_model_path):
             logger.info(f"Warning: Table model not found at {table_model_path}")
+        
+        if preload:
+            self.preload_models()
     
-    def process_single_marksheet(self, image_path, output_dir=None, save_intermediate=False):
+    def preload_models(self):
+        """Load and warm up the logo and table models so later calls reuse them"""
+        try:
+            return model_registry.warmup(self.logo_model_path, self.table_model_path)
+        except Exception as e:
+            logger.warning(f"Model preload failed, models will load on first use: {e}")
+            return None
+    
+    def _refine_extraction(self, extracted_data, marks_text, board_name, image_path, ctx, results):
+        """Score the extracted subjects and re-OCR the marks table rows that score low"""
+        from scripts.field_confidence import REOCR_SCALE, refine_extraction
+        from scripts.ocr import get_max_confidence_table, process_row_bands
+
+        marks_table = get_max_confidence_table(results["table_detection"].get("table_coordinates", []), "Marks Table")
+        ocr_bands = None
+        if marks_table:
+            def ocr_bands(bands):
+                # Same margin as the marks crop in process_image_with_tables
+                return process_row_bands(image_path, marks_table["coordinates"], bands, margin_ratio=0.10,
+                                         scale=REOCR_SCALE, ctx=ctx, label=Path(image_path).stem,
+                                         timings=results["timings"])
+        confidence = refine_extraction(extracted_data, marks_text, board_name, ocr_bands)
+        logger.info(f"Extraction confidence: {confidence['document']:.2f} "
+                    f"({sum(s['reocr'] for s in confidence['subjects'])} rows re-read)")
+        return confidence
+    
+    def process_single_marksheet(self, image_path, output_dir=None, save_intermediate=False, ctx=None, progress=None, precomputed=None, annotate=True):
         """
         Process a single marksheet through the complete pipeline
         
         Args:
             image_path: Path to input marksheet image
             output_dir: Directory to save results (optional)
-            save_intermediate: Whether to save intermediate processing steps (ignored - only saves final annotated image)
+            save_intermediate: Also write debug artifacts (preprocessed image, detection JSON,
+                table coordinates and OCR text files); OCR itself never needs them
+            ctx: Optional ImageContext; when omitted the image is decoded once here and shared by every stage
+            progress: Optional callable invoked with the stage name as each stage starts
+            precomputed: Optional detections from a batched run over several images:
+                {"logo": detect_logo_detection() dict, "tables": [(box, label, confidence), ...],
+                 "timings": {stage: seconds}}; those stages are not run again
+            annotate: Write the annotated JPEG now. The API passes False and renders
+                results["annotation"] on demand instead (see annotation.py)
             
         Returns:
-            dict: Complete processing results
+            dict: Complete processing results, including per-stage wall time in "timings"
+            and the detections needed to draw the annotated image in "annotation"
         """
+        precomputed = precomputed or {}
         logger.info(f"=== Processing Marksheet: {os.path.basename(image_path)} ===")
         
         # Initialize results dictionary
@@ -183,40 +229,56 @@ class MarksheetProcessor:
             "logo_detection": {},
             "face_detection": {},
             "table_detection": {},
-            "overall_status": "unknown"
+            "overall_status": "unknown",
+            "timings": dict(precomputed.get("timings", {}))
         }
+        clock = _StageClock(results["timings"], progress)
         
         try:
+            # Decode once; every stage below reads from the shared context
+            if ctx is None:
+                ctx = ImageContext.from_path(image_path)
+            
             # Step 1: Preprocessing (cropping only) - save cropped image
             logger.info("Step 1: Preprocessing marksheet (cropping only)...")
+            clock.start("preprocess")
             processed_image, original_image, crop_coords = preprocess_marksheet(
                 image_path, 
                 output_path=None,  # We'll handle saving separately
-                save_intermediate=False  # No intermediate saves
+                save_intermediate=False,  # No intermediate saves
+                ctx=ctx
             )
             
-            # Save the preprocessed (cropped) image
             if output_dir:
                 output_path = Path(output_dir)
                 output_path.mkdir(exist_ok=True)
-                preprocessed_path = output_path / f"{Path(image_path).stem}_preprocessed.jpg"
             else:
-                preprocessed_path = Path(image_path).parent / f"{Path(image_path).stem}_preprocessed.jpg"
-            
-            cv2.imwrite(str(preprocessed_path), processed_image)
+                output_path = Path(image_path).parent
             
             results["preprocessing"] = {
                 "status": "success",
                 "crop_coordinates": crop_coords,
-                "processed_image_shape": processed_image.shape,
-                "preprocessed_image": str(preprocessed_path)
+                "processed_image_shape": processed_image.shape
             }
             
-            logger.info(f"[OK] Preprocessing completed - Cropped image saved to: {preprocessed_path}")
+            # Save the preprocessed (cropped) image only as a debug artifact
+            if save_intermediate:
+                preprocessed_path = output_path / f"{Path(image_path).stem}_preprocessed.jpg"
+                cv2.imwrite(str(preprocessed_path), processed_image)
+                results["preprocessing"]["preprocessed_image"] = str(preprocessed_path)
+                logger.info(f"[OK] Preprocessing completed - Cropped image saved to: {preprocessed_path}")
+            else:
+                logger.info(f"[OK] Preprocessing completed - Crop: {crop_coords}")
             
             # Step 2: Logo Detection
             logger.info("Step 2: Detecting board logo...")
-            logo_result = detect_logo(image_path, self.logo_model_path)
+            if "logo" in precomputed:
+                clock.stop()
+                logo_detection = precomputed["logo"]
+            else:
+                clock.start("logo")
+                logo_detection = detect_logo_detection(image_path, self.logo_model_path, ctx=ctx, batched=self.batched_logo)
+            logo_result = logo_detection["class_id"]
             
             board_names = {0: "Uttarakhand", 1: "CBSE", 2: "ICSE", -1: "Unknown"}
             board_name = board_names.get(logo_result, "Unknown")
@@ -225,59 +287,65 @@ class MarksheetProcessor:
                 "status": "success",
                 "board_id": logo_result,
                 "board_name": board_name,
-                "detected": logo_result != -1
+                "detected": logo_result != -1,
+                "confidence": logo_detection["confidence"],
+                "box": logo_detection["box"]
             }
             
             logger.info(f"[OK] Logo detection completed - Board: {board_name}")
             
             # Step 3: Face Detection
             logger.info("Step 3: Detecting candidate photo...")
-            face_result = detect_candidate_photo(image_path, logo_result)
+            clock.start("face")
+            face_result = detect_candidate_photo(image_path, logo_result, ctx=ctx, logo_box=logo_detection["box"])
             
             results["face_detection"] = {
                 "status": "success",
                 "photo_detected": face_result["photo_detected"],
-                "board": face_result["board"]
+                "board": face_result["board"],
+                "boxes": face_result["boxes"]
             }
             
             logger.info(f"[OK] Face detection completed - Photo detected: {face_result['photo_detected']}")
             
             # Step 4: Table Detection
             logger.info("Step 4: Detecting tables...")
-            table_result = detect_tables(
-                image_path,
-                model_path=self.table_model_path,
-                confidence_threshold=0.5,
-                info_threshold=0.5,
-                marks_threshold=0.8,
-                save_results=False,  # No matplotlib popup
-                fix_orientation=True
-            )
+            # Single inference pass; boxes, labels and scores are reused for
+            # the tables flag, the saved coordinates, OCR cropping and annotation
+            if "tables" in precomputed:
+                clock.stop()
+                table_data = precomputed["tables"]
+            else:
+                clock.start("table")
+                table_data = detect_tables_with_boxes_and_scores(
+                    image_path,
+                    self.table_model_path,
+                    confidence_threshold=0.5,
+                    info_threshold=0.5,
+                    marks_threshold=0.8,
+                    fix_orientation=True,
+                    ctx=ctx
+                )
+            table_result = 1 if table_data else 0
             
-            # Get table coordinates and confidence scores for saving
+            # Table coordinates and confidence scores for saving
             table_coordinates = []
-            if table_result == 1:
-                try:
-                    from predict_table import detect_tables_with_boxes_and_scores
-                    table_data = detect_tables_with_boxes_and_scores(image_path, self.table_model_path)
-                    for i, (box, label, confidence) in enumerate(table_data):
-                        x1, y1, x2, y2 = box
-                        table_type = "Information Table" if label == 0 else "Marks Table"
-                        table_coordinates.append({
-                            "table_id": i + 1,
-                            "table_type": table_type,
-                            "confidence": float(confidence),
-                            "coordinates": {
-                                "x1": float(x1),
-                                "y1": float(y1), 
-                                "x2": float(x2),
-                                "y2": float(y2)
-                            },
-                            "width": float(x2 - x1),
-                            "height": float(y2 - y1)
-                        })
-                except Exception as e:
-                    logger.info(f"Failed to get table coordinates: {e}")
+            for i, (box, label, confidence) in enumerate(table_data):
+                x1, y1, x2, y2 = box
+                table_type = "Information Table" if label == 0 else "Marks Table"
+                table_coordinates.append({
+                    "table_id": i + 1,
+                    "table_type": table_type,
+                    "confidence": float(confidence),
+                    "coordinates": {
+                        "x1": float(x1),
+                        "y1": float(y1), 
+                        "x2": float(x2),
+                        "y2": float(y2)
+                    },
+                    "width": float(x2 - x1),
+                    "height": float(y2 - y1)
+                })
             
             results["table_detection"] = {
                 "status": "success",
@@ -286,7 +354,7 @@ class MarksheetProcessor:
                 "table_coordinates": table_coordinates
             }
             
-            logger.info(f"[OK] Table detection completed - Tables found: {table_result}")
+            logger.info(f"[OK] Table detection completed - Tables found: {table_result} ({len(table_data)} boxes)")
             
             # Determine overall status (ICSE photo optional)
             is_icse = (board_name == "ICSE")
@@ -303,47 +371,60 @@ class MarksheetProcessor:
             else:
                 results["overall_status"] = "partial_match"
             
-            # Save intermediate detection results as JSON (needed by OCR module)
-            if output_dir:
+            # Detection JSON and table coordinates are debug artifacts only;
+            # the OCR stage reads the in-memory results dict directly
+            if save_intermediate:
                 results_path = output_path / f"{Path(image_path).stem}_result.json"
-            else:
-                results_path = Path(image_path).parent / f"{Path(image_path).stem}_result.json"
-            
-            try:
-                with open(results_path, 'w') as f:
-                    json.dump(results, f, indent=2)
-                logger.info(f"[OK] Results saved to: {results_path}")
-                results["results_file"] = str(results_path)
-            except Exception as e:
-                logger.info(f"[ERR] Failed to save results JSON: {e}")
-            
-            # Persist table coordinates JSON to processed directory
-            try:
-                # Use absolute path to processed dir relative to backend root
-                processed_dir = Path("processed")
-                processed_dir.mkdir(parents=True, exist_ok=True)
-                coords_out_path = processed_dir / f"{Path(image_path).stem}_table_coords.json"
-                with open(coords_out_path, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        "file": str(image_path),
-                        "table_coordinates": results["table_detection"].get("table_coordinates", [])
-                    }, f, indent=2)
-                logger.info(f"[OK] Table coordinates saved to: {coords_out_path}")
-            except Exception as e:
-                logger.info(f"[ERR] Failed to save table coordinates JSON: {e}")
+                try:
+                    with open(results_path, 'w') as f:
+                        json.dump(results, f, indent=2)
+                    logger.info(f"[OK] Results saved to: {results_path}")
+                    results["results_file"] = str(results_path)
+                except Exception as e:
+                    logger.info(f"[ERR] Failed to save results JSON: {e}")
+                
+                # Persist table coordinates JSON to processed directory
+                try:
+                    processed_dir = Path("processed")
+                    processed_dir.mkdir(parents=True, exist_ok=True)
+                    coords_out_path = processed_dir / f"{Path(image_path).stem}_table_coords.json"
+                    with open(coords_out_path, 'w', encoding='utf-8') as f:
+                        json.dump({
+                            "file": str(image_path),
+                            "table_coordinates": results["table_detection"].get("table_coordinates", [])
+                        }, f, indent=2)
+                    logger.info(f"[OK] Table coordinates saved to: {coords_out_path}")
+                except Exception as e:
+                    logger.info(f"[ERR] Failed to save table coordinates JSON: {e}")
 
             # Run OCR on detected tables and extract structured data JSON via new module
+            clock.start("ocr")
             try:
                 # Lazy import to avoid import-time failures if environment is not set up
                 from scripts.ocr import process_image_with_tables as ocr_process_image_with_tables
-                from scripts.extractor import create_final_results_dir as extractor_create_results_dir, process_file as extractor_process_file
+                from scripts.extractor import create_final_results_dir as extractor_create_results_dir, extract_from_texts
                 # Ensure output dirs used by the new module exist
                 extractor_create_results_dir()
-                # Generate info and marks text files in ./results using the detection JSON
-                ocr_process_image_with_tables(image_path, str(results_path))
-                # Use extractor to parse the OCR text files and build final JSON
+                # OCR the table crops straight from the decoded image and detection results
                 base_filename = Path(image_path).stem
-                extracted_data = extractor_process_file(base_filename, board_name)
+                texts = ocr_process_image_with_tables(
+                    image_path, ctx=ctx, detections=results,
+                    debug_dir="processed" if save_intermediate else None,
+                    timings=results["timings"]
+                )
+                clock.start("extract")
+                # Parse the OCR text into the board-specific structured JSON
+                if texts["info"] is not None and texts["marks"] is not None:
+                    extracted_data = extract_from_texts(texts["info"], texts["marks"], board_name, label=base_filename)
+                else:
+                    logger.info(f"[ERR] Missing OCR text for {base_filename}")
+                    extracted_data = None
+                if extracted_data:
+                    clock.start("reocr")
+                    try:
+                        self._refine_extraction(extracted_data, texts["marks"], board_name, image_path, ctx, results)
+                    except Exception as e:
+                        logger.info(f"[ERR] Confidence scoring failed: {e}")
                 final_json_path = Path("processed") / f"{base_filename}.json"
                 if extracted_data:
                     try:
@@ -362,24 +443,33 @@ class MarksheetProcessor:
             except Exception as e:
                 logger.info(f"[ERR] OCR/Extraction step failed: {e}")
             
+            # Detections for drawing the annotated image later without any model
+            results["annotation"] = annotation_record(results)
+            
             # (Optional) Create and save annotated image - not required for final outputs
-            # Keeping this step non-blocking to prioritize requested outputs
-            try:
-                if output_dir:
-                    output_path = Path(output_dir)
-                    output_path.mkdir(exist_ok=True)
-                    annotated_path = output_path / f"{Path(image_path).stem}_annotated.jpg"
-                else:
-                    annotated_path = Path(image_path).parent / f"{Path(image_path).stem}_annotated.jpg"
-                success = create_annotated_image(
-                    image_path, logo_result, face_result, table_result, str(annotated_path),
-                    self.logo_model_path, self.table_model_path, board_name
-                )
-                if success:
-                    results["annotated_image"] = str(annotated_path)
-                    logger.info(f"[OK] Annotated image saved to: {annotated_path}")
-            except Exception as e:
-                logger.info(f"(Non-blocking) Annotated image creation failed: {e}")
+            if annotate:
+                clock.start("annotate")
+                # Keeping this step non-blocking to prioritize requested outputs
+                try:
+                    if output_dir:
+                        output_path = Path(output_dir)
+                        output_path.mkdir(exist_ok=True)
+                        annotated_path = output_path / f"{Path(image_path).stem}_annotated.jpg"
+                    else:
+                        annotated_path = Path(image_path).parent / f"{Path(image_path).stem}_annotated.jpg"
+                    success = create_annotated_image(
+                        image_path, logo_result, face_result, table_result, str(annotated_path),
+                        self.logo_model_path, self.table_model_path, board_name, ctx=ctx,
+                        logo_boxes=[logo_detection["box"]] if logo_detection["box"] is not None else [],
+                        table_data=table_data
+                    )
+                    if success:
+                        results["annotated_image"] = str(annotated_path)
+                        logger.info(f"[OK] Annotated image saved to: {annotated_path}")
+                except Exception as e:
+                    logger.info(f"(Non-blocking) Annotated image creation failed: {e}")
+            
+            clock.stop()
             
             logger.info(f"\n=== Processing Complete ===")
             logger.info(f"Overall Status: {results['overall_status']}")
@@ -391,78 +481,46 @@ class MarksheetProcessor:
             logger.error(f"Error processing marksheet: {e}", exc_info=True)
             results["overall_status"] = "error"
             results["error"] = str(e)
+        finally:
+            clock.stop()
         
         return results
     
-    def process_batch(self, input_dir, output_dir=None, save_intermediate=False):
+    def process_batch(self, input_dir, output_dir=None, save_intermediate=False,
+                      workers=None, batch_size=None, max_inflight_ocr=None, resume=True):
         """
         Process all marksheets in a directory
         
+        Images are processed in chunks by a pool of worker processes (see batch.py):
+        logo and table detection run batched across each chunk, remote OCR calls
+        share a bounded in-flight window, and progress is kept in a resumable
+        manifest in the output directory.
+        
         Args:
             input_dir: Directory containing input images
             output_dir: Directory to save results
             save_intermediate: Whether to save intermediate processing steps
+            workers: Worker processes (1 runs in this process with this processor's models)
+            batch_size: Images per batched detection call
+            max_inflight_ocr: Remote OCR jobs in flight across all workers
+            resume: Skip images already finished according to the manifest
             
         Returns:
-            list: List of processing results for each image
+            list: List of processing results for each image processed in this run
         """
-        input_path = Path(input_dir)
+        from batch import run_batch, print_throughput_report
         
-        if output_dir is None:
-            output_path = input_path / "results"
-        else:
-            output_path = Path(output_dir)
-        
-        # Create output directory
-        output_path.mkdir(exist_ok=True)
-        
-        # Get all image files
-        image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
-        image_files = [f for f in input_path.iterdir() 
-                      if f.suffix.lower() in image_extensions]
-        
-        if not image_files:
-            logger.info(f"No images found in {input_dir}")
+        all_results, report = run_batch(
+            self, input_dir, output_dir, save_intermediate,
+            workers=workers, batch_size=batch_size,
+            max_inflight_ocr=max_inflight_ocr, resume=resume
+        )
+        if not all_results:
             return []
         
-        logger.info(f"Processing {len(image_files)} marksheets...")
-        
-        all_results = []
-        
-        for i, image_file in enumerate(image_files):
-            logger.info(f"\n{'='*60}")
-            logger.info(f"Processing {i+1}/{len(image_files)}: {image_file.name}")
-            logger.info(f"{'='*60}")
-            
-            try:
-                result = self.process_single_marksheet(
-                    str(image_file), 
-                    str(output_path), 
-                    save_intermediate
-                )
-                all_results.append(result)
-                
-                # Save individual result (optional - only if needed for debugging)
-                # result_file = output_path / f"{image_file.stem}_result.json"
-                # with open(result_file, 'w') as f:
-                #     json.dump(result, f, indent=2)
-                
-            except Exception as e:
-                logger.info(f"Error processing {image_file.name}: {e}")
-                error_result = {
-                    "input_image": str(image_file),
-                    "overall_status": "error",
-                    "error": str(e)
-                }
-                all_results.append(error_result)
-        
-        # Save summary results (optional - only if needed for debugging)
-        # summary_file = output_path / "processing_summary.json"
-        # with open(summary_file, 'w') as f:
-        #     json.dump(all_results, f, indent=2)
-        
         # Print summary
         self.print_batch_summary(all_results)
+        print_throughput_report(report)
         
         return all_results
     
@@ -511,6 +569,12 @@ def main():
                        help="Path to table detection model")
     parser.add_argument("--save-intermediate", action="store_true",
                        help="Save intermediate processing steps")
+    parser.add_argument("--batched-logo", action="store_true", default=None,
+                       help="Run all logo contrast variants as one batched inference")
+    parser.add_argument("--workers", type=int, default=None,
+                       help="Worker processes for --dir (default: OCR_BATCH_WORKERS)")
+    parser.add_argument("--no-resume", action="store_true",
+                       help="Reprocess images already recorded in the batch manifest")
     
     args = parser.parse_args()
     
@@ -522,7 +586,7 @@ def main():
         return
     
     # Initialize processor
-    processor = MarksheetProcessor(args.logo_model, args.table_model)
+    processor = MarksheetProcessor(args.logo_model, args.table_model, batched_logo=args.batched_logo)
     
     if args.image:
         if not os.path.exists(args.image):
@@ -563,7 +627,8 @@ def main():
             print(f"Directory not found: {args.dir}")
             return
         
-        processor.process_batch(args.dir, args.output, args.save_intermediate)
+        processor.process_batch(args.dir, args.output, args.save_intermediate,
+                                workers=args.workers, resume=not args.no_resume)
 
 
 if __name__ == "__main__":
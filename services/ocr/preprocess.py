@@ -8,13 +8,19 @@ Provides a simple pipeline:
 - Reduce saturation slightly to stabilize OCR
 
 Returns (processed_image, original_image, crop_coords)
-where crop_coords = (x1, y1, x2, y2) in original image coordinates.
+where crop_coords = (x1, y1, x2, y2) in full-resolution portrait coordinates.
+
+The contour search and the enhancement run on the downscaled detection proxy
+of the ImageContext; processed_image is therefore at proxy resolution and is
+only meant for inspection. OCR crops are cut from the full-resolution image.
 """
 
 from typing import Tuple, Optional
 import cv2
 import numpy as np
 
+from scripts.image_context import ImageContext
+
 
 def _find_largest_contour_cropping_box(image_gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
     """
@@ -70,7 +76,8 @@ def _apply_contrast_and_saturation(img_bgr: np.ndarray) -> np.ndarray:
 
 def preprocess_marksheet(image_path: str,
                          output_path: Optional[str] = None,
-                         save_intermediate: bool = False):
+                         save_intermediate: bool = False,
+                         ctx=None):
     """
     Load an image, crop to the marksheet region, enhance contrast and reduce saturation.
 
@@ -78,21 +85,20 @@ def preprocess_marksheet(image_path: str,
         image_path: Path to the input image
         output_path: Optional path to save the processed image (unused when None)
         save_intermediate: Whether to save intermediate images (not used; kept for compatibility)
+        ctx: Optional ImageContext holding the already decoded image; image_path is not read when given
 
     Returns:
-        processed_image (np.ndarray), original_image (np.ndarray), crop_coords (x1,y1,x2,y2)
+        processed_image (np.ndarray) at detection-proxy resolution, original_image (np.ndarray),
+        crop_coords (x1,y1,x2,y2) in full-resolution portrait coordinates
     """
-    original = cv2.imread(image_path)
-    if original is None:
-        raise FileNotFoundError(f"Failed to read image: {image_path}")
-
-    # Ensure portrait orientation similar to downstream expectations
-    h, w = original.shape[:2]
-    img = original.copy()
-    if w > h:
-        img = cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if ctx is None:
+        ctx = ImageContext.from_path(image_path)
+    original = ctx.bgr
+    # Portrait variants are shared with the other stages
+    full_h, full_w = ctx.portrait.shape[:2]
+    img = ctx.proxy_portrait
+    gray = ctx.proxy_portrait_gray
+    scale = ctx.proxy_scale
 
     # Find crop box
     crop_box = _find_largest_contour_cropping_box(gray)
@@ -107,6 +113,10 @@ def preprocess_marksheet(image_path: str,
         cropped = img
         x1, y1, x2, y2 = 0, 0, img.shape[1], img.shape[0]
 
+    # Back to full-resolution portrait coordinates
+    x1, y1 = min(full_w, int(x1 * scale)), min(full_h, int(y1 * scale))
+    x2, y2 = min(full_w, int(round(x2 * scale))), min(full_h, int(round(y2 * scale)))
+
     # Enhance
     enhanced = _apply_contrast_and_saturation(cropped)
 
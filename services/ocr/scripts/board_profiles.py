@@ -0,0 +1,592 @@
+"""
+Board-profile extraction engine.
+
+A board profile is plain data: the result fields in output order, the
+patterns that fill them from the info table text, and how lines of the marks
+table are classified into subjects. Profiles are compiled once (every regex is
+precompiled) and kept in a registry keyed by board, so a new board only needs
+a profile, not a new extractor function.
+
+Each marks line is classified in a single pass: the profile's skip pattern and
+subject rules are joined into one alternation, and the matching alternative's
+groups are handed to the rule's layout, which turns them into a subject dict.
+Layouts are the only code a board can need; the built-in ones are listed in
+LAYOUTS and more can be added with register_layout().
+
+Profiles beyond the built-in CBSE, Uttarakhand and ICSE ones are loaded from
+OCR_BOARD_PROFILES (a JSON file, or a directory of them) holding specs in the
+same format as the dicts below.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+_WHITESPACE = re.compile(r'\s+')
+_MARK_NUMBERS = re.compile(r'\d{2,3}')
+
+DIGIT_WORDS = {
+    '0': 'ZERO', '1': 'ONE', '2': 'TWO', '3': 'THREE', '4': 'FOUR',
+    '5': 'FIVE', '6': 'SIX', '7': 'SEVEN', '8': 'EIGHT', '9': 'NINE'
+}
+
+
+def clean_text(text: str) -> Optional[str]:
+    """Clean and normalize text"""
+    if not text:
+        return None
+    cleaned = _WHITESPACE.sub(' ', text.strip())
+    return cleaned if cleaned else None
+
+
+def digits_to_words(digits: int) -> str:
+    """
+    Convert digits to words character by character.
+    Example: 69 becomes "SIX NINE", 91 becomes "NINE ONE"
+    """
+    return ' '.join(DIGIT_WORDS[digit] for digit in str(digits))
+
+
+def _flags(spec: str) -> int:
+    """Regex flags from letters: i (IGNORECASE), s (DOTALL), m (MULTILINE)"""
+    flags = 0
+    for letter in spec or "":
+        flags |= {"i": re.IGNORECASE, "s": re.DOTALL, "m": re.MULTILINE}[letter]
+    return flags
+
+
+# =====================================================
+# Subject layouts: matched groups -> subject dict
+# =====================================================
+
+def _parse_mark(value):
+    if value and value.lower() != "xxx":
+        return int(value)
+    return None
+
+
+def _cbse_columns(groups, rule):
+    """Code, name, theory/practical/total columns ("xxx" = absent) and grade"""
+    code = groups.get("code")
+    name = clean_text(groups.get("name"))
+    if not (code and name):
+        return None
+    total = _parse_mark(groups.get("total"))
+    return {
+        "code": code,
+        "name": name,
+        "theory_marks": _parse_mark(groups.get("theory")),
+        "practical_marks": _parse_mark(groups.get("practical")),
+        "total_marks": total,
+        "total_in_words": digits_to_words(total) if total is not None else None,
+        "grade": groups.get("grade") or None
+    }
+
+
+def _numbered_columns(groups, rule):
+    """
+    Code, name and a free-form marks tail whose numbers are assigned by the
+    rule's "columns" layout for the subject (e.g. theory, practical, total);
+    other subjects take the first number as theory and the last as total.
+    """
+    code = groups.get("code")
+    name = clean_text(groups.get("name"))
+    if not (code and name):
+        return None
+    marks_list = [int(x) for x in _MARK_NUMBERS.findall(groups.get("marks") or "")]
+
+    values = {"theory": None, "practical": None, "internal": None, "total": None}
+    columns = rule.options.get("columns", {}).get(name)
+    if columns and len(marks_list) >= len(columns):
+        values.update(zip(columns, marks_list))
+    elif len(marks_list) >= 2:
+        values["theory"], values["total"] = marks_list[0], marks_list[-1]
+    elif len(marks_list) == 1:
+        values["theory"] = values["total"] = marks_list[0]
+
+    total = values["total"]
+    return {
+        "code": code,
+        "name": name,
+        "theory_marks": values["theory"],
+        "practical_marks": values["practical"],
+        "internal_marks": values["internal"],
+        "total_marks": total,
+        "marks_in_words": digits_to_words(total) if total is not None else None,
+        "grade": None
+    }
+
+
+def _name_marks(groups, rule):
+    """Subject name and a single marks value"""
+    marks = int(groups["marks"])
+    return {
+        "name": clean_text(groups.get("name")),
+        "marks": marks,
+        "marks_in_words": digits_to_words(marks)
+    }
+
+
+LAYOUTS: Dict[str, Callable] = {
+    "cbse_columns": _cbse_columns,
+    "numbered_columns": _numbered_columns,
+    "name_marks": _name_marks,
+}
+
+
+def register_layout(name: str, layout: Callable):
+    """Add a subject layout: layout(groups_by_role, rule) -> subject dict or None"""
+    LAYOUTS[name] = layout
+
+
+# =====================================================
+# Compiled profile
+# =====================================================
+
+class _FieldRule:
+    """Info-text patterns tried in order; the first match fills the rule's fields"""
+
+    def __init__(self, spec):
+        flags = _flags(spec.get("flags"))
+        if "field" in spec:
+            targets = {spec["field"]: spec.get("group", 1)}
+        else:
+            targets = spec["groups"]
+        raw = set(spec.get("raw", []))
+        if spec.get("clean", True) is False:
+            raw.update(targets)
+        self.targets = [(field, group, field not in raw) for field, group in targets.items()]
+        self.patterns = []
+        for pattern in spec["patterns"]:
+            # [pattern, group] takes that group for the single target field
+            if isinstance(pattern, (list, tuple)):
+                pattern, group = pattern
+            else:
+                group = None
+            self.patterns.append((re.compile(pattern, flags), group))
+
+    def apply(self, text, result):
+        for pattern, group in self.patterns:
+            match = pattern.search(text)
+            if match:
+                for field, default_group, clean in self.targets:
+                    value = match.group(group or default_group)
+                    result[field] = clean_text(value) if clean else value
+                return
+
+
+class _RelationLinesRule:
+    """
+    Names on the lines following a marker (e.g. "Daughter of" followed by
+    "Smt ..." and "Shri ..." lines): each field takes the first of the next
+    `window` lines starting with its prefix, with the prefix removed.
+    """
+
+    def __init__(self, spec):
+        flags = _flags(spec.get("flags"))
+        self.marker = re.compile(spec["marker"], flags)
+        self.window = spec.get("window", 4)
+        self.targets = [
+            (line["field"], re.compile(line["prefix"], flags), re.compile(rf'^(?:{line["prefix"]})\s+', flags))
+            for line in spec["lines"]
+        ]
+
+    def apply(self, text, result):
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            if not self.marker.search(line):
+                continue
+            following = lines[i + 1:i + 1 + self.window]
+            for field, prefix, strip_prefix in self.targets:
+                for candidate in following:
+                    candidate = candidate.strip()
+                    if candidate and prefix.match(candidate):
+                        result[field] = clean_text(strip_prefix.sub('', candidate))
+                        break
+            return
+
+
+_INFO_RULES = {"patterns": _FieldRule, "relation_lines": _RelationLinesRule}
+
+
+class _LineRule:
+    """One subject-line pattern, the roles of its groups and its layout"""
+
+    def __init__(self, spec):
+        self.pattern = re.compile(spec["pattern"], _flags(spec.get("flags")))
+        self.roles = spec["groups"]
+        self.layout = LAYOUTS[spec["layout"]]
+        # {group: minimum length} the match must satisfy, otherwise later rules are tried
+        self.min_length = {int(group): length for group, length in spec.get("min_length", {}).items()}
+        self.options = spec.get("options", {})
+
+    def accepts(self, groups):
+        return all(len(groups[group - 1] or "") >= length for group, length in self.min_length.items())
+
+    def subject(self, groups):
+        return self.layout({role: groups[index - 1] for role, index in self.roles.items()}, self)
+
+
+class _LineClassifier:
+    """
+    Skip pattern and subject rules joined into one alternation, so every line
+    is matched once; the alternative that matched is told apart by its outer
+    group, and its own groups are sliced out of the combined match.
+    """
+
+    def __init__(self, skip, rules):
+        self.skip = skip
+        self.rules = rules
+        parts = []
+        self._alternatives = {}
+        group = 1
+        if skip is not None:
+            # Skip patterns match anywhere in the line (search semantics)
+            parts.append(f"({_scoped(skip, '.*?')})")
+            self._alternatives[group] = None
+            group += 1 + skip.groups
+        for index, rule in enumerate(rules):
+            parts.append(f"({_scoped(rule.pattern, '')})")
+            self._alternatives[group] = (index, group + 1, rule.pattern.groups)
+            group += 1 + rule.pattern.groups
+        try:
+            self.combined = re.compile("|".join(parts)) if parts else None
+        except re.error:
+            # e.g. the same named group in two rules; classify rule by rule instead
+            self.combined = None
+
+    def classify(self, line):
+        """(rule, groups) for a subject line, ("skip", None) or (None, None)"""
+        if self.combined is None:
+            return self._classify_sequential(line, 0)
+        match = self.combined.match(line)
+        if match is None:
+            return None, None
+        entry = self._alternatives[match.lastindex]
+        if entry is None:
+            return "skip", None
+        index, first, count = entry
+        groups = match.groups()[first - 1:first - 1 + count]
+        rule = self.rules[index]
+        if rule.accepts(groups):
+            return rule, groups
+        return self._classify_sequential(line, index + 1, check_skip=False)
+
+    def _classify_sequential(self, line, start, check_skip=True):
+        if check_skip and self.skip is not None and self.skip.search(line):
+            return "skip", None
+        for rule in self.rules[start:]:
+            match = rule.pattern.match(line)
+            if match and rule.accepts(match.groups()):
+                return rule, match.groups()
+        return None, None
+
+
+def _scoped(pattern, prefix):
+    """Pattern source wrapped with its own flags so it can sit inside a combined regex"""
+    letters = "".join(letter for flag, letter in ((re.IGNORECASE, "i"), (re.DOTALL, "s"), (re.MULTILINE, "m"))
+                      if pattern.flags & flag)
+    body = f"{prefix}(?:{pattern.pattern})"
+    return f"(?{letters}:{body})" if letters else body
+
+
+class BoardProfile:
+    """A compiled board profile; see the built-in specs for the format"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.key = spec["key"]
+        self.aliases = [alias.lower() for alias in spec.get("aliases", [self.key])]
+        self.template = spec["result"]
+        self.info_rules = [_INFO_RULES[rule.get("type", "patterns")](rule) for rule in spec.get("fields", [])]
+
+        marks = spec.get("marks", {})
+        self.split_lines = marks.get("split", "lines")
+        self.prepare = marks.get("prepare", "raw")
+        self.section_start = re.compile(marks["section_start"], re.IGNORECASE) if marks.get("section_start") else None
+        self.section_hint = re.compile(marks["section_hint"]) if marks.get("section_hint") else None
+        skip = re.compile(marks["skip"], _flags(marks.get("skip_flags"))) if marks.get("skip") else None
+        self.classifier = _LineClassifier(skip, [_LineRule(rule) for rule in marks.get("rules", [])])
+        self.dedupe = marks.get("dedupe")
+
+    def _lines(self, text):
+        lines = text.splitlines() if self.split_lines == "lines" else text.split('\n')
+        for original in lines:
+            if self.prepare == "strip":
+                yield original, original.strip()
+            elif self.prepare == "collapse":
+                yield original, _WHITESPACE.sub(' ', original.strip())
+            else:
+                yield original, original
+
+    def extract_subjects(self, marks_text, whole_section=False):
+        """
+        Subjects of the marks table text. With whole_section the text is taken
+        to be rows cut out of the table (e.g. a re-OCRed row band), so no header
+        or section hint is needed before the first subject.
+        """
+        subjects = []
+        in_section = whole_section or (self.section_start is None and self.section_hint is None)
+        for original, line in self._lines(marks_text):
+            if self.prepare != "raw" and not line:
+                continue
+            if not in_section:
+                # Table header (checked on the original spacing) or the first subject-like line
+                if self.section_start is not None and self.section_start.search(original):
+                    in_section = True
+                    continue
+                if self.section_hint is not None and self.section_hint.match(line):
+                    in_section = True
+                else:
+                    continue
+            elif self.section_start is not None and self.section_start.search(original):
+                continue
+
+            rule, groups = self.classifier.classify(line)
+            if rule is None or rule == "skip":
+                continue
+            subject = rule.subject(groups)
+            if subject is not None:
+                subjects.append(subject)
+
+        if self.dedupe:
+            seen = set()
+            deduped = []
+            for subject in subjects:
+                value = subject.get(self.dedupe)
+                if value and value not in seen:
+                    deduped.append(subject)
+                    seen.add(value)
+            subjects = deduped
+        return subjects
+
+    def extract(self, info_text: str, marks_text: str) -> Dict[str, Any]:
+        result = dict(self.template)
+        for rule in self.info_rules:
+            rule.apply(info_text, result)
+        result["subjects"] = self.extract_subjects(marks_text)
+        return result
+
+
+# =====================================================
+# Built-in profiles
+# =====================================================
+
+_NAME = r'([A-Z][A-Z ]+)'
+_ICSE_SUBJECT = r"([A-Z][A-Z &,.\'-]+?)"
+
+CBSE = {
+    "key": "cbse",
+    "aliases": ["cbse"],
+    "result": {
+        "board": "CBSE",
+        "student_name": None,
+        "roll_number": None,
+        "mother_name": None,
+        "father_name": None,
+        "school_name": None,
+        "school_code": None,
+    },
+    "fields": [
+        {"field": "student_name", "patterns": [
+            rf'Name of Candidate\s+{_NAME}',
+            rf'This is to certify that\s+{_NAME}',
+            # Name before "has achieved" or similar phrases
+            rf'{_NAME}\s+(?:has achieved|की शैक्षणिक)',
+        ]},
+        {"field": "roll_number", "clean": False, "patterns": [
+            r'Roll No\.?\s*(\d+)',
+            r'अनुक्रमांक\s*(\d+)',
+        ]},
+        {"field": "mother_name", "patterns": [
+            rf"Mother'?s Name\s+{_NAME}",
+            rf"माता का नाम\s+{_NAME}",
+        ]},
+        {"field": "father_name", "patterns": [
+            rf"Father'?s/Guardian'?s Name\s+{_NAME}",
+            rf"Father'?s Name\s+{_NAME}",
+            rf"पिता /संरक्षक का नाम\s+{_NAME}",
+        ]},
+        {"groups": {"school_code": 1, "school_name": 2}, "raw": ["school_code"], "patterns": [
+            r'School\s*(\d{5})\s*-?\s*([A-Z][A-Z &\-,\.]+)',
+            r'विद्यालय\s*(\d{5})\s*-?\s*([A-Z][A-Z &\-,\.]+)',
+            r'(\d{5})\s*-?\s*([A-Z][A-Z &\-,\.]+)',
+        ]},
+    ],
+    "marks": {
+        "rules": [
+            {
+                # Practical marks may be missing, empty or "xxx"
+                "pattern": r'^\s*(\d{3})\s+([A-Z][A-Z &\-\.]+?)\s+([0-9]{2,3}|xxx)?\s+([0-9]{2,3}|xxx)?\s+([0-9]{2,3})?\s+([A-Z ]+(?:[A-Z]+)?)?\s*([A-Z]\d)?\s*$',
+                "groups": {"code": 1, "name": 2, "theory": 3, "practical": 4, "total": 5, "grade": 7},
+                "layout": "cbse_columns",
+            },
+        ],
+    },
+}
+
+UTTARAKHAND = {
+    "key": "uttarakhand",
+    "aliases": ["uttarakhand", "uk"],
+    "result": {
+        "board": "UTTARAKHAND",
+        "student_name": None,
+        "mother_name": None,
+        "father_name": None,
+        "school_name": None,
+    },
+    "fields": [
+        {"field": "student_name", "patterns": [
+            rf'according to the Board\'s record\s+{_NAME}',
+            # Hindi line, its transliteration, then the name in capitals
+            [rf'परिषद् के अभिलेखानुसार\s+([^\n]+)\n[^\n]*\s+{_NAME}', 2],
+        ]},
+        {"field": "mother_name", "patterns": [
+            rf'Son/Daughter of Mrs\.\s+{_NAME}',
+            rf'आत्मज/आत्मजा श्रीमती\s+[^\n]*\s+{_NAME}',
+        ]},
+        {"field": "father_name", "patterns": [
+            rf'and Mr\.\s+{_NAME}',
+            rf'एवं श्री\s+[^\n]*\s+{_NAME}',
+        ]},
+        {"field": "school_name", "patterns": [
+            r'from School\s+([A-Z][A-Z\.\s]+)',
+        ]},
+    ],
+    "marks": {
+        "prepare": "strip",
+        "skip": r'(SUBJECT|GRADE|PASSED|RESULT|POSITIONAL|ADDITIONAL SUBJECT|DATED)',
+        "rules": [
+            {
+                # Code + name + marks
+                "pattern": r'^(\d{3})\s+([A-Z][A-Z ]+?)\s+(.*)',
+                "groups": {"code": 1, "name": 2, "marks": 3},
+                "layout": "numbered_columns",
+                "options": {"columns": {
+                    "SOCIAL SCIENCE": ["theory", "internal", "total"],
+                    "MATHEMATICS": ["theory", "practical", "total"],
+                    "SCIENCE": ["theory", "practical", "total"],
+                }},
+            },
+        ],
+    },
+}
+
+ICSE = {
+    "key": "icse",
+    "aliases": ["icse"],
+    "result": {
+        "board": "ICSE",
+        "student_name": None,
+        "unique_id": None,
+        "mother_name": None,
+        "father_name": None,
+        "school_name": None,
+    },
+    "fields": [
+        {"field": "student_name", "patterns": [
+            r'Name\s+([A-Z\s]+)\s+of',
+            r'Name\s+([A-Z\s]+)\b',
+            r'^([A-Z\s]+)\s+of\s+[A-Z\s,]+',
+        ]},
+        {"field": "unique_id", "clean": False, "flags": "i", "patterns": [
+            r'UNIQUE ID\s*(\d{7,8})',
+        ]},
+        # "Daughter of" / "Son of" followed by the mother's and father's lines
+        {"type": "relation_lines", "marker": r'(Daughter|Son)\s+of', "flags": "i", "window": 4, "lines": [
+            {"field": "mother_name", "prefix": r'(Smt|Mrs\.)'},
+            {"field": "father_name", "prefix": r'(Shri|Mr\.)'},
+        ]},
+        # Text after "of" until UNIQUE or <<<
+        {"field": "school_name", "flags": "s", "patterns": [
+            r'of\s+([A-Z][A-Z\s\.&,]+?)(?=\n\s*[Uu]nique|<<<)',
+        ]},
+    ],
+    "marks": {
+        "split": "newline",
+        "prepare": "collapse",
+        "section_start": r'(SUBJECTS|External Examination|Percentage Mark)',
+        # A subject line (uppercase name followed by a number) also opens the section
+        "section_hint": r'^[A-Z][A-Z &,.\'-]+\s+\d',
+        "skip": r'(UNIQUE ID|Daughter|Smt|Shri|Mother|Father|Internal Assessment|GRADE|Date of birth|Head of the School|registration|COMMUNITY SERVICE|SUPW|NEW DELHI)',
+        "skip_flags": "i",
+        "rules": [
+            # ICSE2 double marks - "HINDI 092 92 NINE TWO"
+            {"pattern": rf'^{_ICSE_SUBJECT}\s+(\d{{3}})\s+(\d{{2,3}})\s+([A-Z]+(?:\s+[A-Z]+)+)$',
+             "groups": {"name": 1, "marks": 2}, "layout": "name_marks"},
+            # ICSE2 - "ENGLISH 80 EIGHT ZERO"
+            {"pattern": rf'^{_ICSE_SUBJECT}\s+(\d{{2,3}})\s+([A-Z]+(?:\s+[A-Z]+)+)$',
+             "groups": {"name": 1, "marks": 2}, "layout": "name_marks"},
+            # ICSE1 single-word marks in words and grade - "PHYSICS 83 EIGHT T"
+            {"pattern": rf'^{_ICSE_SUBJECT}\s+(\d{{2,3}})\s+([A-Z]+)\s+([A-Z])\s*$',
+             "groups": {"name": 1, "marks": 2}, "layout": "name_marks", "min_length": {"3": 4}},
+            # ICSE1 multi-word marks in words and grade
+            {"pattern": rf'^{_ICSE_SUBJECT}\s+(\d{{2,3}})\s+([A-Z]+(?:\s+[A-Z]+)+)\s+([A-Z])\s*$',
+             "groups": {"name": 1, "marks": 2}, "layout": "name_marks"},
+            # Sub-subjects with leading zero - "ENGLISH LANGUAGE 076"
+            {"pattern": rf'^{_ICSE_SUBJECT}\s+0?(\d{{2,3}})\s*$',
+             "groups": {"name": 1, "marks": 2}, "layout": "name_marks"},
+        ],
+        # Keep the first occurrence of each subject
+        "dedupe": "name",
+    },
+}
+
+
+# =====================================================
+# Registry
+# =====================================================
+
+_PROFILES: Dict[str, BoardProfile] = {}
+
+
+def register_profile(spec: Dict[str, Any]) -> BoardProfile:
+    """Compile a profile spec and register it under its key (replacing any previous one)"""
+    profile = BoardProfile(spec)
+    _PROFILES[profile.key] = profile
+    return profile
+
+
+def get_profile(board_key: str) -> Optional[BoardProfile]:
+    return _PROFILES.get(board_key)
+
+
+def profiles() -> List[BoardProfile]:
+    return list(_PROFILES.values())
+
+
+def normalize_board_name(board_name: str) -> str:
+    """Registry key of the first profile with an alias in board_name, else the lowered name"""
+    if not board_name:
+        return 'unknown'
+    name = board_name.strip().lower()
+    for profile in _PROFILES.values():
+        if any(alias in name for alias in profile.aliases):
+            return profile.key
+    return name
+
+
+def load_profiles(path) -> int:
+    """Register the profile specs in a JSON file (one spec or a list) or a directory of them"""
+    path = Path(path)
+    files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+    count = 0
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            specs = json.load(f)
+        for spec in specs if isinstance(specs, list) else [specs]:
+            register_profile(spec)
+            count += 1
+    return count
+
+
+for _spec in (CBSE, ICSE, UTTARAKHAND):
+    register_profile(_spec)
+
+if os.getenv("OCR_BOARD_PROFILES"):
+    try:
+        load_profiles(os.getenv("OCR_BOARD_PROFILES"))
+    except Exception as e:
+        print(f"Warning: could not load board profiles from {os.getenv('OCR_BOARD_PROFILES')}: {e}")
@@ -0,0 +1,124 @@
+"""
+Build the college alignment template from a known-good scan.
+
+template_align.py registers college photos against COLLEGE_TEMPLATE_PATH, and
+the fixed-format boxes in jobs.py (COLLEGE_INFO_BOX, COLLEGE_MARKS_BOX) are
+normalized coordinates on that image. The template must therefore be the bare
+page: flat, upright and cropped to the paper edges. This script takes a flatbed
+scan or a straight-on photo of a marksheet, finds the page quad (or takes its
+corners from --corners), warps it upright to --width pixels and writes the
+template. It then checks that the template has enough texture, runs
+template_align.self_check() with the college boxes and writes a preview with
+the boxes drawn, so their placement on the info and marks tables can be
+checked by eye before the template is shipped.
+
+Marksheets carry student data: blank out the name, roll number and marks of
+the scan before committing a template built from it.
+
+Usage:
+    python scripts/build_college_template.py scan.jpg
+    python scripts/build_college_template.py scan.jpg --corners 112,80,2390,95,2410,3390,90,3372
+    python scripts/build_college_template.py scan.jpg --out data/templates/college_marksheet.jpg --width 1700
+"""
+
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# The boxes live in jobs.py at the service root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from jobs import COLLEGE_INFO_BOX, COLLEGE_MARKS_BOX
+from scripts.template_align import COLLEGE_TEMPLATE_PATH, Template, self_check
+
+# The page must cover at least this share of the scan to be taken as its quad
+MIN_PAGE_SHARE = 0.5
+
+
+def _order_corners(points):
+    """Corners as top-left, top-right, bottom-right, bottom-left"""
+    points = np.float32(points).reshape(4, 2)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.float32([points[np.argmin(sums)], points[np.argmin(diffs)],
+                       points[np.argmax(sums)], points[np.argmax(diffs)]])
+
+
+def find_page_quad(gray):
+    """Corners of the largest four-sided contour covering most of the scan, or None"""
+    edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
+    edges = cv2.dilate(edges, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:5]:
+        if cv2.contourArea(contour) < MIN_PAGE_SHARE * gray.shape[0] * gray.shape[1]:
+            break
+        quad = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(quad) == 4 and cv2.isContourConvex(quad):
+            return _order_corners(quad)
+    return None
+
+
+def build_template(scan, corners=None, width=1700):
+    """Upright page of the scan, width pixels wide, cut from corners or the detected page quad"""
+    if corners is None:
+        corners = find_page_quad(cv2.cvtColor(scan, cv2.COLOR_BGR2GRAY))
+    if corners is None:
+        print("No page edges found; using the whole scan as the page")
+        height, width_in = scan.shape[:2]
+        corners = np.float32([[0, 0], [width_in, 0], [width_in, height], [0, height]])
+    corners = _order_corners(corners)
+    top, bottom = np.linalg.norm(corners[1] - corners[0]), np.linalg.norm(corners[2] - corners[3])
+    left, right = np.linalg.norm(corners[3] - corners[0]), np.linalg.norm(corners[2] - corners[1])
+    height = int(round(width * (left + right) / (top + bottom)))
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    return cv2.warpPerspective(scan, cv2.getPerspectiveTransform(corners, target), (width, height),
+                               flags=cv2.INTER_AREA, borderMode=cv2.BORDER_REPLICATE)
+
+
+def draw_boxes(page, boxes):
+    preview = page.copy()
+    height, width = page.shape[:2]
+    for (cx, cy, bw, bh), color in zip(boxes, ((0, 160, 0), (0, 0, 220))):
+        top_left = (int((cx - bw / 2) * width), int((cy - bh / 2) * height))
+        bottom_right = (int((cx + bw / 2) * width), int((cy + bh / 2) * height))
+        cv2.rectangle(preview, top_left, bottom_right, color, 3)
+    return preview
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the college alignment template from a known-good scan")
+    parser.add_argument("scan", help="Flat, well-lit scan or photo of a college marksheet")
+    parser.add_argument("--out", default=COLLEGE_TEMPLATE_PATH, help="Template path to write")
+    parser.add_argument("--width", type=int, default=1700, help="Template width in pixels")
+    parser.add_argument("--corners", help="Page corners in the scan as x1,y1,...,x4,y4 (any order)")
+    args = parser.parse_args()
+
+    scan = cv2.imread(args.scan)
+    if scan is None:
+        sys.exit(f"Cannot read {args.scan}")
+    corners = None
+    if args.corners:
+        values = [float(v) for v in args.corners.split(",")]
+        if len(values) != 8:
+            sys.exit("--corners takes eight numbers")
+        corners = np.float32(values).reshape(4, 2)
+
+    page = build_template(scan, corners, args.width)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    cv2.imwrite(args.out, page, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    template = Template(args.out)
+    print(f"Wrote {args.out} ({template.width}x{template.height}, {len(template.keypoints)} keypoints)")
+
+    preview_path = os.path.splitext(args.out)[0] + "_boxes.jpg"
+    cv2.imwrite(preview_path, draw_boxes(page, (COLLEGE_INFO_BOX, COLLEGE_MARKS_BOX)))
+    print(f"Wrote {preview_path}: the green box must cover the student details, the red one the marks table")
+
+    result = self_check(template, boxes=(COLLEGE_INFO_BOX, COLLEGE_MARKS_BOX))
+    print(f"Self-check {'passed' if result['ok'] else 'FAILED'}: {result}")
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
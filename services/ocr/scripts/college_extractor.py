@@ -1,12 +1,16 @@
 import os
 import re
 import json
-import tempfile
 from typing import Tuple, Optional, Dict, Any
 from pathlib import Path
 from PIL import Image
 
-from scripts.ocr import process_ocr
+from scripts.ocr import process_ocr_many, encode_crop
+from scripts.metrics import stage_timer
+from scripts.template_align import align_context, get_template, warp_norm_box
+
+# Register photos to the college template (when one is configured) before cropping
+COLLEGE_ALIGN = os.getenv("COLLEGE_ALIGN", "1").strip().lower() in ("1", "true", "yes")
 
 def _clean(text: Optional[str]) -> Optional[str]:
     if not text:
@@ -14,21 +18,56 @@ def _clean(text: Optional[str]) -> Optional[str]:
     text = re.sub(r"\s+", " ", str(text)).strip()
     return text or None
 
-def crop_by_norm_box(image_path: str, norm_box: Tuple[float, float, float, float], margin_ratio: float = 0.02) -> Image.Image:
+def _crop_norm(img: Image.Image, norm_box: Tuple[float, float, float, float], margin_ratio: float) -> Image.Image:
+    w, h = img.width, img.height
+    cx, cy, bw, bh = norm_box
+    x1 = int(round((cx - bw/2) * w))
+    y1 = int(round((cy - bh/2) * h))
+    x2 = int(round((cx + bw/2) * w))
+    y2 = int(round((cy + bh/2) * h))
+    pad_x = int(round((x2 - x1) * margin_ratio))
+    pad_y = int(round((y2 - y1) * margin_ratio))
+    x1 = max(0, x1 - pad_x)
+    y1 = max(0, y1 - pad_y)
+    x2 = min(w, x2 + pad_x)
+    y2 = min(h, y2 + pad_y)
+    return img.crop((x1, y1, x2, y2)).convert('RGB')
+
+def crop_by_norm_box(image_path: str, norm_box: Tuple[float, float, float, float], margin_ratio: float = 0.02, ctx=None) -> Image.Image:
+    if ctx is not None:
+        return _crop_norm(ctx.rgb_pil, norm_box, margin_ratio)
     with Image.open(image_path) as img:
-        w, h = img.width, img.height
-        cx, cy, bw, bh = norm_box
-        x1 = int(round((cx - bw/2) * w))
-        y1 = int(round((cy - bh/2) * h))
-        x2 = int(round((cx + bw/2) * w))
-        y2 = int(round((cy + bh/2) * h))
-        pad_x = int(round((x2 - x1) * margin_ratio))
-        pad_y = int(round((y2 - y1) * margin_ratio))
-        x1 = max(0, x1 - pad_x)
-        y1 = max(0, y1 - pad_y)
-        x2 = min(w, x2 + pad_x)
-        y2 = min(h, y2 + pad_y)
-        return img.crop((x1, y1, x2, y2)).convert('RGB')
+        return _crop_norm(img, norm_box, margin_ratio)
+
+def aligned_crops(image_path: str, norm_boxes, ctx=None, timings=None):
+    """
+    Crops of norm_boxes registered to the college template (timings: optional
+    dict that receives the "align" stage duration).
+
+    Returns:
+        tuple: ([PIL crops], alignment summary), or (None, None) when alignment
+        is disabled or no template image is configured
+
+    Raises:
+        AlignmentError: The photo does not register to the template
+    """
+    template = get_template() if COLLEGE_ALIGN else None
+    if template is None:
+        return None, None
+    import cv2
+    from scripts.image_context import ImageContext
+    if ctx is None:
+        ctx = ImageContext.from_path(image_path)
+
+    with stage_timer("align", timings):
+        # Features come from the detection proxy; the crops from the full-resolution image
+        alignment = align_context(ctx, template)
+        homography = alignment.pop("homography")
+        crops = [
+            Image.fromarray(cv2.cvtColor(warp_norm_box(ctx.bgr, homography, template, box), cv2.COLOR_BGR2RGB))
+            for box in norm_boxes
+        ]
+    return crops, alignment
 
 def save_txt(dirpath: str, stem: str, suffix: str, text: str) -> str:
     os.makedirs(dirpath, exist_ok=True)
@@ -213,8 +252,20 @@ def process_fixed_format(
     image_path: str,
     info_norm_box: Tuple[float, float, float, float],
     marks_norm_box: Tuple[float, float, float, float],
+    ctx=None,
+    timings=None,
 ) -> Dict[str, Any]:
+    """
+    OCR the fixed info/marks regions of a college marksheet (ctx: optional ImageContext to crop from).
+
+    With a template configured the regions are cut from the photo registered to
+    it, and a photo that does not register raises AlignmentError before the OCR
+    API is called. timings, when given, receives the "align" and "ocr" stage
+    durations (pool workers return it to the API process for /metrics).
+    """
     stem = Path(image_path).stem
+    crops, alignment = aligned_crops(image_path, [info_norm_box, marks_norm_box], ctx=ctx, timings=timings)
+
     ocr_dir = os.path.join("data", "output", "ocr_results")
     final_dir = os.path.join("data", "output", "final_json")
     coords_dir = os.path.join("data", "output", "table_coordinates")
@@ -228,19 +279,19 @@ def process_fixed_format(
             "table_coordinates": [
                 {"table_id": 1, "table_type": "Information Table", "normalized": info_norm_box},
                 {"table_id": 2, "table_type": "Marks Table", "normalized": marks_norm_box},
-            ]
+            ],
+            "alignment": alignment,
         }, f, indent=2)
 
-    info_img = crop_by_norm_box(image_path, info_norm_box)
-    marks_img = crop_by_norm_box(image_path, marks_norm_box)
+    if crops is not None:
+        info_img, marks_img = crops
+    else:
+        info_img = crop_by_norm_box(image_path, info_norm_box, ctx=ctx)
+        marks_img = crop_by_norm_box(image_path, marks_norm_box, ctx=ctx)
 
-    with tempfile.TemporaryDirectory() as td:
-        info_tmp = os.path.join(td, f"{stem}_info.jpg")
-        marks_tmp = os.path.join(td, f"{stem}_marks.jpg")
-        info_img.save(info_tmp, format='JPEG')
-        marks_img.save(marks_tmp, format='JPEG')
-        info_text = process_ocr(info_tmp)
-        marks_text = process_ocr(marks_tmp)
+    # Crops are encoded in memory and both regions go to the OCR API concurrently
+    with stage_timer("ocr", timings):
+        info_text, marks_text = process_ocr_many([encode_crop(info_img), encode_crop(marks_img)], timings=timings)
 
     save_txt(ocr_dir, stem, "info", info_text)
     save_txt(ocr_dir, stem, "marks", marks_text)
@@ -1,11 +1,24 @@
 from pathlib import Path
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import os
 
+try:
+	from scripts.model_registry import get_logo_model
+	from scripts.image_context import ImageContext, scale_box
+except ImportError:
+	from model_registry import get_logo_model
+	from image_context import ImageContext, scale_box
+
 os.environ['YOLO_VERBOSE'] = 'False'
 
+# CLAHE clip limits tried on the grayscale page and the minimum YOLO confidence
+CLIP_LIMITS = tuple(float(v) for v in range(9, 14))
+CONFIDENCE_THRESHOLD = 0.25
+
+# Submit all contrast variants as one YOLO batch instead of trying them one by one
+BATCHED_CONTRAST = os.getenv("LOGO_BATCHED_CONTRAST", "0").strip().lower() in ("1", "true", "yes")
+
 
 def ensure_portrait(image: np.ndarray) -> np.ndarray:
 	if image is None or image.size == 0:
@@ -16,22 +29,199 @@ def ensure_portrait(image: np.ndarray) -> np.ndarray:
 	return image
 
 
+def enhance_contrast_gray(gray: np.ndarray, clip_limit: float) -> np.ndarray:
+	clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
+	gray_eq = clahe.apply(gray)
+	return cv2.cvtColor(gray_eq, cv2.COLOR_GRAY2BGR)
+
+
 def enhance_contrast(image: np.ndarray, clip_limit: float) -> np.ndarray:
 	if image is None or image.size == 0:
 		return image
 	gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-	clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
-	gray_eq = clahe.apply(gray)
-	return cv2.cvtColor(gray_eq, cv2.COLOR_GRAY2BGR)
+	return enhance_contrast_gray(gray, clip_limit)
+
+
+def build_contrast_variants(gray: np.ndarray, clip_limits=CLIP_LIMITS) -> list:
+	"""
+	Build one 3-channel CLAHE variant of gray per clip limit.
+	
+	The equalized planes are stacked into a single (N, H, W) array and expanded
+	to BGR with one broadcast instead of a cvtColor call per variant.
+	"""
+	equalized = np.stack([
+		cv2.createCLAHE(clipLimit=clip, tileGridSize=(8, 8)).apply(gray)
+		for clip in clip_limits
+	])
+	stacked = np.repeat(equalized[..., np.newaxis], 3, axis=-1)
+	return [np.ascontiguousarray(variant) for variant in stacked]
+
+
+def _no_logo() -> dict:
+	return {"class_id": -1, "confidence": 0.0, "box": None}
+
+
+def _best_detection(result):
+	"""Highest-confidence detection of one YOLO result above the threshold, or None"""
+	if result is None or result.boxes is None or len(result.boxes) == 0:
+		return None
+	conf = result.boxes.conf.cpu().numpy()
+	cls = result.boxes.cls.cpu().numpy()
+	boxes = result.boxes.xyxy.cpu().numpy()
+	
+	valid_mask = conf >= CONFIDENCE_THRESHOLD
+	if not valid_mask.any():
+		return None
+	best_idx = int(np.argmax(conf[valid_mask]))
+	return {
+		"class_id": int(cls[valid_mask][best_idx]),
+		"confidence": float(conf[valid_mask][best_idx]),
+		"box": boxes[valid_mask][best_idx].tolist(),
+	}
+
+
+def _detect_sequential(model, gray: np.ndarray) -> dict:
+	"""Try each contrast level in turn and stop at the first one with a detection"""
+	for clip_val in CLIP_LIMITS:
+		processed = enhance_contrast_gray(gray, clip_val)
+		results = model.predict(source=processed, verbose=False)
+		best = _best_detection(results[0]) if results else None
+		if best is not None:
+			return best
+	return _no_logo()
+
+
+def _detect_batched(model, gray: np.ndarray) -> dict:
+	"""Run every contrast level in one forward pass and keep the best detection overall"""
+	variants = build_contrast_variants(gray)
+	results = model.predict(source=variants, verbose=False)
+	
+	best = None
+	for result in results or []:
+		candidate = _best_detection(result)
+		if candidate is not None and (best is None or candidate["confidence"] > best["confidence"]):
+			best = candidate
+	return best if best is not None else _no_logo()
+
+
+def _load_portrait_gray(image_path: str, ctx=None):
+	"""
+	Portrait grayscale detection proxy and its scale to full resolution, taken
+	from the shared context or decoded from image_path; (None, 1.0) on failure.
+	"""
+	if ctx is None:
+		img = cv2.imread(image_path)
+		if img is None:
+			return None, 1.0
+		ctx = ImageContext(img, source=image_path)
+	return ctx.proxy_portrait_gray, ctx.proxy_scale
+
+
+def _to_full_resolution(detection: dict, scale: float) -> dict:
+	if detection["box"] is not None and scale != 1.0:
+		detection = dict(detection, box=scale_box(detection["box"], scale))
+	return detection
 
 
-def detect_logo(image_path: str, model_path: str = "models\logo.pt") -> int:
+def detect_logo_detection(image_path: str, model_path: str = "models\\logo.pt", ctx=None, batched=None) -> dict:
+	"""
+	Detect the board logo once and return class, confidence and box together.
+	
+	Args:
+		image_path: Path to input image
+		model_path: Path to YOLO model weights
+		ctx: Optional ImageContext with the already decoded image
+		batched: Run all CLAHE variants as one batch and pick the best detection
+			across them (default: LOGO_BATCHED_CONTRAST environment setting).
+			Sequential mode returns the best detection of the first variant
+			that has one.
+	
+	Returns:
+		dict: {"class_id": int, "confidence": float, "box": [x1, y1, x2, y2] or None}
+		Boxes are in full-resolution portrait-oriented image coordinates (YOLO
+		runs on the downscaled detection proxy); class_id is -1 when no
+		detection reaches 0.25 confidence.
+	"""
+	model = get_logo_model(model_path)
+	gray, scale = _load_portrait_gray(image_path, ctx)
+	if gray is None:
+		print(f"Failed to load image: {image_path}")
+		return _no_logo()
+	
+	if batched is None:
+		batched = BATCHED_CONTRAST
+	if batched:
+		return _to_full_resolution(_detect_batched(model, gray), scale)
+	return _to_full_resolution(_detect_sequential(model, gray), scale)
+
+
+def detect_logo_detections_many(grays: list, model_path: str = "models\\logo.pt", batched=None, scales=None) -> list:
+	"""
+	Detect logos on several portrait grayscale pages with batched YOLO calls.
+	
+	Sequential mode keeps the per-image semantics of detect_logo_detection (first
+	contrast level with a detection wins) but sends every still-undetected page
+	of a contrast level in one predict call. Batched mode submits all contrast
+	variants of all pages at once.
+	
+	Args:
+		grays: Portrait-oriented grayscale pages (e.g. ImageContext.proxy_portrait_gray)
+		model_path: Path to YOLO model weights
+		batched: Contrast mode, as in detect_logo_detection
+		scales: Optional per-page factor mapping boxes back to full resolution
+			(ImageContext.proxy_scale); boxes stay in input coordinates when omitted
+	
+	Returns:
+		list: One detection dict per page, in input order
+	"""
+	model = get_logo_model(model_path)
+	if batched is None:
+		batched = BATCHED_CONTRAST
+	best = [None] * len(grays)
+	
+	if batched:
+		variants = []
+		owners = []
+		for i, gray in enumerate(grays):
+			page_variants = build_contrast_variants(gray)
+			variants.extend(page_variants)
+			owners.extend([i] * len(page_variants))
+		results = model.predict(source=variants, verbose=False) if variants else []
+		for owner, result in zip(owners, results):
+			candidate = _best_detection(result)
+			if candidate is not None and (best[owner] is None or candidate["confidence"] > best[owner]["confidence"]):
+				best[owner] = candidate
+	else:
+		pending = list(range(len(grays)))
+		for clip_val in CLIP_LIMITS:
+			if not pending:
+				break
+			sources = [enhance_contrast_gray(grays[i], clip_val) for i in pending]
+			results = model.predict(source=sources, verbose=False)
+			still_pending = []
+			for i, result in zip(pending, results):
+				best[i] = _best_detection(result)
+				if best[i] is None:
+					still_pending.append(i)
+			pending = still_pending
+	
+	if scales is None:
+		scales = [1.0] * len(grays)
+	return [
+		_to_full_resolution(detection, scale) if detection is not None else _no_logo()
+		for detection, scale in zip(best, scales)
+	]
+
+
+def detect_logo(image_path: str, model_path: str = "models\\logo.pt", ctx=None, batched=None) -> int:
 	"""
 	Detect logo in image and return class ID.
 	
 	Args:
 		image_path: Path to input image
 		model_path: Path to YOLO model weights
+		ctx: Optional ImageContext with the already decoded image
+		batched: Use one batched pass over all contrast variants
 	
 	Returns:
 		0: Uttarakhand
@@ -39,71 +229,26 @@ def detect_logo(image_path: str, model_path: str = "models\logo.pt") -> int:
 		2: ICSE
 		-1: No detection
 	"""
-	model = YOLO(model_path, verbose=False)
-	img = cv2.imread(image_path)
-	if img is None:
-		return -1
-	
-	img = ensure_portrait(img)
-	
-	for clip_val in range(9, 14):
-		processed = enhance_contrast(img, float(clip_val))
-		results = model.predict(source=processed, verbose=False)
-		
-		if results and results[0].boxes is not None and len(results[0].boxes) > 0:
-			conf = results[0].boxes.conf.cpu().numpy()
-			cls = results[0].boxes.cls.cpu().numpy()
-			
-			valid_mask = conf >= 0.25
-			if valid_mask.any():
-				best_idx = int(np.argmax(conf[valid_mask]))
-				return int(cls[valid_mask][best_idx])
-	
-	return -1
+	return detect_logo_detection(image_path, model_path, ctx=ctx, batched=batched)["class_id"]
 
 
-def detect_logo_with_boxes(image_path: str, model_path: str = "models\logo.pt") -> list:
+def detect_logo_with_boxes(image_path: str, model_path: str = "models\\logo.pt", ctx=None) -> list:
 	"""
 	Detect logo in image and return bounding boxes.
 	
 	Args:
 		image_path: Path to input image
 		model_path: Path to YOLO model weights
+		ctx: Optional ImageContext with the already decoded image
 	
 	Returns:
 		list: List of bounding boxes [(x1, y1, x2, y2), ...]
 	"""
-	print(f"Logo detection with boxes for: {image_path}")
-	model = YOLO(model_path, verbose=False)
-	img = cv2.imread(image_path)
-	if img is None:
-		print(f"Failed to load image: {image_path}")
+	detection = detect_logo_detection(image_path, model_path, ctx=ctx)
+	if detection["box"] is None:
+		print("No valid logo detections found")
 		return []
-	
-	print(f"Image loaded, shape: {img.shape}")
-	img = ensure_portrait(img)
-	print(f"After portrait check, shape: {img.shape}")
-	
-	for clip_val in range(9, 14):
-		processed = enhance_contrast(img, float(clip_val))
-		results = model.predict(source=processed, verbose=False)
-		
-		if results and results[0].boxes is not None and len(results[0].boxes) > 0:
-			conf = results[0].boxes.conf.cpu().numpy()
-			cls = results[0].boxes.cls.cpu().numpy()
-			boxes = results[0].boxes.xyxy.cpu().numpy()
-			
-			print(f"Found {len(conf)} detections with confidences: {conf}")
-			valid_mask = conf >= 0.25
-			if valid_mask.any():
-				# Return the best detection (highest confidence) like the original function
-				best_idx = int(np.argmax(conf[valid_mask]))
-				best_box = boxes[valid_mask][best_idx]
-				print(f"Best detection box: {best_box}")
-				return [best_box.tolist()]
-	
-	print("No valid logo detections found")
-	return []
+	return [detection["box"]]
 
 
 if __name__ == "__main__":
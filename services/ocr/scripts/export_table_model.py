@@ -0,0 +1,129 @@
+"""
+Export the fine-tuned Table Transformer for the onnx and torchscript table backends.
+
+Artifacts are written into the model directory under the names
+table_backends.py looks for. The script then runs one sample page through the
+export and through eager PyTorch and prints the largest output difference.
+
+Usage:
+    python scripts/export_table_model.py                           # table.onnx + table.int8.onnx
+    python scripts/export_table_model.py --format torchscript      # table.ts + table.int8.ts
+    python scripts/export_table_model.py --no-quantize --opset 17
+
+Then set TABLE_BACKEND=onnx (and TABLE_QUANTIZED=1 for the int8 variant) and
+check parity with scripts/table_backend_bench.py.
+"""
+
+import argparse
+import time
+
+import torch
+from PIL import Image
+
+try:
+    from scripts.predict_table import load_model
+    from scripts.table_backends import (INPUT_NAMES, OUTPUT_NAMES, OnnxTableModel,
+                                        TorchScriptTableModel, artifact_path)
+except ImportError:
+    from predict_table import load_model
+    from table_backends import (INPUT_NAMES, OUTPUT_NAMES, OnnxTableModel,
+                                TorchScriptTableModel, artifact_path)
+
+
+class _ExportWrapper(torch.nn.Module):
+    """Positional tensors in, (logits, pred_boxes) out, as exporters and tracers expect"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values, pixel_mask):
+        outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask, return_dict=True)
+        return outputs.logits, outputs.pred_boxes
+
+
+def sample_inputs(processor):
+    """Processor output for a blank portrait page, the shape real marksheets resize to"""
+    return processor(images=Image.new("RGB", (800, 1000), (255, 255, 255)), return_tensors="pt")
+
+
+def export_onnx(model, inputs, path, opset=17):
+    torch.onnx.export(
+        _ExportWrapper(model),
+        (inputs["pixel_values"], inputs["pixel_mask"]),
+        str(path),
+        input_names=list(INPUT_NAMES),
+        output_names=list(OUTPUT_NAMES),
+        # The processor resizes every page to its own height and width
+        dynamic_axes={
+            "pixel_values": {0: "batch", 2: "height", 3: "width"},
+            "pixel_mask": {0: "batch", 1: "height", 2: "width"},
+            "logits": {0: "batch"},
+            "pred_boxes": {0: "batch"},
+        },
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+
+
+def quantize_onnx(source, target):
+    """Dynamic int8 quantization of the weights (activations stay float)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+
+
+def export_torchscript(model, inputs, path, quantize=False):
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    with torch.no_grad():
+        traced = torch.jit.trace(_ExportWrapper(model), (inputs["pixel_values"], inputs["pixel_mask"]),
+                                 strict=False, check_trace=False)
+    traced = torch.jit.freeze(traced.eval())
+    traced.save(str(path))
+
+
+def max_difference(reference, candidate):
+    """Largest absolute difference of class probabilities and boxes between two outputs"""
+    prob_diff = (reference.logits.softmax(-1) - candidate.logits.softmax(-1)).abs().max().item()
+    box_diff = (reference.pred_boxes - candidate.pred_boxes).abs().max().item()
+    return prob_diff, box_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the table detector for ONNX Runtime or TorchScript")
+    parser.add_argument("--model", type=str, default="models\\tt_finetuned", help="Hugging Face model directory")
+    parser.add_argument("--format", choices=["onnx", "torchscript"], default="onnx", help="Artifact format")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the dynamic int8 variant")
+    args = parser.parse_args()
+
+    processor, model = load_model(args.model)
+    model.eval()
+    inputs = sample_inputs(processor)
+    with torch.no_grad():
+        reference = model(**inputs)
+
+    variants = [False] if args.no_quantize else [False, True]
+    for quantized in variants:
+        path = artifact_path(args.model, args.format, quantized)
+        started = time.perf_counter()
+        if args.format == "onnx":
+            if quantized:
+                quantize_onnx(artifact_path(args.model, "onnx", False), path)
+            else:
+                export_onnx(model, inputs, path, args.opset)
+            exported = OnnxTableModel(path)
+        else:
+            export_torchscript(model, inputs, path, quantize=quantized)
+            exported = TorchScriptTableModel(path)
+        elapsed = time.perf_counter() - started
+
+        with torch.no_grad():
+            prob_diff, box_diff = max_difference(reference, exported(**inputs))
+        size_mb = path.stat().st_size / 1024 / 1024
+        print(f"Wrote {path} ({size_mb:.1f} MB) in {elapsed:.1f}s - "
+              f"max prob diff {prob_diff:.5f}, max box diff {box_diff:.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Golden-corpus check and throughput benchmark for the board extractors.
+
+The corpus in data/extraction_corpus holds OCR text fixtures per case
+({case}_info.txt, {case}_marks.txt), the board each case belongs to
+(corpus.json) and the expected extraction ({case}.json). The expected files
+were generated from the extractor before it moved to board profiles, so any
+change in field accuracy shows up here.
+
+Usage:
+    python scripts/extraction_bench.py                  # accuracy + throughput
+    python scripts/extraction_bench.py --check          # exit 1 on any mismatch
+    python scripts/extraction_bench.py --iterations 2000
+    python scripts/extraction_bench.py --regenerate     # rewrite the expected JSON
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+try:
+    from scripts.extractor import extract_from_texts
+except ImportError:
+    from extractor import extract_from_texts
+
+CORPUS_DIR = Path(__file__).resolve().parent.parent / "data" / "extraction_corpus"
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """[(case, board, info_text, marks_text, expected or None), ...] in manifest order"""
+    corpus_dir = Path(corpus_dir)
+    with open(corpus_dir / "corpus.json", "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    cases = []
+    for entry in manifest:
+        case = entry["case"]
+        info_text = (corpus_dir / f"{case}_info.txt").read_text(encoding="utf-8")
+        marks_text = (corpus_dir / f"{case}_marks.txt").read_text(encoding="utf-8")
+        expected_path = corpus_dir / f"{case}.json"
+        expected = None
+        if expected_path.exists():
+            with open(expected_path, "r", encoding="utf-8") as f:
+                expected = json.load(f)
+        cases.append((case, entry["board"], info_text, marks_text, expected))
+    return cases
+
+
+def regenerate(cases, corpus_dir=CORPUS_DIR):
+    for case, board, info_text, marks_text, _ in cases:
+        result = extract_from_texts(info_text, marks_text, board, label=case)
+        with open(Path(corpus_dir) / f"{case}.json", "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Wrote {case}.json")
+
+
+def compare(expected, actual):
+    """
+    Field-level comparison of one extraction.
+
+    Returns:
+        tuple: (matched fields, total fields, [mismatch descriptions])
+        Every top-level field counts once and every expected subject counts
+        once (matched when the subject at the same position is identical).
+    """
+    if expected is None or actual is None:
+        same = expected == actual
+        return (1 if same else 0), 1, [] if same else [f"expected {expected!r}, got {actual!r}"]
+
+    matched, total, mismatches = 0, 0, []
+    for field in expected:
+        if field == "subjects":
+            continue
+        total += 1
+        if actual.get(field) == expected[field]:
+            matched += 1
+        else:
+            mismatches.append(f"{field}: expected {expected[field]!r}, got {actual.get(field)!r}")
+
+    expected_subjects = expected.get("subjects", [])
+    actual_subjects = actual.get("subjects", [])
+    for i, subject in enumerate(expected_subjects):
+        total += 1
+        if i < len(actual_subjects) and actual_subjects[i] == subject:
+            matched += 1
+        else:
+            got = actual_subjects[i] if i < len(actual_subjects) else None
+            mismatches.append(f"subjects[{i}]: expected {subject!r}, got {got!r}")
+    if len(actual_subjects) > len(expected_subjects):
+        total += 1
+        mismatches.append(f"subjects: {len(actual_subjects) - len(expected_subjects)} unexpected extra")
+    if list(actual) != list(expected):
+        mismatches.append(f"field order: expected {list(expected)}, got {list(actual)}")
+    return matched, total, mismatches
+
+
+def check_accuracy(cases):
+    """Print per-case field accuracy; returns True when every case matches exactly"""
+    all_matched = all_total = 0
+    exact = True
+    print(f"{'case':<24}{'board':<20}{'fields':>10}")
+    for case, board, info_text, marks_text, expected in cases:
+        if expected is None:
+            print(f"{case:<24}{board:<20}{'no expected JSON':>10}")
+            exact = False
+            continue
+        actual = extract_from_texts(info_text, marks_text, board, label=case)
+        matched, total, mismatches = compare(expected, actual)
+        all_matched += matched
+        all_total += total
+        print(f"{case:<24}{board:<20}{f'{matched}/{total}':>10}")
+        for mismatch in mismatches:
+            print(f"    {mismatch}")
+        exact = exact and not mismatches
+    if all_total:
+        print(f"Field accuracy: {all_matched}/{all_total} ({all_matched / all_total * 100:.1f}%)")
+    return exact
+
+
+def benchmark(cases, iterations):
+    """Print extraction throughput per board over the corpus"""
+    by_board = {}
+    for case, board, info_text, marks_text, _ in cases:
+        by_board.setdefault(board.strip().lower(), []).append((board, info_text, marks_text))
+
+    print(f"\n{'board':<20}{'cases':>6}{'extractions/s':>16}{'us/extraction':>16}")
+    overall_count = 0
+    overall_seconds = 0.0
+    for key, items in by_board.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for board, info_text, marks_text in items:
+                extract_from_texts(info_text, marks_text, board)
+        elapsed = time.perf_counter() - started
+        count = iterations * len(items)
+        overall_count += count
+        overall_seconds += elapsed
+        print(f"{key:<20}{len(items):>6}{count / elapsed:>16.0f}{elapsed / count * 1e6:>16.1f}")
+    if overall_seconds:
+        print(f"{'all':<20}{len(cases):>6}{overall_count / overall_seconds:>16.0f}{overall_seconds / overall_count * 1e6:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Board extractor golden-corpus check and benchmark")
+    parser.add_argument("--corpus", type=str, default=str(CORPUS_DIR), help="Corpus directory")
+    parser.add_argument("--iterations", type=int, default=500, help="Passes over the corpus per board")
+    parser.add_argument("--check", action="store_true", help="Only check accuracy; exit 1 on any mismatch")
+    parser.add_argument("--regenerate", action="store_true", help="Rewrite the expected JSON from the current extractor")
+    args = parser.parse_args()
+
+    cases = load_corpus(args.corpus)
+    if args.regenerate:
+        regenerate(cases, args.corpus)
+        return
+
+    exact = check_accuracy(cases)
+    if args.check:
+        sys.exit(0 if exact else 1)
+    benchmark(cases, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
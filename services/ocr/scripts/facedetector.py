@@ -2,44 +2,140 @@ import cv2
 import json
 import os
 
-def detect_candidate_photo(image_path, board_id):
+try:
+    from scripts.image_context import ImageContext
+    from scripts.model_registry import get_face_cascade
+except ImportError:
+    from image_context import ImageContext
+    from model_registry import get_face_cascade
+
+# Smallest face the cascade reports, in full-resolution pixels
+MIN_FACE_SIZE = 30
+# Smallest window the frontal-face cascade is trained on
+CASCADE_WINDOW = 24
+
+# Header band scanned when nothing narrower is known (share of the page height)
+TOP_BAND = 0.3
+# An empty ROI is rescanned over the whole top band only when the ROI covered
+# less than this share of it; otherwise the rescan mostly repeats the same pixels
+BAND_RESCAN_BELOW = 0.7
+
+# Where each board prints the candidate photo, as (x1, y1, x2, y2) fractions
+# of the portrait page; boards without an entry scan the whole top band.
+# These are estimates read off the board layouts, not fitted to an annotated
+# sample set, so they are kept generous and a miss falls back to the band.
+PHOTO_REGIONS = {
+    0: (0.55, 0.0, 1.0, 0.35),   # Uttarakhand: right of the header
+    1: (0.6, 0.0, 1.0, 0.3),     # CBSE: top-right corner
+}
+
+# Rows around a detected logo that hold the photo, in logo heights above/below
+# it (estimates, like PHOTO_REGIONS)
+LOGO_ROWS_ABOVE = 1.0
+LOGO_ROWS_BELOW = 3.0
+
+
+def photo_roi(page_shape, board_id, logo_box=None):
     """
-    Detect candidate photo in marksheet image.
+    Region of a portrait page to scan for the candidate photo.
+    
+    Columns come from the board's PHOTO_REGIONS entry (full width for unknown
+    boards). Rows follow the header the logo was found in when logo_box is
+    given, otherwise the board region or the top band.
     
     Args:
-        image_path (str): Path to JPG image
-        board_id (int): 0=Uttarakhand, 1=CBSE, 2=ICSE
+        page_shape: Shape of the page the box is wanted for
+        board_id: Board class from logo detection (-1 when unknown)
+        logo_box: Optional logo [x1, y1, x2, y2] in the same coordinates as page_shape
     
     Returns:
-        dict: {"board": str, "photo_detected": int}
+        tuple: (x1, y1, x2, y2) in pixels
     """
-    board_names = {0: "Uttarakhand", 1: "CBSE", 2: "ICSE"}
-    board_name = board_names.get(board_id, "Unknown")
-    
+    height, width = page_shape[:2]
+    rx1, ry1, rx2, ry2 = PHOTO_REGIONS.get(board_id, (0.0, 0.0, 1.0, TOP_BAND))
+    x1, x2 = int(rx1 * width), int(rx2 * width)
+    y1, y2 = int(ry1 * height), int(ry2 * height)
     
-    # Check if image exists
-    if not os.path.exists(image_path):
-        print(f"Error: Image file '{image_path}' not found.")
-        return {"board": board_name, "photo_detected": 0}
+    if logo_box is not None:
+        logo_height = logo_box[3] - logo_box[1]
+        y1 = max(0, int(logo_box[1] - LOGO_ROWS_ABOVE * logo_height))
+        y2 = min(height, int(logo_box[3] + LOGO_ROWS_BELOW * logo_height))
     
-    # Load image
-    img = cv2.imread(image_path)
-    if img is None:
-        print(f"Error: Could not load image '{image_path}'.")
-        return {"board": board_name, "photo_detected": 0}
+    return x1, y1, max(x2, x1 + 1), max(y2, y1 + 1)
+
+
+def _covered_share(roi, band):
+    """Share of band's area that roi overlaps"""
+    overlap_w = max(0, min(roi[2], band[2]) - max(roi[0], band[0]))
+    overlap_h = max(0, min(roi[3], band[3]) - max(roi[1], band[1]))
+    return overlap_w * overlap_h / max(1, (band[2] - band[0]) * (band[3] - band[1]))
+
+
+def _scan(cascade, gray, roi, min_size):
+    """Run the cascade inside roi and return [x1, y1, x2, y2] boxes in gray's coordinates"""
+    x1, y1, x2, y2 = roi
+    faces = cascade.detectMultiScale(gray[y1:y2, x1:x2], scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size))
+    return [[int(x1 + x), int(y1 + y), int(x1 + x + w), int(y1 + y + h)] for (x, y, w, h) in faces]
+
+
+def detect_candidate_photo(image_path, board_id, ctx=None, logo_box=None):
+    """
+    Detect candidate photo in marksheet image.
     
-    # Crop to top 30% where photos usually appear
-    height = img.shape[0]
-    img_cropped = img[:int(height * 0.3), :]
+    The board's usual photo region is scanned first and the whole top band
+    only when that finds nothing and covered less than BAND_RESCAN_BELOW of
+    the band. The result is cached on ctx, so the
+    annotator gets the same boxes without running the cascade again.
     
-    # Convert to grayscale
-    gray = cv2.cvtColor(img_cropped, cv2.COLOR_BGR2GRAY)
+    Args:
+        image_path (str): Path to JPG image
+        board_id (int): 0=Uttarakhand, 1=CBSE, 2=ICSE
+        ctx (ImageContext, optional): Already decoded image; image_path is not read when given
+        logo_box (list, optional): Logo box from detect_logo_detection, in full-resolution
+            portrait coordinates, used to place the scan region next to the header
     
-    # Use Haar cascade face detector (reliable and built-in)
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    Returns:
+        dict: {"board": str, "photo_detected": int, "boxes": [[x1, y1, x2, y2], ...]}
+        Boxes are in full-resolution portrait-oriented image coordinates.
+    """
+    board_names = {0: "Uttarakhand", 1: "CBSE", 2: "ICSE"}
+    board_name = board_names.get(board_id, "Unknown")
     
-    return {"board": board_name, "photo_detected": 1 if len(faces) > 0 else 0}
+    if ctx is None:
+        # Check if image exists
+        if not os.path.exists(image_path):
+            print(f"Error: Image file '{image_path}' not found.")
+            return {"board": board_name, "photo_detected": 0, "boxes": []}
+        
+        # Load image
+        img = cv2.imread(image_path)
+        if img is None:
+            print(f"Error: Could not load image '{image_path}'.")
+            return {"board": board_name, "photo_detected": 0, "boxes": []}
+        ctx = ImageContext(img, source=image_path)
+    
+    def detect():
+        # Scan the downscaled portrait proxy (the orientation logo boxes and the
+        # annotator use); a candidate photo is hundreds of pixels wide on a
+        # phone capture, far above the cascade window
+        gray = ctx.proxy_portrait_gray
+        scale = ctx.proxy_scale
+        min_size = max(CASCADE_WINDOW, int(round(MIN_FACE_SIZE / scale)))
+        cascade = get_face_cascade()
+        
+        proxy_logo = [v / scale for v in logo_box] if logo_box is not None else None
+        roi = photo_roi(gray.shape, board_id, proxy_logo)
+        boxes = _scan(cascade, gray, roi, min_size)
+        
+        band = (0, 0, gray.shape[1], int(gray.shape[0] * TOP_BAND))
+        # Pages without a photo would otherwise run the cascade twice over much the same area
+        if not boxes and _covered_share(roi, band) < BAND_RESCAN_BELOW:
+            boxes = _scan(cascade, gray, band, min_size)
+        return [ctx.to_full(box) for box in boxes]
+    
+    key = ("faces", board_id, tuple(logo_box) if logo_box is not None else None)
+    boxes = ctx.cached(key, detect)
+    return {"board": board_name, "photo_detected": 1 if boxes else 0, "boxes": boxes}
 
 def main():
     """Interactive main function"""
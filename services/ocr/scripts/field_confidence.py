@@ -0,0 +1,250 @@
+"""
+Per-subject confidence of an extraction, and selective re-OCR of weak rows.
+
+A subject row is scored from checks that need no ground truth:
+
+    missing_total        no total marks (nor a grade) could be read
+    total_out_of_range   total is negative or above max_marks (100 unless given)
+    component_mismatch   theory/practical/internal/external marks do not add up
+                         to the total (on the extracted fields, or on the
+                         numbers of the OCR row when the row is known)
+    words_mismatch       the marks-in-words on the OCR row (or the submitted
+                         words field) disagree with digits_to_words(total)
+
+Each failed check multiplies the score by its PENALTIES factor, so a clean
+row scores 1.0. The document score is the lowest subject score.
+
+refine_extraction() scores a fresh extraction and, for the rows below
+OCR_REOCR_BELOW, OCRs only a band of the marks table around each row again,
+upscaled by OCR_REOCR_SCALE. A re-read row replaces the original only when it
+scores higher. Scores are stored next to the subjects in
+data["field_confidence"] (the subject dicts keep the board profile's layout).
+"""
+
+import logging
+import os
+import re
+
+try:
+    from scripts.board_profiles import DIGIT_WORDS, clean_text, digits_to_words, get_profile, normalize_board_name
+except ImportError:
+    from board_profiles import DIGIT_WORDS, clean_text, digits_to_words, get_profile, normalize_board_name
+
+logger = logging.getLogger(__name__)
+
+REOCR_BELOW = float(os.getenv("OCR_REOCR_BELOW", "0.6"))
+REOCR_MAX_ROWS = int(os.getenv("OCR_REOCR_MAX_ROWS", "3"))
+REOCR_SCALE = float(os.getenv("OCR_REOCR_SCALE", "2.0"))
+# Text lines of the table above and below a row that its band also covers
+REOCR_CONTEXT_LINES = 1.5
+
+PENALTIES = {
+    "missing_total": 0.2,
+    "total_out_of_range": 0.3,
+    "component_mismatch": 0.4,
+    "words_mismatch": 0.5,
+}
+
+COMPONENT_FIELDS = ("theory_marks", "practical_marks", "internal_marks", "external_marks")
+
+_NUMBER = re.compile(r'\b\d{1,3}\b')
+_WORD = re.compile(r'[A-Z]+')
+_DIGIT_WORD_SET = set(DIGIT_WORDS.values())
+
+
+def subject_total(subject):
+    for field in ("total_marks", "marks", "total"):
+        value = subject.get(field)
+        if value is not None:
+            return value
+    return None
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row_numbers(line, subject):
+    """Marks on an OCR row: its 1-3 digit numbers without the subject code"""
+    numbers = [int(n) for n in _NUMBER.findall(line)]
+    code = subject.get("code")
+    if code and code.isdigit() and numbers and numbers[0] == int(code):
+        numbers = numbers[1:]
+    return numbers
+
+
+def _row_words(line, total):
+    """Digit words after the total on an OCR row (e.g. "NINE TWO"), or None when there are none"""
+    tail = line
+    match = None
+    for match in re.finditer(rf'\b0*{int(total)}\b', line):
+        pass
+    if match is not None:
+        tail = line[match.end():]
+    words = [word for word in _WORD.findall(tail.upper()) if word in _DIGIT_WORD_SET]
+    return " ".join(words) if words else None
+
+
+def subject_issues(subject, line=None):
+    """Names of the failed checks for one subject dict (line: its OCR row, when known)"""
+    total = _as_number(subject_total(subject))
+    if total is None:
+        # Grade-only subjects (e.g. work experience) carry no marks to check
+        return [] if subject.get("grade") else ["missing_total"]
+
+    issues = []
+    max_marks = _as_number(subject.get("max_marks")) or 100
+    if total < 0 or total > max_marks:
+        issues.append("total_out_of_range")
+
+    components = [_as_number(subject.get(field)) for field in COMPONENT_FIELDS]
+    components = [value for value in components if value is not None]
+    mismatch = any(value > total for value in components)
+    if len(components) >= 2 and abs(sum(components) - total) > 0.5:
+        mismatch = True
+    if line is not None:
+        numbers = _row_numbers(line, subject)
+        if len(numbers) >= 3 and numbers[-1] == total and sum(numbers[:-1]) != total:
+            mismatch = True
+    if mismatch:
+        issues.append("component_mismatch")
+
+    if total == int(total):
+        expected_words = digits_to_words(int(total))
+        words = _row_words(line, total) if line is not None else None
+        if words is None:
+            words = clean_text(subject.get("marks_in_words") or subject.get("total_in_words") or "")
+        if words and words.upper() != expected_words:
+            issues.append("words_mismatch")
+    return issues
+
+
+def score_issues(issues):
+    score = 1.0
+    for issue in issues:
+        score *= PENALTIES.get(issue, 1.0)
+    return round(score, 2)
+
+
+def subject_confidence(subject, line=None):
+    """(score in 0-1, issues) for one subject dict"""
+    issues = subject_issues(subject, line)
+    return score_issues(issues), issues
+
+
+def document_confidence(scores):
+    """Lowest subject score; 0.0 when nothing was extracted"""
+    return min(scores) if scores else 0.0
+
+
+def find_row(lines, subject):
+    """Index of the OCR line a subject was read from, or None"""
+    name = clean_text(subject.get("name") or "")
+    code = subject.get("code")
+    if not name:
+        return None
+    for index, line in enumerate(lines):
+        collapsed = clean_text(line) or ""
+        if name in collapsed and (not code or re.search(rf'\b{re.escape(code)}\b', collapsed)):
+            return index
+    return None
+
+
+def _same_subject(a, b):
+    if a.get("code") and b.get("code"):
+        return a["code"] == b["code"]
+    return clean_text(a.get("name") or "") == clean_text(b.get("name") or "")
+
+
+def _row_band(index, line_count):
+    """(top, bottom) of a text line's band as fractions of the OCRed table crop"""
+    top = (index - REOCR_CONTEXT_LINES) / line_count
+    bottom = (index + 1 + REOCR_CONTEXT_LINES) / line_count
+    return max(0.0, top), min(1.0, bottom)
+
+
+def _reread(profile, subject, text):
+    """(subject, line) for the same subject in re-OCRed band text, or (None, None)"""
+    if not text:
+        return None, None
+    lines = text.splitlines()
+    for candidate in profile.extract_subjects(text, whole_section=True):
+        if _same_subject(subject, candidate):
+            index = find_row(lines, candidate)
+            return candidate, lines[index] if index is not None else None
+    return None, None
+
+
+def refine_extraction(data, marks_text, board_name, ocr_bands=None):
+    """
+    Score the subjects of a board extraction and re-read its weak rows.
+
+    Args:
+        data: extract_from_texts() result; data["subjects"] may be replaced row by row
+        marks_text: The marks table OCR text the subjects were parsed from
+        board_name: Board name as passed to extract_from_texts
+        ocr_bands: Optional callable([(top, bottom), ...]) -> [text, ...] that OCRs
+            bands of the marks table crop (fractions of its height); None skips re-OCR
+
+    Returns:
+        dict: stored as data["field_confidence"]:
+            {"document": score, "subjects": [{"code", "name", "score", "issues", "reocr"}, ...]}
+    """
+    subjects = data.get("subjects") or []
+    lines = (marks_text or "").splitlines()
+    rows = [find_row(lines, subject) for subject in subjects]
+    scored = [subject_confidence(subject, lines[row] if row is not None else None)
+              for subject, row in zip(subjects, rows)]
+    reread = [False] * len(subjects)
+
+    weak = [i for i, (score, _) in enumerate(scored) if score < REOCR_BELOW and rows[i] is not None]
+    weak = sorted(weak, key=lambda i: scored[i][0])[:REOCR_MAX_ROWS]
+    profile = get_profile(normalize_board_name(board_name or ""))
+    if weak and ocr_bands is not None and profile is not None and REOCR_MAX_ROWS > 0:
+        try:
+            texts = ocr_bands([_row_band(rows[i], len(lines)) for i in weak])
+        except Exception as e:
+            logger.info(f"Row re-OCR failed: {e}")
+            texts = [None] * len(weak)
+        for i, text in zip(weak, texts):
+            candidate, line = _reread(profile, subjects[i], text)
+            reread[i] = True
+            if candidate is None:
+                continue
+            score, issues = subject_confidence(candidate, line)
+            logger.info(f"Re-OCR of {subjects[i].get('name')}: {scored[i][0]} -> {score}")
+            if score > scored[i][0]:
+                subjects[i] = candidate
+                scored[i] = (score, issues)
+
+    data["subjects"] = subjects
+    confidence = {
+        "document": document_confidence([score for score, _ in scored]),
+        "subjects": [{"code": subject.get("code"), "name": subject.get("name"),
+                      "score": score, "issues": issues, "reocr": again}
+                     for subject, (score, issues), again in zip(subjects, scored, reread)],
+    }
+    data["field_confidence"] = confidence
+    return confidence
+
+
+def recorded_scores(subjects, confidence):
+    """
+    Extraction-time score for each of subjects (e.g. as submitted after editing), or None.
+
+    Recorded entries are matched on subject code, or on name when either side
+    has no code. Each entry is used once, so rows that were added, removed or
+    reordered never take a neighbour's score.
+    """
+    unused = [entry for entry in (confidence or {}).get("subjects") or []
+              if isinstance(entry, dict) and isinstance(entry.get("score"), (int, float))]
+    scores = []
+    for subject in subjects:
+        match = next((entry for entry in unused if _same_subject(subject, entry)), None)
+        if match is not None:
+            unused.remove(match)
+        scores.append(float(match["score"]) if match is not None else None)
+    return scores
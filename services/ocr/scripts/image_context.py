@@ -0,0 +1,196 @@
+"""
+Shared in-memory image for the marksheet pipeline.
+
+An ImageContext decodes the upload once and lazily caches the variants the
+stages ask for (portrait orientation, grayscale, RGB PIL image), so the
+preprocessing, logo, face, table and OCR stages no longer re-read the file.
+
+Phone uploads are 12-48 MP while the detectors resize their input to well
+under 2000 px anyway, so page cropping, logo, face and table detection run on
+a proxy whose longer side is at most DETECT_MAX_SIDE. Their boxes are mapped
+back with to_full(); only the OCR crops are cut from the full-resolution image.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Longer side of the detection proxy in pixels; 0 runs detection at full resolution
+DETECT_MAX_SIDE = int(os.getenv("OCR_DETECT_MAX_SIDE", "1600"))
+
+
+class ImageContext:
+    """Decoded marksheet image with cached derived variants"""
+
+    def __init__(self, image: np.ndarray, source: Optional[str] = None):
+        """
+        Args:
+            image: Decoded BGR image (as returned by cv2.imread)
+            source: Path or name the image came from, used for logging and output names
+        """
+        if image is None or image.size == 0:
+            raise ValueError(f"Empty image for context: {source}")
+        self.bgr = image
+        self.source = source
+        self._cache = {}
+
+    @classmethod
+    def from_path(cls, image_path) -> "ImageContext":
+        """Decode an image file once (EXIF orientation is applied by OpenCV)"""
+        image = cv2.imread(str(image_path))
+        if image is None:
+            raise FileNotFoundError(f"Failed to read image: {image_path}")
+        return cls(image, source=str(image_path))
+
+    @classmethod
+    def from_bytes(cls, data: bytes, source: Optional[str] = None) -> "ImageContext":
+        """Decode an encoded image (JPEG/PNG/...) held in memory"""
+        buf = np.frombuffer(data, dtype=np.uint8)
+        image = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Failed to decode image: {source}")
+        return cls(image, source=source)
+
+    @property
+    def stem(self) -> str:
+        return Path(self.source).stem if self.source else "image"
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale of the image in its original orientation"""
+        if "gray" not in self._cache:
+            self._cache["gray"] = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._cache["gray"]
+
+    @property
+    def portrait(self) -> np.ndarray:
+        """BGR image rotated counter-clockwise when wider than tall"""
+        if "portrait" not in self._cache:
+            height, width = self.bgr.shape[:2]
+            if width > height:
+                self._cache["portrait"] = cv2.rotate(self.bgr, cv2.ROTATE_90_COUNTERCLOCKWISE)
+            else:
+                self._cache["portrait"] = self.bgr
+        return self._cache["portrait"]
+
+    @property
+    def portrait_gray(self) -> np.ndarray:
+        """Grayscale of the portrait-oriented image"""
+        if "portrait_gray" not in self._cache:
+            if self.portrait is self.bgr:
+                self._cache["portrait_gray"] = self.gray
+            else:
+                self._cache["portrait_gray"] = cv2.cvtColor(self.portrait, cv2.COLOR_BGR2GRAY)
+        return self._cache["portrait_gray"]
+
+    @property
+    def rgb_pil(self) -> Image.Image:
+        """RGB PIL image in the original orientation (shared, do not mutate)"""
+        if "rgb_pil" not in self._cache:
+            self._cache["rgb_pil"] = Image.fromarray(cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+        return self._cache["rgb_pil"]
+
+    # ----- Detection proxy -----
+
+    @property
+    def proxy_scale(self) -> float:
+        """Full-resolution pixels per proxy pixel (1.0 when no downscaling is needed)"""
+        if "proxy_scale" not in self._cache:
+            longest = max(self.bgr.shape[:2])
+            if DETECT_MAX_SIDE <= 0 or longest <= DETECT_MAX_SIDE:
+                self._cache["proxy_scale"] = 1.0
+            else:
+                self._cache["proxy_scale"] = longest / DETECT_MAX_SIDE
+        return self._cache["proxy_scale"]
+
+    @property
+    def proxy(self) -> np.ndarray:
+        """BGR detection proxy in the original orientation"""
+        if "proxy" not in self._cache:
+            if self.proxy_scale == 1.0:
+                self._cache["proxy"] = self.bgr
+            else:
+                height, width = self.bgr.shape[:2]
+                size = (max(1, round(width / self.proxy_scale)), max(1, round(height / self.proxy_scale)))
+                # INTER_AREA averages the dropped pixels instead of aliasing them away
+                self._cache["proxy"] = cv2.resize(self.bgr, size, interpolation=cv2.INTER_AREA)
+        return self._cache["proxy"]
+
+    @property
+    def proxy_gray(self) -> np.ndarray:
+        """Grayscale of the detection proxy in the original orientation"""
+        if "proxy_gray" not in self._cache:
+            if self.proxy is self.bgr:
+                self._cache["proxy_gray"] = self.gray
+            else:
+                self._cache["proxy_gray"] = cv2.cvtColor(self.proxy, cv2.COLOR_BGR2GRAY)
+        return self._cache["proxy_gray"]
+
+    @property
+    def proxy_portrait(self) -> np.ndarray:
+        """Portrait-oriented BGR detection proxy"""
+        if "proxy_portrait" not in self._cache:
+            if self.proxy is self.bgr:
+                self._cache["proxy_portrait"] = self.portrait
+            else:
+                height, width = self.proxy.shape[:2]
+                if width > height:
+                    self._cache["proxy_portrait"] = cv2.rotate(self.proxy, cv2.ROTATE_90_COUNTERCLOCKWISE)
+                else:
+                    self._cache["proxy_portrait"] = self.proxy
+        return self._cache["proxy_portrait"]
+
+    @property
+    def proxy_portrait_gray(self) -> np.ndarray:
+        """Grayscale of the portrait-oriented detection proxy"""
+        if "proxy_portrait_gray" not in self._cache:
+            if self.proxy is self.bgr:
+                self._cache["proxy_portrait_gray"] = self.portrait_gray
+            elif self.proxy_portrait is self.proxy:
+                self._cache["proxy_portrait_gray"] = self.proxy_gray
+            else:
+                self._cache["proxy_portrait_gray"] = cv2.cvtColor(self.proxy_portrait, cv2.COLOR_BGR2GRAY)
+        return self._cache["proxy_portrait_gray"]
+
+    @property
+    def proxy_rgb_pil(self) -> Image.Image:
+        """RGB PIL detection proxy in the original orientation (shared, do not mutate)"""
+        if "proxy_rgb_pil" not in self._cache:
+            if self.proxy is self.bgr:
+                self._cache["proxy_rgb_pil"] = self.rgb_pil
+            else:
+                self._cache["proxy_rgb_pil"] = Image.fromarray(cv2.cvtColor(self.proxy, cv2.COLOR_BGR2RGB))
+        return self._cache["proxy_rgb_pil"]
+
+    def cached(self, key, factory):
+        """Per-image memo for stage results other stages reuse (e.g. face boxes for the annotator)"""
+        key = ("result", key)
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    def to_full(self, box):
+        """Map an [x1, y1, x2, y2] box from proxy to full-resolution coordinates"""
+        return scale_box(box, self.proxy_scale)
+
+
+def scale_box(box, scale: float):
+    """Multiply every coordinate of a box by scale; None passes through"""
+    if box is None or scale == 1.0:
+        return box
+    return [float(v) * scale for v in box]
+
+
+def get_image_context(image_path=None, ctx: Optional[ImageContext] = None) -> ImageContext:
+    """Return ctx when given, otherwise decode image_path into a new context"""
+    if ctx is not None:
+        return ctx
+    return ImageContext.from_path(image_path)
@@ -0,0 +1,148 @@
+"""
+In-process latency histograms for the OCR service.
+
+Stages of the marksheet pipeline, model loading, database work and HTTP
+requests are recorded into cumulative histograms and rendered in the
+Prometheus text exposition format by render_latest() (served on /metrics).
+
+Pipeline work runs in pool worker processes whose registries are never
+scraped, so workers return their per-stage timings with each result and the
+API process records them with observe_timings().
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds: from sub-10ms image ops up to multi-minute remote OCR
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Stages recorded under ocr_stage_duration_seconds
+STAGES = ("pdf", "preprocess", "logo", "face", "table", "ocr", "ocr_marks", "ocr_info",
+          "extract", "annotate", "db_submit", "model_load", "queue_wait",
+          "worker_import", "worker_warmup", "api_import", "api_startup", "align", "ocr_local", "ocr_remote",
+          "reocr")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+    """Cumulative histogram with a fixed set of label names"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(s["counts"]), s["sum"], s["count"]) for key, s in self._series.items()}
+        for key in sorted(snapshot):
+            counts, total, count = snapshot[key]
+            base = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(base + [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {count}")
+        return "\n".join(lines)
+
+
+_registry = []
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Create a Histogram and add it to the exported registry"""
+    metric = Histogram(name, documentation, labelnames, buckets)
+    _registry.append(metric)
+    return metric
+
+
+STAGE_SECONDS = histogram(
+    "ocr_stage_duration_seconds",
+    "Wall time of marksheet pipeline stages, model loading, queueing and database work",
+    ("stage",),
+)
+HTTP_REQUEST_SECONDS = histogram(
+    "ocr_http_request_duration_seconds",
+    "Wall time of HTTP requests handled by the OCR API",
+    ("method", "route", "status"),
+)
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def observe_timings(timings):
+    """Record a {stage: seconds} dict, e.g. the "timings" a pool worker returned"""
+    for stage, seconds in (timings or {}).items():
+        if isinstance(seconds, (int, float)):
+            observe_stage(stage, float(seconds))
+
+
+@contextmanager
+def stage_timer(stage, timings=None):
+    """
+    Time a block as one pipeline stage.
+
+    The duration is observed into ocr_stage_duration_seconds and, when a
+    timings dict is given, also added to timings[stage].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe_stage(stage, elapsed)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_latest():
+    """All registered metrics in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
@@ -0,0 +1,138 @@
+"""
+Process-wide model registry for the OCR pipeline.
+
+The YOLO logo detector, the Table Transformer and the Haar face cascade are
+loaded once per process and the same instances are handed to every caller, so
+a request only pays for inference and not for reading weights from disk.
+"""
+
+import logging
+import threading
+import time
+
+try:
+    from scripts.metrics import observe_stage
+except ImportError:
+    from metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_logo_models = {}
+_table_models = {}
+_face_cascades = {}
+
+FACE_CASCADE = "haarcascade_frontalface_default.xml"
+
+
+def get_logo_model(model_path="models\\logo.pt"):
+    """Return the cached YOLO logo model for model_path, loading it on first use"""
+    key = str(model_path)
+    model = _logo_models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _logo_models.get(key)
+        if model is None:
+            from ultralytics import YOLO
+            start = time.perf_counter()
+            model = YOLO(key, verbose=False)
+            _logo_models[key] = model
+            elapsed = time.perf_counter() - start
+            observe_stage("model_load", elapsed)
+            logger.info(f"Loaded logo model from {key} in {elapsed:.2f}s")
+    return model
+
+
+def get_table_model(model_path="models\\tt_finetuned"):
+    """
+    Return the cached (processor, model) pair for the table detector, loading it on first use.
+
+    model is the Hugging Face model or an ONNX Runtime / TorchScript stand-in
+    (see table_backends.py); all of them are called as model(**inputs).
+    """
+    key = str(model_path)
+    pair = _table_models.get(key)
+    if pair is not None:
+        return pair
+
+    with _lock:
+        pair = _table_models.get(key)
+        if pair is None:
+            try:
+                from scripts.table_backends import load_table_backend
+            except ImportError:
+                from table_backends import load_table_backend
+            start = time.perf_counter()
+            # Eager PyTorch, ONNX Runtime or TorchScript per TABLE_BACKEND
+            pair = load_table_backend(key)
+            _table_models[key] = pair
+            elapsed = time.perf_counter() - start
+            observe_stage("model_load", elapsed)
+            logger.info(f"Loaded table model from {key} in {elapsed:.2f}s")
+    return pair
+
+
+def get_face_cascade(cascade_name=FACE_CASCADE):
+    """Return the cached OpenCV Haar cascade, parsing its XML on first use"""
+    cascade = _face_cascades.get(cascade_name)
+    if cascade is not None:
+        return cascade
+
+    with _lock:
+        cascade = _face_cascades.get(cascade_name)
+        if cascade is None:
+            import cv2
+            start = time.perf_counter()
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + cascade_name)
+            if cascade.empty():
+                raise RuntimeError(f"Could not load face cascade {cascade_name}")
+            _face_cascades[cascade_name] = cascade
+            elapsed = time.perf_counter() - start
+            observe_stage("model_load", elapsed)
+            logger.info(f"Loaded face cascade {cascade_name} in {elapsed:.2f}s")
+    return cascade
+
+
+def warmup(logo_model_path="models\\logo.pt", table_model_path="models\\tt_finetuned"):
+    """
+    Load both models and run one dummy inference through each.
+
+    The first forward pass allocates buffers and selects kernels, so running it
+    here keeps that cost out of the first real request.
+
+    Returns:
+        dict: Seconds spent warming each model ({"logo": float, "table": float})
+    """
+    import numpy as np
+    from PIL import Image
+
+    timings = {}
+
+    start = time.perf_counter()
+    logo_model = get_logo_model(logo_model_path)
+    logo_model.predict(source=np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+    timings["logo"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import torch
+    processor, table_model = get_table_model(table_model_path)
+    inputs = processor(images=Image.new("RGB", (800, 1000), (255, 255, 255)), return_tensors="pt")
+    with torch.no_grad():
+        table_model(**inputs)
+    timings["table"] = time.perf_counter() - start
+
+    get_face_cascade()
+
+    logger.info(f"Model warm-up finished - logo: {timings['logo']:.2f}s, table: {timings['table']:.2f}s")
+    return timings
+
+
+def loaded_models():
+    """Return the model paths currently held by the registry"""
+    return {
+        "logo": sorted(_logo_models),
+        "table": sorted(_table_models),
+        "face": sorted(_face_cascades),
+    }
@@ -1,4 +1,5 @@
-import time
+import asyncio
+import io
 import json
 import os
 import logging
@@ -32,6 +33,20 @@ else:
 api_key = os.getenv("UNSTRANCT_API_KEY")
 logger.info(f"API key loaded: {'Yes (length: ' + str(len(api_key)) + ')' if api_key else 'No'}")
 
+try:
+    from scripts.ocr_client import gather_ocr, run_sync
+    from scripts.ocr_cache import get_cache, make_cache_key
+    from scripts.ocr_backends import RemoteBackend, TesseractBackend, needs_escalation, route
+    from scripts.metrics import stage_timer
+except ImportError:
+    from ocr_client import gather_ocr, run_sync
+    from ocr_cache import get_cache, make_cache_key
+    from ocr_backends import RemoteBackend, TesseractBackend, needs_escalation, route
+    from metrics import stage_timer
+
+# Base URL can point at a local stub server for offline testing
+base_url = os.getenv("OCR_BASE_URL", "https://llmwhisperer-api.us-central.unstract.com/api/v2")
+
 # Try to import LLMWhisperer
 try:
     from unstract.llmwhisperer import LLMWhispererClientV2
@@ -45,7 +60,7 @@ client = None
 if LLMWhispererClientV2 and api_key and api_key != "your_api_key_here":
     try:
         client = LLMWhispererClientV2(
-            base_url="https://llmwhisperer-api.us-central.unstract.com/api/v2",
+            base_url=base_url,
             api_key=api_key
         )
         logger.info("OCR client initialized successfully")
@@ -60,6 +75,14 @@ else:
     else:
         logger.warning("API key is placeholder value")
 
+# OCR engines; OCR_ENGINE picks remote, local (Tesseract) or auto (see ocr_backends.py)
+remote_backend = RemoteBackend(client, base_url)
+local_backend = TesseractBackend()
+
+def available():
+    """True when an engine of the configured OCR_ENGINE route can run"""
+    return any(backend.available for backend in route(remote_backend, local_backend))
+
 # Create 'processed' directory for all output
 processed_dir = backend_dir / 'processed'
 processed_dir.mkdir(parents=True, exist_ok=True)
@@ -73,145 +96,271 @@ def get_max_confidence_table(tables, table_type):
         return None
     return max(filtered_tables, key=lambda x: x["confidence"])
 
-def crop_table_from_image(image_path, coordinates, margin_ratio: float = 0.10):
-    """Crop table region from image using coordinates with optional margin expansion."""
+def _crop_with_margin(img, coordinates, margin_ratio):
+    x1, y1 = int(coordinates["x1"]), int(coordinates["y1"])
+    x2, y2 = int(coordinates["x2"]), int(coordinates["y2"])
+
+    # Expand by margin_ratio on each side
+    width = max(0, x2 - x1)
+    height = max(0, y2 - y1)
+    pad_x = int(round(width * margin_ratio))
+    pad_y = int(round(height * margin_ratio))
+
+    x1 -= pad_x
+    y1 -= pad_y
+    x2 += pad_x
+    y2 += pad_y
+
+    # Ensure coordinates are within image bounds
+    x1 = max(0, min(x1, img.width))
+    y1 = max(0, min(y1, img.height))
+    x2 = max(0, min(x2, img.width))
+    y2 = max(0, min(y2, img.height))
+
+    return img.crop((x1, y1, x2, y2))
+
+def crop_table_from_image(image_path, coordinates, margin_ratio: float = 0.10, ctx=None):
+    """Crop table region from image using coordinates with optional margin expansion.
+
+    When an ImageContext is given the crop is cut from its decoded RGB image
+    instead of reopening image_path.
+    """
+    if ctx is not None:
+        return _crop_with_margin(ctx.rgb_pil, coordinates, margin_ratio)
     with Image.open(image_path) as img:
-        x1, y1 = int(coordinates["x1"]), int(coordinates["y1"])
-        x2, y2 = int(coordinates["x2"]), int(coordinates["y2"])
-
-        # Expand by margin_ratio on each side
-        width = max(0, x2 - x1)
-        height = max(0, y2 - y1)
-        pad_x = int(round(width * margin_ratio))
-        pad_y = int(round(height * margin_ratio))
-
-        x1 -= pad_x
-        y1 -= pad_y
-        x2 += pad_x
-        y2 += pad_y
-
-        # Ensure coordinates are within image bounds
-        x1 = max(0, min(x1, img.width))
-        y1 = max(0, min(y1, img.height))
-        x2 = max(0, min(x2, img.width))
-        y2 = max(0, min(y2, img.height))
-
-        cropped_img = img.crop((x1, y1, x2, y2))
+        return _crop_with_margin(img, coordinates, margin_ratio)
+
+def _to_rgb(cropped_img):
+    """Ensure image is in RGB mode for JPEG compatibility"""
+    if cropped_img.mode == 'RGB':
         return cropped_img
+    try:
+        return cropped_img.convert('RGB')
+    except Exception:
+        # Fallback: create a new RGB image and paste
+        rgb_bg = Image.new('RGB', cropped_img.size, (255, 255, 255))
+        rgb_bg.paste(cropped_img, mask=cropped_img.split()[-1] if cropped_img.mode in ('RGBA', 'LA') else None)
+        return rgb_bg
+
+def encode_crop(cropped_img) -> bytes:
+    """JPEG-encode a cropped table in memory for OCR submission"""
+    buffer = io.BytesIO()
+    _to_rgb(cropped_img).save(buffer, format='JPEG')
+    return buffer.getvalue()
 
-def save_cropped_image(cropped_img, filename, table_type):
-    """Save cropped image temporarily for OCR processing"""
+def save_cropped_image(cropped_img, filename, table_type, output_dir=None):
+    """Save cropped image to disk (debug output; OCR itself works from encode_crop bytes)"""
     temp_filename = f"temp_{filename}_{table_type.replace(' ', '_').lower()}.jpg"
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        temp_filename = os.path.join(output_dir, temp_filename)
     logger.debug(f"Saving cropped image: {temp_filename}")
-    # Ensure image is in RGB mode for JPEG compatibility
-    if cropped_img.mode != 'RGB':
-        try:
-            cropped_img = cropped_img.convert('RGB')
-        except Exception:
-            # Fallback: create a new RGB image and paste
-            from PIL import Image
-            rgb_bg = Image.new('RGB', cropped_img.size, (255, 255, 255))
-            rgb_bg.paste(cropped_img, mask=cropped_img.split()[-1] if cropped_img.mode in ('RGBA', 'LA') else None)
-            cropped_img = rgb_bg
-    cropped_img.save(temp_filename, format='JPEG')
+    _to_rgb(cropped_img).save(temp_filename, format='JPEG')
     logger.debug(f"Saved cropped image: {temp_filename}")
     return temp_filename
 
-def process_ocr(image_path):
-    """Process OCR on an image and return extracted text"""
-    logger.info(f"process_ocr called with: {image_path}")
-    logger.info(f"OCR client available: {client is not None}")
-    
-    if not client:
-        logger.error("OCR client is None - cannot process")
-        return "OCR not available - no valid API key"
+async def process_ocr_async(image, label=None, timings=None):
+    """Process OCR on an image without blocking the event loop and return extracted text
+
+    Args:
+        image: Encoded image bytes (e.g. from encode_crop) or a path to an image file
+        label: Name used in log messages (defaults to the path)
+        timings: Optional dict that receives the time spent in each engine as
+            "ocr_local" / "ocr_remote" (seconds, summed over calls)
+
+    The engines of the OCR_ENGINE route are tried in order: with "auto" a
+    local Tesseract result that is too short or uncertain escalates to the
+    remote API (and is still returned if the remote call fails). Results are
+    looked up in the content-addressed OCR cache (keyed by the image bytes and
+    the engine settings) before any engine runs, and accepted results are stored.
+    """
+    in_memory = isinstance(image, (bytes, bytearray))
+    label = label or (f"<{len(image)} bytes>" if in_memory else str(image))
+    logger.info(f"process_ocr called with: {label}")
+    if in_memory:
+        image_bytes = bytes(image)
+    else:
+        with open(image, 'rb') as f:
+            image_bytes = f.read()
+    backends = route(remote_backend, local_backend)
     
-    try:
-        logger.info(f"Sending image to OCR API: {image_path}")
-        result = client.whisper(file_path=image_path)
-        logger.info(f"OCR whisper result: {result}")
-        
-        while True:
-            status = client.whisper_status(whisper_hash=result['whisper_hash'])
-            logger.debug(f"OCR status: {status['status']}")
-            if status['status'] == 'processed':
-                resultx = client.whisper_retrieve(whisper_hash=result['whisper_hash'])
+    cache = get_cache()
+    if cache is not None:
+        # The remote engine's text is preferred when both are cached
+        for backend in sorted(backends, key=lambda b: b.name != "remote"):
+            try:
+                cached = await asyncio.to_thread(cache.get, make_cache_key(image_bytes, backend.settings))
+            except Exception as e:
+                logger.warning(f"OCR cache lookup failed: {e}")
                 break
-            time.sleep(5)
-        
-        extracted_text = resultx['extraction']['result_text']
-        logger.info(f"OCR extracted {len(extracted_text)} characters")
-        return extracted_text
-    except Exception as e:
-        logger.error(f"OCR failed: {str(e)}")
-        return f"OCR failed: {str(e)}"
+            if cached is not None:
+                logger.info(f"OCR cache hit for {label} ({backend.name}, {len(cached)} characters)")
+                return cached
+    
+    runnable = [backend for backend in backends if backend.available]
+    if not runnable:
+        logger.error(f"No OCR engine available for {label} - cannot process")
+        if any(backend.name == "remote" for backend in backends):
+            return "OCR not available - no valid API key"
+        return "OCR not available - tesseract not found"
+    
+    fallback = None
+    error = None
+    for backend in runnable:
+        try:
+            logger.info(f"Sending image to {backend.name} OCR: {label}")
+            with stage_timer(f"ocr_{backend.name}", timings):
+                result = await backend.recognize(image_bytes, label)
+        except Exception as e:
+            logger.error(f"OCR failed on {backend.name} engine: {str(e)}")
+            error = e
+            continue
+        confidence = f"{result.confidence:.2f}" if result.confidence is not None else "n/a"
+        logger.info(f"OCR extracted {len(result.text)} characters ({backend.name}, confidence {confidence})")
+        if backend is not runnable[-1] and needs_escalation(result):
+            logger.info(f"Escalating {label} from {backend.name} OCR (confidence {confidence})")
+            fallback = result
+            continue
+        if cache is not None:
+            try:
+                await asyncio.to_thread(cache.put, make_cache_key(image_bytes, backend.settings), result.text)
+            except Exception as e:
+                logger.warning(f"OCR cache store failed: {e}")
+        return result.text
+    
+    if fallback is not None:
+        return fallback.text
+    return f"OCR failed: {str(error)}"
+
+def process_ocr(image):
+    """Process OCR on an image (bytes or path) and return extracted text"""
+    return run_sync(process_ocr_async(image))
+
+def process_ocr_many(images, timings=None):
+    """OCR several images (bytes or paths) concurrently; returns the texts in the same order"""
+    async def ocr_one(image):
+        return await process_ocr_async(image, timings=timings)
+    return run_sync(gather_ocr(ocr_one, images))
+
+def process_row_bands(image_path, coordinates, bands, margin_ratio=0.10, scale=2.0, ctx=None, label=None, timings=None):
+    """OCR horizontal bands of a table crop again at a higher resolution
+
+    Args:
+        image_path: Path of the image (used when ctx is None)
+        coordinates: Table box the original OCR text was read from
+        bands: [(top, bottom), ...] as fractions of the table crop's height
+        margin_ratio: Margin of the original crop, so the fractions line up with its text
+        scale: Upscaling factor of each band before it is encoded
+        timings: Optional dict that receives the per-engine OCR time
+
+    Returns:
+        list: OCR text per band (None for a band that could not be cut), in order
+    """
+    if ctx is not None:
+        table = _crop_with_margin(ctx.rgb_pil, coordinates, margin_ratio)
+    else:
+        with Image.open(image_path) as img:
+            table = _crop_with_margin(img, coordinates, margin_ratio)
+
+    pending = []
+    for top, bottom in bands:
+        y1, y2 = int(top * table.height), int(round(bottom * table.height))
+        if y2 - y1 < 2 or table.width < 2:
+            pending.append(None)
+            continue
+        band = table.crop((0, y1, table.width, y2))
+        band = band.resize((round(band.width * scale), round(band.height * scale)), Image.LANCZOS)
+        pending.append(encode_crop(band))
+
+    async def ocr_band(item):
+        index, crop = item
+        return await process_ocr_async(crop, label=f"{label or 'table'} row band {index}", timings=timings)
+
+    items = [(i, crop) for i, crop in enumerate(pending) if crop is not None]
+    texts = [None] * len(pending)
+    for (i, _), text in zip(items, run_sync(gather_ocr(ocr_band, items))):
+        if "OCR not available" not in text and "OCR failed" not in text:
+            texts[i] = text
+    return texts
+
+def _write_table_text(output_dir, filename, table_kind, text):
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{filename}_{table_kind}.txt")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f"  Saved {table_kind} table to: {output_path}")
 
+def process_image_with_tables(image_path, json_path=None, ctx=None, detections=None, debug_dir=None, timings=None):
+    """OCR the best marks and information tables of one image
 
+    Args:
+        image_path: Path of the image (used for naming, and for cropping when ctx is None)
+        json_path: Detection result JSON file; only read when detections is not given
+        ctx: Optional ImageContext to crop from
+        detections: Detection result dict (as built by MarksheetProcessor)
+        debug_dir: When set, OCR text files are also written there as {stem}_{marks|info}.txt
+        timings: Optional dict that receives the OCR latency of each crop as
+            "ocr_marks" / "ocr_info" (seconds; the two run concurrently) and
+            the time spent in each engine as "ocr_local" / "ocr_remote"
 
-def process_image_with_tables(image_path, json_path):
-    """Process a single image with its corresponding JSON file"""
+    Returns:
+        dict: {"marks": text or None, "info": text or None}
+
+    Crops are JPEG-encoded in memory and sent to the OCR API concurrently.
+    """
     print(f"Processing: {os.path.basename(image_path)}")
     
-    # Load JSON data
-    with open(json_path, 'r') as f:
-        data = json.load(f)
+    if detections is None:
+        # Load JSON data
+        with open(json_path, 'r') as f:
+            detections = json.load(f)
     
     # Get filename without extension
     filename = os.path.splitext(os.path.basename(image_path))[0]
     
     # Extract table coordinates
-    tables = data["table_detection"]["table_coordinates"]
+    tables = detections["table_detection"]["table_coordinates"]
     
     # Get tables with maximum confidence for each type
     marks_table = get_max_confidence_table(tables, "Marks Table")
     info_table = get_max_confidence_table(tables, "Information Table")
     
-    # Process Marks Table
-    if marks_table:
-        print(f"  Processing Marks Table (confidence: {marks_table['confidence']:.3f})")
-        cropped_img = crop_table_from_image(image_path, marks_table["coordinates"], margin_ratio=0.10)
-        temp_file = save_cropped_image(cropped_img, filename, "marks")
-        
-        try:
-            marks_text = process_ocr(temp_file)
-            marks_output_path = os.path.join(results_dir, f"{filename}_marks.txt")
-            with open(marks_output_path, 'w', encoding='utf-8') as f:
-                f.write(marks_text)
-            if "OCR not available" in marks_text or "OCR failed" in marks_text:
-                print(f"  Warning: {marks_text}")
-            else:
-                print(f"  Saved marks table to: {marks_output_path}")
-        except Exception as e:
-            print(f"  Error processing marks table: {e}")
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+    texts = {"marks": None, "info": None}
+    if not marks_table and not info_table:
+        print(f"  No tables found in {filename}")
+        return texts
     
-    # Process Information Table
-    if info_table:
-        print(f"  Processing Information Table (confidence: {info_table['confidence']:.3f})")
-        cropped_img = crop_table_from_image(image_path, info_table["coordinates"], margin_ratio=0.15)
-        temp_file = save_cropped_image(cropped_img, filename, "info")
-        
+    # Crop and encode every table first, then OCR them together
+    pending = []
+    for table_kind, table, label, margin in (
+        ("marks", marks_table, "Marks Table", 0.10),
+        ("info", info_table, "Information Table", 0.15),
+    ):
+        if not table:
+            continue
+        print(f"  Processing {label} (confidence: {table['confidence']:.3f})")
         try:
-            info_text = process_ocr(temp_file)
-            info_output_path = os.path.join(results_dir, f"{filename}_info.txt")
-            with open(info_output_path, 'w', encoding='utf-8') as f:
-                f.write(info_text)
-            if "OCR not available" in info_text or "OCR failed" in info_text:
-                print(f"  Warning: {info_text}")
-            else:
-                print(f"  Saved info table to: {info_output_path}")
+            cropped_img = crop_table_from_image(image_path, table["coordinates"], margin_ratio=margin, ctx=ctx)
+            pending.append((table_kind, encode_crop(cropped_img)))
         except Exception as e:
-            print(f"  Error processing info table: {e}")
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            print(f"  Error processing {table_kind} table: {e}")
     
-    if not marks_table and not info_table:
-        print(f"  No tables found in {filename}")
+    async def ocr_table(item):
+        table_kind, crop = item
+        with stage_timer(f"ocr_{table_kind}", timings):
+            return await process_ocr_async(crop, label=f"{filename} {table_kind} table", timings=timings)
+    
+    results = run_sync(gather_ocr(ocr_table, pending))
+    for (table_kind, _), text in zip(pending, results):
+        texts[table_kind] = text
+        if "OCR not available" in text or "OCR failed" in text:
+            print(f"  Warning: {text}")
+        if debug_dir:
+            try:
+                _write_table_text(debug_dir, filename, table_kind, text)
+            except Exception as e:
+                print(f"  Error saving {table_kind} table text: {e}")
+    return texts
 
 def list_available_images():
     """List all available images in the inputs folder"""
@@ -241,7 +390,7 @@ def process_single_image(image_path, json_path):
     """Process a single image"""
     print(f"Processing: {os.path.basename(image_path)}")
     try:
-        process_image_with_tables(image_path, json_path)
+        process_image_with_tables(image_path, json_path, debug_dir=results_dir)
         print("Processing completed successfully!")
     except Exception as e:
         print(f"Error processing {image_path}: {e}")
@@ -283,7 +432,7 @@ def main():
             for i, (image_path, json_path) in enumerate(image_files, 1):
                 print(f"[{i}/{len(image_files)}] Processing: {os.path.basename(image_path)}")
                 try:
-                    process_image_with_tables(image_path, json_path)
+                    process_image_with_tables(image_path, json_path, debug_dir=results_dir)
                 except Exception as e:
                     print(f"Error processing {image_path}: {e}")
                 print("-" * 30)
@@ -0,0 +1,213 @@
+"""
+OCR engines behind scripts/ocr.process_ocr_async.
+
+Each backend takes encoded image bytes and returns an OCRText (text plus a
+0-1 confidence when the engine reports one):
+
+    RemoteBackend     LLMWhisperer over HTTP (multi-second, paid, layout text)
+    TesseractBackend  local Tesseract CLI on a bounded set of subprocesses
+
+OCR_ENGINE selects the routing policy:
+    remote   LLMWhisperer only (default, the previous behaviour)
+    local    Tesseract only; no network access, e.g. for offline tests
+    auto     Tesseract first, escalating to LLMWhisperer when the local text is
+             shorter than OCR_LOCAL_MIN_CHARS or its confidence is below
+             OCR_LOCAL_MIN_CONFIDENCE
+
+The extractors read layout text, where columns stay aligned as they were on
+the page. Tesseract's word boxes (TSV output) are therefore laid out again
+into rows and character columns rather than used as plain reading-order text.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+OCR_ENGINE = os.getenv("OCR_ENGINE", "remote").strip().lower()
+LOCAL_MIN_CONFIDENCE = float(os.getenv("OCR_LOCAL_MIN_CONFIDENCE", "0.80"))
+LOCAL_MIN_CHARS = int(os.getenv("OCR_LOCAL_MIN_CHARS", "20"))
+
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "eng")
+# 6: one uniform block of text, which suits a cropped table
+TESSERACT_PSM = os.getenv("TESSERACT_PSM", "6")
+TESSERACT_TIMEOUT = float(os.getenv("TESSERACT_TIMEOUT", "30"))
+# Concurrent tesseract processes per OCR worker; each runs single-threaded
+TESSERACT_MAX_PROCS = max(1, int(os.getenv("TESSERACT_MAX_PROCS", "2")))
+
+ENGINES = ("remote", "local", "auto")
+
+
+class OCRText:
+    """Recognized text of one image and the engine's confidence (None if unknown)"""
+
+    def __init__(self, text, confidence=None, engine=None):
+        self.text = text
+        self.confidence = confidence
+        self.engine = engine
+
+
+class RemoteBackend:
+    """LLMWhisperer API through the async polling client"""
+
+    name = "remote"
+
+    def __init__(self, client, base_url):
+        self.client = client
+        self.base_url = base_url
+
+    @property
+    def available(self):
+        return self.client is not None
+
+    @property
+    def settings(self):
+        # Unchanged from before the backends existed, so cached results stay valid
+        return {"engine": "llmwhisperer", "base_url": self.base_url}
+
+    async def recognize(self, image_bytes, label=None):
+        try:
+            from scripts.ocr_client import whisper_async
+        except ImportError:
+            from ocr_client import whisper_async
+        text = await whisper_async(self.client, stream=io.BytesIO(image_bytes))
+        return OCRText(text, None, self.name)
+
+
+def _words_from_tsv(tsv):
+    """Word rows of `tesseract ... tsv` output as dicts (conf -1 rows are dropped)"""
+    lines = tsv.splitlines()
+    if not lines:
+        return []
+    header = lines[0].split("\t")
+    words = []
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if len(fields) != len(header):
+            continue
+        row = dict(zip(header, fields))
+        text = row.get("text", "").strip()
+        try:
+            conf = float(row["conf"])
+        except (KeyError, ValueError):
+            continue
+        if not text or conf < 0:
+            continue
+        words.append({
+            "text": text,
+            "conf": conf,
+            "left": int(row["left"]),
+            "top": int(row["top"]),
+            "width": int(row["width"]),
+            "height": int(row["height"]),
+        })
+    return words
+
+
+def layout_text(words):
+    """
+    Lay word boxes out as text rows with their horizontal positions kept.
+
+    Words whose vertical centres are within half a line height form one row
+    (across Tesseract's blocks, so table cells stay on their row). Each word starts
+    at the character column of its left edge, with at least one space between words.
+    """
+    if not words:
+        return ""
+    char_width = statistics.median(w["width"] / len(w["text"]) for w in words) or 1.0
+    line_height = statistics.median(w["height"] for w in words) or 1.0
+
+    rows = []
+    for word in sorted(words, key=lambda w: w["top"] + w["height"] / 2):
+        centre = word["top"] + word["height"] / 2
+        if rows and abs(centre - rows[-1]["centre"]) <= line_height / 2:
+            rows[-1]["words"].append(word)
+        else:
+            rows.append({"centre": centre, "words": [word]})
+
+    origin = min(w["left"] for w in words)
+    out = []
+    for row in rows:
+        line = ""
+        for word in sorted(row["words"], key=lambda w: w["left"]):
+            column = int(round((word["left"] - origin) / char_width))
+            if line:
+                column = max(column, len(line) + 1)
+            line = line.ljust(column) + word["text"]
+        out.append(line)
+    return "\n".join(out)
+
+
+def text_confidence(words):
+    """Character-weighted mean word confidence in 0-1, or None without words"""
+    chars = sum(len(w["text"]) for w in words)
+    if not chars:
+        return None
+    return sum(w["conf"] * len(w["text"]) for w in words) / chars / 100.0
+
+
+class TesseractBackend:
+    """Tesseract CLI; at most TESSERACT_MAX_PROCS processes run at once in this process"""
+
+    name = "local"
+
+    def __init__(self, cmd=TESSERACT_CMD, lang=TESSERACT_LANG, psm=TESSERACT_PSM,
+                 max_procs=TESSERACT_MAX_PROCS, timeout=TESSERACT_TIMEOUT):
+        self.cmd = cmd
+        self.lang = lang
+        self.psm = str(psm)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_procs)
+        self._path = shutil.which(cmd)
+        # Parallelism comes from several processes, not from OpenMP inside each
+        self._env = {**os.environ, "OMP_THREAD_LIMIT": "1"}
+
+    @property
+    def available(self):
+        return self._path is not None
+
+    @property
+    def settings(self):
+        return {"engine": "tesseract", "lang": self.lang, "psm": self.psm}
+
+    def _run(self, image_bytes):
+        with self._slots:
+            completed = subprocess.run(
+                [self._path, "stdin", "stdout", "-l", self.lang, "--psm", self.psm, "tsv"],
+                input=image_bytes, capture_output=True, timeout=self.timeout, env=self._env,
+            )
+        if completed.returncode != 0:
+            raise RuntimeError(f"tesseract exited with {completed.returncode}: "
+                               f"{completed.stderr.decode('utf-8', 'replace').strip()[:200]}")
+        return completed.stdout.decode("utf-8", "replace")
+
+    async def recognize(self, image_bytes, label=None):
+        words = _words_from_tsv(await asyncio.to_thread(self._run, image_bytes))
+        return OCRText(layout_text(words), text_confidence(words), self.name)
+
+
+def route(remote, local, engine=None):
+    """Backends to try in order for the OCR_ENGINE policy"""
+    engine = (engine or OCR_ENGINE).lower()
+    if engine not in ENGINES:
+        logger.warning(f"Unknown OCR_ENGINE {engine!r}, using remote")
+        engine = "remote"
+    if engine == "local":
+        return [local]
+    if engine == "auto":
+        return [local, remote]
+    return [remote]
+
+
+def needs_escalation(result):
+    """True when a local result is too short or too uncertain to keep"""
+    if len(result.text.strip()) < LOCAL_MIN_CHARS:
+        return True
+    return result.confidence is not None and result.confidence < LOCAL_MIN_CONFIDENCE
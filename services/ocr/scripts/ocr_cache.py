@@ -0,0 +1,119 @@
+"""
+Content-addressed cache for OCR results.
+
+Entries are keyed by a SHA-256 of the cropped image bytes plus the OCR settings
+that affect the output, and stored in a local SQLite file. When the stored text
+exceeds the size budget the least recently used entries are evicted. A student
+re-uploading the same marksheet therefore gets the earlier OCR text back in
+milliseconds instead of paying for another remote OCR round trip.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+backend_dir = Path(__file__).resolve().parent.parent
+
+CACHE_ENABLED = os.getenv("OCR_CACHE", "1").strip().lower() not in ("0", "false", "no")
+CACHE_PATH = os.getenv("OCR_CACHE_PATH", str(backend_dir / "processed" / "ocr_cache.sqlite3"))
+CACHE_MAX_BYTES = int(float(os.getenv("OCR_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+def make_cache_key(image_bytes: bytes, settings: dict) -> str:
+    """SHA-256 over the OCR settings (canonical JSON) followed by the image bytes"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """SQLite-backed OCR text cache with size-based LRU eviction"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # Several worker processes may share the file: WAL plus a busy timeout
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                cache_key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_access ON ocr_cache (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        """Cached text for key (refreshing its LRU position), or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM ocr_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE ocr_cache SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, text: str):
+        """Store text under key and evict least recently used entries over the size budget"""
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO ocr_cache (cache_key, text, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, text, size, now, now))
+            self._evict()
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes}
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT cache_key, size FROM ocr_cache ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM ocr_cache WHERE cache_key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"OCR cache evicted {evicted} entries (now {total} bytes)")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide OCRCache, or None when caching is disabled or unavailable"""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = OCRCache()
+                except Exception as e:
+                    logger.warning(f"OCR cache unavailable: {e}")
+                    return None
+    return _cache
@@ -0,0 +1,156 @@
+"""
+Asynchronous layer over the LLMWhisperer client.
+
+The SDK client is synchronous, so each HTTP call runs in a worker thread while
+the waiting happens on the event loop. Status polling starts with a short delay
+and backs off exponentially up to a cap, under an overall deadline, instead of
+sleeping a fixed 5 seconds per poll. Several crops can be submitted at once
+with gather_ocr(), and cancelling the awaiting task stops polling immediately.
+The number of jobs in flight at the remote service can be capped per process
+(OCR_MAX_INFLIGHT) or across processes with set_inflight_limit().
+
+Point OCR_BASE_URL at a local stub server to exercise this without the paid API.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+POLL_INITIAL_DELAY = float(os.getenv("OCR_POLL_INITIAL_DELAY", "0.5"))
+POLL_MAX_DELAY = float(os.getenv("OCR_POLL_MAX_DELAY", "4.0"))
+POLL_BACKOFF = float(os.getenv("OCR_POLL_BACKOFF", "1.6"))
+OCR_DEADLINE_SECONDS = float(os.getenv("OCR_DEADLINE_SECONDS", "120"))
+# Maximum whisper jobs submitted and not yet retrieved (0 = unlimited)
+OCR_MAX_INFLIGHT = int(os.getenv("OCR_MAX_INFLIGHT", "0"))
+SLOT_POLL_INTERVAL = 0.05
+
+FAILED_STATUSES = ("error", "failed")
+
+
+class OCRTimeoutError(Exception):
+    """Raised when a whisper job is not processed before the deadline"""
+
+
+class OCRJobError(Exception):
+    """Raised when the OCR service reports a failed whisper job"""
+
+
+_inflight = threading.BoundedSemaphore(OCR_MAX_INFLIGHT) if OCR_MAX_INFLIGHT > 0 else None
+
+
+def set_inflight_limit(semaphore):
+    """
+    Replace the in-flight limiter, e.g. with a multiprocessing.BoundedSemaphore
+    shared by every worker of a batch run (None removes the limit).
+    """
+    global _inflight
+    _inflight = semaphore
+
+
+async def _acquire_slot(semaphore, loop, give_up_at):
+    # Non-blocking attempts keep cancellation safe: a slot is never taken by a
+    # thread that nobody is waiting for any more
+    while not semaphore.acquire(False):
+        if loop.time() >= give_up_at:
+            raise OCRTimeoutError("No OCR slot became free before the deadline")
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+
+
+async def whisper_async(client, file_path=None, stream=None,
+                        deadline=OCR_DEADLINE_SECONDS,
+                        initial_delay=POLL_INITIAL_DELAY,
+                        max_delay=POLL_MAX_DELAY,
+                        backoff=POLL_BACKOFF):
+    """
+    Submit one image and wait for its extracted text.
+
+    Args:
+        client: LLMWhispererClientV2 (or any object with the same whisper* methods)
+        file_path: Path of the image to OCR
+        stream: Binary file-like object with the encoded image (used instead of file_path)
+        deadline: Seconds allowed for submit + polling + retrieval
+        initial_delay: First delay between status polls
+        max_delay: Upper bound for the delay between polls
+        backoff: Multiplier applied to the delay after each poll
+
+    Returns:
+        str: Extracted text
+    """
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + deadline
+
+    semaphore = _inflight
+    if semaphore is None:
+        return await _whisper(client, file_path, stream, loop, give_up_at, deadline, initial_delay, max_delay, backoff)
+    await _acquire_slot(semaphore, loop, give_up_at)
+    try:
+        return await _whisper(client, file_path, stream, loop, give_up_at, deadline, initial_delay, max_delay, backoff)
+    finally:
+        semaphore.release()
+
+
+async def _whisper(client, file_path, stream, loop, give_up_at, deadline, initial_delay, max_delay, backoff):
+    if stream is not None:
+        submitted = await asyncio.to_thread(client.whisper, stream=stream)
+    else:
+        submitted = await asyncio.to_thread(client.whisper, file_path=file_path)
+    whisper_hash = submitted['whisper_hash']
+    logger.info(f"OCR job submitted: {whisper_hash}")
+
+    delay = initial_delay
+    polls = 0
+    while True:
+        status = await asyncio.to_thread(client.whisper_status, whisper_hash=whisper_hash)
+        polls += 1
+        state = status.get('status')
+        logger.debug(f"OCR status ({whisper_hash}): {state}")
+        if state == 'processed':
+            break
+        if state in FAILED_STATUSES:
+            raise OCRJobError(f"OCR job {whisper_hash} failed: {status.get('message', state)}")
+
+        remaining = give_up_at - loop.time()
+        if remaining <= 0:
+            raise OCRTimeoutError(f"OCR job {whisper_hash} not processed after {deadline:.0f}s ({polls} polls)")
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * backoff, max_delay)
+
+    retrieved = await asyncio.to_thread(client.whisper_retrieve, whisper_hash=whisper_hash)
+    logger.info(f"OCR job {whisper_hash} processed after {polls} polls")
+    return retrieved['extraction']['result_text']
+
+
+async def gather_ocr(ocr_one, items):
+    """Run ocr_one(item) for every item concurrently and return results in order"""
+    return list(await asyncio.gather(*(ocr_one(item) for item in items)))
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+
+    Uses asyncio.run() normally; when the calling thread already runs an event
+    loop (e.g. inside an async handler) the coroutine runs on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    outcome = {}
+
+    def runner():
+        try:
+            outcome["value"] = asyncio.run(coro)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=runner, name="ocr-run-sync")
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["value"]
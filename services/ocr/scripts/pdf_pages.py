@@ -0,0 +1,97 @@
+"""
+PDF page rasterization for the marksheet pipeline.
+
+Pages are rendered straight into numpy arrays (no intermediate JPEG) at an
+adaptive resolution: a scanned page is rendered at the native resolution of
+its embedded scan, since anything higher only interpolates pixels, and a
+digital page with vector text at PDF_TEXT_DPI, where text is already sharp.
+Both are kept within [PDF_MIN_DPI, PDF_MAX_DPI]. An A4 page at 300 DPI is a
+~25 MB RGB buffer; at 200 DPI it is ~11 MB.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+PDF_MIN_DPI = int(os.getenv("PDF_MIN_DPI", "150"))
+PDF_MAX_DPI = int(os.getenv("PDF_MAX_DPI", "300"))
+PDF_TEXT_DPI = int(os.getenv("PDF_TEXT_DPI", "200"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "12"))
+
+# An embedded image covering at least this share of the page is treated as the page scan
+SCAN_COVERAGE = 0.5
+
+
+def page_count(pdf_path) -> int:
+    """Number of pages in a PDF"""
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def choose_dpi(page) -> int:
+    """
+    Rendering resolution for one PyMuPDF page.
+
+    Returns the native resolution of the largest embedded scan covering the
+    page, or PDF_TEXT_DPI for pages without one, clamped to the DPI limits.
+    """
+    page_area = page.rect.width * page.rect.height
+    native_dpi = 0.0
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        width_pt, height_pt = x1 - x0, y1 - y0
+        if width_pt <= 0 or height_pt <= 0 or width_pt * height_pt < SCAN_COVERAGE * page_area:
+            continue
+        # Points are 1/72 inch; the longer side is the least affected by rounding
+        if width_pt >= height_pt:
+            native_dpi = max(native_dpi, info["width"] * 72.0 / width_pt)
+        else:
+            native_dpi = max(native_dpi, info["height"] * 72.0 / height_pt)
+
+    dpi = native_dpi if native_dpi > 0 else PDF_TEXT_DPI
+    return int(min(PDF_MAX_DPI, max(PDF_MIN_DPI, round(dpi))))
+
+
+def rasterize_page(pdf_path, page_index=0, dpi=None):
+    """
+    Render one page into a BGR image held in memory.
+
+    Args:
+        pdf_path: Path of the PDF
+        page_index: Zero-based page number
+        dpi: Fixed resolution; None picks one with choose_dpi()
+
+    Returns:
+        tuple: (BGR numpy image, dpi used)
+    """
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        if page_index >= doc.page_count:
+            raise ValueError(f"PDF has {doc.page_count} pages, page {page_index + 1} requested")
+        page = doc.load_page(page_index)
+        if dpi is None:
+            dpi = choose_dpi(page)
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+        rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride // pix.n, pix.n)[:, :pix.width]
+        # cvtColor copies, so the pixmap buffer can be released right away
+        image = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        del pix
+    return image, dpi
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python pdf_pages.py <pdf_path> [output_dir]")
+        sys.exit(1)
+
+    pdf_path = sys.argv[1]
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "."
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    for index in range(min(page_count(pdf_path), PDF_MAX_PAGES)):
+        image, dpi = rasterize_page(pdf_path, index)
+        out_path = os.path.join(output_dir, f"{stem}_p{index + 1}.jpg")
+        cv2.imwrite(out_path, image)
+        print(f"Page {index + 1}: {image.shape[1]}x{image.shape[0]} at {dpi} DPI -> {out_path}")
@@ -1,13 +1,16 @@
 """Table Detection Inference Script"""
 import os
 import torch
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from PIL import Image, ImageOps
 from transformers import AutoImageProcessor, TableTransformerForObjectDetection
 import numpy as np
 import argparse
 
+try:
+    from scripts.model_registry import get_table_model
+except ImportError:
+    from model_registry import get_table_model
+
 def load_model(model_path="models\tt_finetuned"):
     """Load the fine-tuned model or use pretrained model"""
     print(f"Loading model from: {model_path}")
@@ -25,15 +28,73 @@ def load_model(model_path="models\tt_finetuned"):
     
     return processor, model
 
-def detect_tables(image_path, processor, model, confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, fix_orientation=True):
-    """Detect tables in an image"""
+def _decode_threshold(confidence_threshold, info_threshold, marks_threshold):
+    """Use the minimum of thresholds for initial decoding, then filter per-class"""
+    decode_threshold = confidence_threshold
+    if info_threshold is not None:
+        decode_threshold = min(decode_threshold, info_threshold)
+    if marks_threshold is not None:
+        decode_threshold = min(decode_threshold, marks_threshold)
+    return decode_threshold
+
+def _filter_by_class(results, confidence_threshold, info_threshold, marks_threshold):
+    """Optional per-class thresholding of one post-processed result"""
+    if info_threshold is None and marks_threshold is None:
+        return results
+    scores = results["scores"]
+    labels = results["labels"]
+    boxes = results["boxes"]
+
+    keep_indices = []
+    for i in range(len(scores)):
+        label_id = labels[i].item()
+        score_val = scores[i].item()
+        thr = info_threshold if label_id == 0 else marks_threshold if label_id == 1 else confidence_threshold
+        if thr is None:
+            thr = confidence_threshold
+        if score_val >= thr:
+            keep_indices.append(i)
+
+    if len(keep_indices) == len(scores):
+        return results
+    idx = torch.tensor(keep_indices, dtype=torch.long)
+    return {
+        "scores": scores.index_select(0, idx),
+        "labels": labels.index_select(0, idx),
+        "boxes": boxes.index_select(0, idx),
+    }
+
+def _boxes_with_labels_and_scores(results, scale=1.0):
+    """Plain ([x0, y0, x1, y1], label_id, score) tuples, boxes multiplied by scale"""
+    boxes_with_labels_and_scores = []
+    for score, label, box in zip(results["scores"], results["labels"], results["boxes"]):
+        x0, y0, x1, y1 = (v * scale for v in box.tolist())
+        boxes_with_labels_and_scores.append(([x0, y0, x1, y1], label.item(), score.item()))
+    return boxes_with_labels_and_scores
+
+def _proxy_scale(ctx):
+    """Factor from detection-proxy to full-resolution coordinates"""
+    return ctx.proxy_scale if ctx is not None else 1.0
+
+def detect_tables(image_path, processor, model, confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, fix_orientation=True, ctx=None):
+    """
+    Detect tables in an image (ctx: optional ImageContext with the decoded image, already EXIF-oriented).
+    
+    With a ctx the model sees its downscaled detection proxy, and the returned
+    image and boxes are in proxy coordinates (multiply by ctx.proxy_scale).
+    """
     print(f"Processing image: {image_path}")
     
-    # Load and preprocess image
-    image = Image.open(image_path)
-    if fix_orientation:
-        image = ImageOps.exif_transpose(image)
-    image = image.convert("RGB")
+    if ctx is not None:
+        # The processor resizes to ~800px anyway; starting from the proxy skips
+        # resampling a 12-48 MP phone capture
+        image = ctx.proxy_rgb_pil
+    else:
+        # Load and preprocess image
+        image = Image.open(image_path)
+        if fix_orientation:
+            image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
     
     # Process image
     inputs = processor(images=image, return_tensors="pt")
@@ -44,67 +105,67 @@ def detect_tables(image_path, processor, model, confidence_threshold=0.5, info_t
     
     # Post-process results
     target_sizes = torch.tensor([image.size[::-1]])  # [height, width]
-    # Use the minimum of thresholds for initial decoding, then filter per-class below
-    decode_threshold = confidence_threshold
-    if info_threshold is not None:
-        decode_threshold = min(decode_threshold, info_threshold)
-    if marks_threshold is not None:
-        decode_threshold = min(decode_threshold, marks_threshold)
-
     results = processor.post_process_object_detection(
         outputs, 
         target_sizes=target_sizes, 
-        threshold=decode_threshold
+        threshold=_decode_threshold(confidence_threshold, info_threshold, marks_threshold)
     )[0]
-
-    # Optional per-class thresholding
-    if info_threshold is not None or marks_threshold is not None:
-        scores = results["scores"]
-        labels = results["labels"]
-        boxes = results["boxes"]
-
-        keep_indices = []
-        for i in range(len(scores)):
-            label_id = labels[i].item()
-            score_val = scores[i].item()
-            thr = info_threshold if label_id == 0 else marks_threshold if label_id == 1 else confidence_threshold
-            if thr is None:
-                thr = confidence_threshold
-            if score_val >= thr:
-                keep_indices.append(i)
-
-        if len(keep_indices) != len(scores):
-            idx = torch.tensor(keep_indices, dtype=torch.long)
-            results = {
-                "scores": scores.index_select(0, idx),
-                "labels": labels.index_select(0, idx),
-                "boxes": boxes.index_select(0, idx),
-            }
+    results = _filter_by_class(results, confidence_threshold, info_threshold, marks_threshold)
     
     return image, results
 
-def detect_tables_with_boxes_and_scores(image_path, model_path="models\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, fix_orientation=True):
-    """Detect tables in an image and return bounding boxes with confidence scores"""
-    processor, model = load_model(model_path)
-    image, results = detect_tables(image_path, processor, model, confidence_threshold, info_threshold, marks_threshold, fix_orientation)
+def detect_tables_with_boxes_and_scores(image_path, model_path="models\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, fix_orientation=True, ctx=None):
+    """Detect tables in an image and return full-resolution bounding boxes with confidence scores"""
+    processor, model = get_table_model(model_path)
+    image, results = detect_tables(image_path, processor, model, confidence_threshold, info_threshold, marks_threshold, fix_orientation, ctx=ctx)
+    return _boxes_with_labels_and_scores(results, _proxy_scale(ctx))
+
+def detect_tables_many(images, processor, model, confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, scales=None):
+    """
+    Detect tables on several RGB PIL images in one padded forward pass.
+    
+    The processor pads the batch to its largest image and passes a pixel_mask
+    so the model ignores the padding. Returns one
+    [([x0, y0, x1, y1], label_id, score), ...] list per image, in input order.
+    scales optionally maps each image's boxes back to full resolution
+    (ImageContext.proxy_scale when the images are detection proxies).
+    """
+    if not images:
+        return []
+    inputs = processor(images=list(images), return_tensors="pt")
     
-    boxes_with_labels_and_scores = []
-    for i, (score, label, box) in enumerate(zip(results["scores"], results["labels"], results["boxes"])):
-        x0, y0, x1, y1 = box.tolist()
-        label_id = label.item()
-        confidence_score = score.item()
-        boxes_with_labels_and_scores.append(([x0, y0, x1, y1], label_id, confidence_score))
+    with torch.no_grad():
+        outputs = model(**inputs)
     
-    return boxes_with_labels_and_scores
+    target_sizes = torch.tensor([image.size[::-1] for image in images])  # [height, width]
+    batch_results = processor.post_process_object_detection(
+        outputs,
+        target_sizes=target_sizes,
+        threshold=_decode_threshold(confidence_threshold, info_threshold, marks_threshold)
+    )
+    if scales is None:
+        scales = [1.0] * len(images)
+    return [
+        _boxes_with_labels_and_scores(_filter_by_class(results, confidence_threshold, info_threshold, marks_threshold), scale)
+        for results, scale in zip(batch_results, scales)
+    ]
 
-def detect_tables_with_boxes(image_path, model_path="models\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, fix_orientation=True):
-    """Detect tables in an image and return bounding boxes"""
-    processor, model = load_model(model_path)
-    image, results = detect_tables(image_path, processor, model, confidence_threshold, info_threshold, marks_threshold, fix_orientation)
+def detect_tables_with_boxes_and_scores_many(images, model_path="models\\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, scales=None):
+    """detect_tables_many() with the configured table model, same thresholds as detect_tables_with_boxes_and_scores"""
+    if not images:
+        return []
+    processor, model = get_table_model(model_path)
+    return detect_tables_many(images, processor, model, confidence_threshold, info_threshold, marks_threshold, scales)
+
+def detect_tables_with_boxes(image_path, model_path="models\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, fix_orientation=True, ctx=None):
+    """Detect tables in an image and return full-resolution bounding boxes"""
+    processor, model = get_table_model(model_path)
+    image, results = detect_tables(image_path, processor, model, confidence_threshold, info_threshold, marks_threshold, fix_orientation, ctx=ctx)
+    scale = _proxy_scale(ctx)
     
     boxes_with_labels = []
     for i, (score, label, box) in enumerate(zip(results["scores"], results["labels"], results["boxes"])):
-        x0, y0, x1, y1 = box.tolist()
+        x0, y0, x1, y1 = (v * scale for v in box.tolist())
         label_id = label.item()
         boxes_with_labels.append(([x0, y0, x1, y1], label_id))
     
@@ -112,6 +173,9 @@ def detect_tables_with_boxes(image_path, model_path="models\tt_finetuned", confi
 
 def visualize_results(image, results, save_path=None, show_plot=False):
     """Visualize detection results"""
+    # matplotlib is only needed here; importing it at module level slows every worker start
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
     fig, ax = plt.subplots(1, 1, figsize=(12, 8))
     ax.imshow(image)
     ax.set_title("Table Detection Results", fontsize=16)
@@ -160,10 +224,10 @@ def visualize_results(image, results, save_path=None, show_plot=False):
     
     return fig
 
-def process_single_image(image_path, model_path="models\\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, save_results=True, fix_orientation=True):
+def process_single_image(image_path, model_path="models\\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, save_results=True, fix_orientation=True, ctx=None):
     """Process a single image"""
-    # Load model
-    processor, model = load_model(model_path)
+    # Reuse the process-wide model
+    processor, model = get_table_model(model_path)
     
     # Detect tables
     image, results = detect_tables(
@@ -172,6 +236,7 @@ def process_single_image(image_path, model_path="models\\tt_finetuned", confiden
         info_threshold=info_threshold,
         marks_threshold=marks_threshold,
         fix_orientation=fix_orientation,
+        ctx=ctx,
     )
     
     # Print results
@@ -203,8 +268,8 @@ def process_single_image(image_path, model_path="models\\tt_finetuned", confiden
 
 def process_batch_images(image_dir, model_path="models\tt_finetuned", confidence_threshold=0.5, info_threshold=0.5, marks_threshold=0.8, fix_orientation=True):
     """Process all images in a directory"""
-    # Load model
-    processor, model = load_model(model_path)
+    # Reuse the process-wide model
+    processor, model = get_table_model(model_path)
     
     # Get all image files
     image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
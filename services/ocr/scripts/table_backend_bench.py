@@ -0,0 +1,172 @@
+"""
+Latency and detection parity of the table detector backends.
+
+Every sample marksheet goes through eager PyTorch (the reference) and each
+requested backend with the thresholds the pipeline uses. Images are the
+detection proxies the pipeline feeds the model (ImageContext.proxy_rgb_pil).
+A backend is at parity on an image when it finds the same number of tables and each
+reference table has a same-label match with IoU >= --iou and a score within
+--score-tol.
+
+batch.py runs the detector on padded batches of proxies instead
+(predict_table.detect_tables_with_boxes_and_scores_many), where a pixel_mask
+hides the padding. Every backend, torch included, also runs the images
+through detect_tables_many() in batches of --batch-size. Those detections are
+checked against the single-image torch reference in the "batched" column, and
+the batch forward pass is timed per image.
+
+Usage:
+    python scripts/table_backend_bench.py samples/                      # torch vs onnx, onnx:int8
+    python scripts/table_backend_bench.py samples/ --backends torchscript,torchscript:int8
+    python scripts/table_backend_bench.py a.jpg b.jpg --iterations 20 --threads 2
+    python scripts/table_backend_bench.py samples/ --batch-size 4
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+try:
+    from scripts.image_context import ImageContext
+    from scripts.predict_table import _boxes_with_labels_and_scores, detect_tables, detect_tables_many
+    from scripts.table_backends import load_table_backend
+except ImportError:
+    from image_context import ImageContext
+    from predict_table import _boxes_with_labels_and_scores, detect_tables, detect_tables_many
+    from table_backends import load_table_backend
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+def collect_images(paths):
+    images = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            images.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES))
+        else:
+            images.append(path)
+    return images
+
+
+def iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def at_parity(reference, candidate, min_iou, score_tol):
+    """True when candidate holds the same tables as reference within tolerance"""
+    if len(reference) != len(candidate):
+        return False
+    unused = list(candidate)
+    for box, label, score in reference:
+        matches = [c for c in unused if c[1] == label and iou(box, c[0]) >= min_iou and abs(score - c[2]) <= score_tol]
+        if not matches:
+            return False
+        unused.remove(max(matches, key=lambda c: iou(box, c[0])))
+    return True
+
+
+def run_backend(spec, model_path, samples, iterations, batch_size):
+    """
+    Timings and detections for one backend, or None when it is unavailable.
+
+    Returns:
+        tuple: (single-image latencies in ms, detections per image,
+                batched latencies in ms per image, batched detections per image)
+    """
+    backend, _, variant = spec.partition(":")
+    processor, model = load_table_backend(model_path, backend=backend, quantized=(variant == "int8"))
+    if getattr(model, "backend", "torch") != backend:
+        return None
+
+    latencies = []
+    detections = []
+    for path, ctx in samples:
+        inputs = processor(images=ctx.proxy_rgb_pil, return_tensors="pt")
+        with torch.no_grad():
+            model(**inputs)  # warm-up pass, not timed
+            for _ in range(iterations):
+                started = time.perf_counter()
+                model(**inputs)
+                latencies.append((time.perf_counter() - started) * 1000)
+        _, results = detect_tables(str(path), processor, model, ctx=ctx)
+        detections.append(_boxes_with_labels_and_scores(results))
+
+    batched_latencies = []
+    batched = []
+    for start in range(0, len(samples), batch_size):
+        images = [ctx.proxy_rgb_pil for _, ctx in samples[start:start + batch_size]]
+        # Padded to the largest image, with a pixel_mask over the padding
+        inputs = processor(images=images, return_tensors="pt")
+        with torch.no_grad():
+            model(**inputs)  # warm-up pass, not timed
+            for _ in range(iterations):
+                started = time.perf_counter()
+                model(**inputs)
+                batched_latencies.append((time.perf_counter() - started) * 1000 / len(images))
+        batched.extend(detect_tables_many(images, processor, model))
+    return latencies, detections, batched_latencies, batched
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare table detector backends against eager PyTorch")
+    parser.add_argument("images", nargs="+", help="Marksheet images or directories of them")
+    parser.add_argument("--model", type=str, default="models\\tt_finetuned", help="Hugging Face model directory")
+    parser.add_argument("--backends", type=str, default="onnx,onnx:int8",
+                        help="Comma-separated backends to compare (onnx, onnx:int8, torchscript, torchscript:int8)")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed forward passes per image")
+    parser.add_argument("--threads", type=int, default=0, help="torch/ORT intra-op threads (0 keeps the default)")
+    parser.add_argument("--iou", type=float, default=0.95, help="Minimum IoU for a matching table")
+    parser.add_argument("--score-tol", type=float, default=0.02, help="Maximum score difference for a matching table")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per padded batch in the batched pass")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    paths = collect_images(args.images)
+    if not paths:
+        print("No images found")
+        sys.exit(1)
+    samples = [(path, ImageContext.from_path(path)) for path in paths]
+
+    batch_size = max(1, args.batch_size)
+    reference = run_backend("torch", args.model, samples, args.iterations, batch_size)
+    results = {"torch": reference}
+    for spec in [s.strip() for s in args.backends.split(",") if s.strip()]:
+        results[spec] = run_backend(spec, args.model, samples, args.iterations, batch_size)
+
+    base_p50 = statistics.median(reference[0])
+    print(f"{len(samples)} images, {args.iterations} timed passes each, batches of {batch_size}, "
+          f"{torch.get_num_threads()} threads\n")
+    print(f"{'backend':<20}{'p50 ms':>10}{'p95 ms':>10}{'speedup':>10}{'parity':>12}"
+          f"{'batch ms/img':>14}{'batched':>10}")
+    for spec, outcome in results.items():
+        if outcome is None:
+            print(f"{spec:<20}{'unavailable (export it or install its runtime)':>42}")
+            continue
+        latencies, detections, batched_latencies, batched = outcome
+        p50 = statistics.median(latencies)
+        same = sum(at_parity(ref, det, args.iou, args.score_tol) for ref, det in zip(reference[1], detections))
+        same_batched = sum(at_parity(ref, det, args.iou, args.score_tol) for ref, det in zip(reference[1], batched))
+        print(f"{spec:<20}{p50:>10.1f}{percentile(latencies, 0.95):>10.1f}{base_p50 / p50:>9.2f}x{f'{same}/{len(samples)}':>12}"
+              f"{statistics.median(batched_latencies):>14.1f}{f'{same_batched}/{len(samples)}':>10}")
+        for (path, _), ref, det, det_batched in zip(samples, reference[1], detections, batched):
+            if spec != "torch" and not at_parity(ref, det, args.iou, args.score_tol):
+                print(f"    {path.name}: torch {[(round(s, 3), l) for _, l, s in ref]} vs {[(round(s, 3), l) for _, l, s in det]}")
+            if not at_parity(ref, det_batched, args.iou, args.score_tol):
+                print(f"    {path.name} (batched): torch {[(round(s, 3), l) for _, l, s in ref]} vs {[(round(s, 3), l) for _, l, s in det_batched]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Inference backends for the Table Transformer table detector.
+
+TABLE_BACKEND selects how model(**inputs) runs behind get_table_model():
+    torch         eager PyTorch from models/tt_finetuned (default)
+    onnx          ONNX Runtime on the CPU execution provider
+    torchscript   a traced TorchScript module
+
+The onnx and torchscript backends load artifacts written by
+scripts/export_table_model.py into the model directory (table.onnx,
+table.int8.onnx, table.ts, table.int8.ts). TABLE_QUANTIZED=1 picks the
+dynamically int8-quantized variant. Every backend returns outputs with .logits and .pred_boxes
+tensors, so the image processor's post_process_object_detection and all callers
+in predict_table stay unchanged. When the configured artifact or runtime is
+missing the detector falls back to eager PyTorch with a warning.
+
+onnxruntime is optional (pip install onnxruntime) and only imported for
+TABLE_BACKEND=onnx.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+TABLE_BACKEND = os.getenv("TABLE_BACKEND", "torch").strip().lower()
+TABLE_QUANTIZED = os.getenv("TABLE_QUANTIZED", "0").strip().lower() in ("1", "true", "yes")
+# Intra-op threads for ONNX Runtime; 0 follows torch.get_num_threads() (set per pool worker)
+TABLE_THREADS = int(os.getenv("TABLE_THREADS", "0"))
+
+BACKENDS = ("torch", "onnx", "torchscript")
+ARTIFACTS = {
+    ("onnx", False): "table.onnx",
+    ("onnx", True): "table.int8.onnx",
+    ("torchscript", False): "table.ts",
+    ("torchscript", True): "table.int8.ts",
+}
+INPUT_NAMES = ("pixel_values", "pixel_mask")
+OUTPUT_NAMES = ("logits", "pred_boxes")
+
+
+def artifact_path(model_path, backend, quantized=False):
+    """Where export_table_model.py writes (and the backend reads) an artifact"""
+    return Path(model_path) / ARTIFACTS[(backend, quantized)]
+
+
+class TableOutputs:
+    """The two fields of TableTransformerObjectDetectionOutput the post-processing reads"""
+
+    def __init__(self, logits, pred_boxes):
+        self.logits = logits
+        self.pred_boxes = pred_boxes
+
+
+class OnnxTableModel:
+    """ONNX Runtime session called like the Hugging Face model"""
+
+    backend = "onnx"
+
+    def __init__(self, onnx_path, threads=None):
+        import onnxruntime as ort
+        import torch
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Pool workers already split the cores between them
+        options.intra_op_num_threads = threads or TABLE_THREADS or torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        self.path = str(onnx_path)
+        self.session = ort.InferenceSession(self.path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def eval(self):
+        return self
+
+    def __call__(self, pixel_values, pixel_mask=None, **kwargs):
+        import numpy as np
+        import torch
+
+        feeds = {"pixel_values": pixel_values.cpu().numpy().astype(np.float32)}
+        if "pixel_mask" in self._inputs:
+            if pixel_mask is None:
+                pixel_mask = torch.ones(pixel_values.shape[0], *pixel_values.shape[2:], dtype=torch.long)
+            feeds["pixel_mask"] = pixel_mask.cpu().numpy().astype(np.int64)
+        logits, pred_boxes = self.session.run(list(OUTPUT_NAMES), feeds)
+        return TableOutputs(torch.from_numpy(logits), torch.from_numpy(pred_boxes))
+
+
+class TorchScriptTableModel:
+    """Traced TorchScript module called like the Hugging Face model"""
+
+    backend = "torchscript"
+
+    def __init__(self, ts_path):
+        import torch
+        self.path = str(ts_path)
+        self.module = torch.jit.load(self.path, map_location="cpu")
+        self.module.eval()
+
+    def eval(self):
+        return self
+
+    def __call__(self, pixel_values, pixel_mask=None, **kwargs):
+        import torch
+        if pixel_mask is None:
+            pixel_mask = torch.ones(pixel_values.shape[0], *pixel_values.shape[2:], dtype=torch.long)
+        logits, pred_boxes = self.module(pixel_values, pixel_mask)
+        return TableOutputs(logits, pred_boxes)
+
+
+def load_table_backend(model_path="models\\tt_finetuned", backend=None, quantized=None):
+    """
+    (image processor, model) for the table detector on the configured backend.
+
+    Args:
+        model_path: Hugging Face model directory (also holds the exported artifacts)
+        backend: "torch", "onnx" or "torchscript" (None reads TABLE_BACKEND)
+        quantized: Use the int8 artifact (None reads TABLE_QUANTIZED)
+    """
+    try:
+        from scripts.predict_table import load_model
+    except ImportError:
+        from predict_table import load_model
+
+    backend = (backend or TABLE_BACKEND).lower()
+    quantized = TABLE_QUANTIZED if quantized is None else quantized
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown TABLE_BACKEND {backend!r}, using torch")
+        backend = "torch"
+
+    if backend != "torch":
+        path = artifact_path(model_path, backend, quantized)
+        try:
+            from transformers import AutoImageProcessor
+            if not path.exists():
+                raise FileNotFoundError(f"{path} not found (run scripts/export_table_model.py)")
+            model = OnnxTableModel(path) if backend == "onnx" else TorchScriptTableModel(path)
+            processor = AutoImageProcessor.from_pretrained(str(model_path))
+            logger.info(f"Table detector running on {backend} ({path.name})")
+            return processor, model
+        except Exception as e:
+            logger.warning(f"Table backend {backend} unavailable, falling back to torch: {e}")
+
+    processor, model = load_model(str(model_path))
+    model.eval()
+    return processor, model
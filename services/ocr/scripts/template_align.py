@@ -0,0 +1,319 @@
+"""
+Template registration for fixed-format (college) marksheets.
+
+The fixed-format boxes are normalized coordinates on a reference scan of the
+marksheet (COLLEGE_TEMPLATE_PATH). Instead of cutting them straight out of a
+skewed or loosely cropped phone photo, ORB features of the photo are matched
+to the template's. A RANSAC homography is estimated from the matches, and each
+box is warped out of the full-resolution photo as an upright crop. Features
+are computed on images of at most ALIGN_MAX_SIDE pixels, which takes tens of
+milliseconds on a CPU. The template's keypoints are computed once per process.
+
+An alignment is rejected when there are too few matches or inliers, or when
+the template page maps onto an implausible quad. In that case the caller
+rejects the upload before any crop is sent to the paid OCR API.
+
+The template is built from a known-good scan with
+scripts/build_college_template.py. self_check() warps the template by a known
+homography, registers the result the way aligned_crops() does (features on
+the detection proxy, crops from the full-resolution image) and measures how
+far the recovered page and box crops are from the truth.
+
+Usage:
+    python scripts/template_align.py <template> <photo> [output_dir]
+    python scripts/template_align.py --self-check [template]
+"""
+
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+try:
+    from scripts.image_context import ImageContext
+except ImportError:
+    from image_context import ImageContext
+
+logger = logging.getLogger(__name__)
+
+COLLEGE_TEMPLATE_PATH = os.getenv("COLLEGE_TEMPLATE_PATH", os.path.join("data", "templates", "college_marksheet.jpg"))
+ALIGN_MAX_SIDE = int(os.getenv("ALIGN_MAX_SIDE", "1000"))
+ORB_FEATURES = int(os.getenv("ALIGN_ORB_FEATURES", "2000"))
+
+# Lowe ratio test and RANSAC settings (reprojection error in aligned pixels)
+RATIO_TEST = 0.75
+RANSAC_REPROJ_THRESHOLD = 4.0
+MIN_MATCHES = 30
+MIN_INLIERS = 25
+MIN_INLIER_RATIO = 0.25
+# Share of the photo the template page may cover once projected into it
+MIN_PAGE_AREA = 0.15
+MAX_PAGE_AREA = 1.6
+
+# self_check(): the synthetic photo is the template enlarged, rotated and
+# keystoned. It passes when the page corners land within the corner error
+# (share of the page diagonal) and the box crops differ from the template's
+# own crops by at most the crop diff (mean grey levels).
+SELF_CHECK_PHOTO_SCALE = 2.5
+SELF_CHECK_ROTATION_DEG = 6.0
+SELF_CHECK_KEYSTONE = 0.08
+SELF_CHECK_MAX_CORNER_ERROR = 0.005
+SELF_CHECK_MAX_CROP_DIFF = 15.0
+
+_lock = threading.Lock()
+_templates = {}
+
+
+class AlignmentError(ValueError):
+    """Raised when a photo cannot be registered to the template"""
+
+    def __init__(self, message, alignment=None):
+        super().__init__(message)
+        self.alignment = alignment or {}
+
+
+def _downscale(gray, max_side=ALIGN_MAX_SIDE):
+    """(image no larger than max_side, factor from it back to the input)"""
+    height, width = gray.shape[:2]
+    longest = max(height, width)
+    if longest <= max_side:
+        return gray, 1.0
+    scale = max_side / longest
+    small = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    return small, longest / max_side
+
+
+def _features(gray):
+    orb = cv2.ORB_create(nfeatures=ORB_FEATURES)
+    return orb.detectAndCompute(gray, None)
+
+
+class Template:
+    """Reference page: size plus ORB keypoints/descriptors at alignment resolution"""
+
+    def __init__(self, path):
+        gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise FileNotFoundError(f"Template not found: {path}")
+        self.path = str(path)
+        self.height, self.width = gray.shape[:2]
+        small, self.scale = _downscale(gray)
+        self.keypoints, self.descriptors = _features(small)
+        if self.descriptors is None or len(self.keypoints) < MIN_MATCHES:
+            raise ValueError(f"Template {path} has too little texture to align against")
+
+
+def get_template(path=COLLEGE_TEMPLATE_PATH):
+    """Cached Template for path, or None when no template image exists"""
+    key = str(path)
+    if key in _templates:
+        return _templates[key]
+    with _lock:
+        if key not in _templates:
+            template = None
+            if os.path.exists(key):
+                started = time.perf_counter()
+                template = Template(key)
+                logger.info(f"Loaded alignment template {key} ({len(template.keypoints)} keypoints) "
+                            f"in {time.perf_counter() - started:.2f}s")
+            else:
+                logger.info(f"No alignment template at {key}; fixed-format boxes are cut without alignment")
+            _templates[key] = template
+    return _templates[key]
+
+
+def _page_quad_ok(homography, template, image_shape):
+    """Projected template page must be a convex, upright-ish quad of plausible size"""
+    w, h = template.width, template.height
+    corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+    quad = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+    if not cv2.isContourConvex(quad.astype(np.float32)):
+        return False, "projected page is not convex"
+    area = cv2.contourArea(quad.astype(np.float32))
+    image_area = image_shape[0] * image_shape[1]
+    if not MIN_PAGE_AREA <= area / image_area <= MAX_PAGE_AREA:
+        return False, f"projected page covers {area / image_area:.0%} of the photo"
+    return True, None
+
+
+def align(gray, template):
+    """
+    Homography from template pixels to the pixels of a full-resolution grayscale photo.
+
+    Returns:
+        dict: {"homography": 3x3 array, "matches", "inliers", "ms"}
+
+    Raises:
+        AlignmentError: with the same summary (minus the homography) when rejected
+    """
+    started = time.perf_counter()
+    small, scale = _downscale(gray)
+    keypoints, descriptors = _features(small)
+    summary = {"matches": 0, "inliers": 0}
+
+    def reject(reason):
+        summary["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        summary["reason"] = reason
+        raise AlignmentError(f"Marksheet does not match the college template: {reason}", summary)
+
+    if descriptors is None or len(keypoints) < MIN_MATCHES:
+        reject("too little detail in the photo")
+
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    good = [pair[0] for pair in matcher.knnMatch(template.descriptors, descriptors, k=2)
+            if len(pair) == 2 and pair[0].distance < RATIO_TEST * pair[1].distance]
+    summary["matches"] = len(good)
+    if len(good) < MIN_MATCHES:
+        reject(f"only {len(good)} feature matches")
+
+    # Both point sets back in full-resolution pixels
+    src = np.float32([template.keypoints[m.queryIdx].pt for m in good]).reshape(-1, 1, 2) * template.scale
+    dst = np.float32([keypoints[m.trainIdx].pt for m in good]).reshape(-1, 1, 2) * scale
+    homography, mask = cv2.findHomography(src, dst, cv2.RANSAC, RANSAC_REPROJ_THRESHOLD * scale)
+    inliers = int(mask.sum()) if mask is not None else 0
+    summary["inliers"] = inliers
+    if homography is None or inliers < MIN_INLIERS or inliers < MIN_INLIER_RATIO * len(good):
+        reject(f"{inliers} of {len(good)} matches agree on one page position")
+
+    ok, reason = _page_quad_ok(homography, template, gray.shape)
+    if not ok:
+        reject(reason)
+
+    summary["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return {"homography": homography, **summary}
+
+
+def align_context(ctx, template):
+    """
+    align() on an ImageContext: features come from the detection proxy and the
+    returned homography maps template pixels to pixels of the full-resolution ctx.bgr.
+    """
+    alignment = align(ctx.proxy_gray, template)
+    scale = ctx.proxy_scale
+    alignment["homography"] = np.diag([scale, scale, 1.0]) @ alignment["homography"]
+    return alignment
+
+
+def warp_norm_box(image, homography, template, norm_box, margin_ratio=0.02):
+    """
+    Upright crop of a template box (normalized cx, cy, w, h) out of the photo.
+
+    The crop keeps roughly the photo's own resolution: one template pixel maps
+    to as many output pixels as the projected page edges span in the photo.
+    """
+    cx, cy, bw, bh = norm_box
+    x1 = (cx - bw / 2 * (1 + 2 * margin_ratio)) * template.width
+    y1 = (cy - bh / 2 * (1 + 2 * margin_ratio)) * template.height
+    region_w = bw * (1 + 2 * margin_ratio) * template.width
+    region_h = bh * (1 + 2 * margin_ratio) * template.height
+
+    corners = np.float32([[0, 0], [template.width, 0], [0, template.height]]).reshape(-1, 1, 2)
+    mapped = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+    zoom = max(np.linalg.norm(mapped[1] - mapped[0]) / template.width,
+               np.linalg.norm(mapped[2] - mapped[0]) / template.height)
+
+    out_w, out_h = max(1, int(round(region_w * zoom))), max(1, int(round(region_h * zoom)))
+    # Output pixel -> template pixel -> photo pixel
+    to_template = np.array([[1 / zoom, 0, x1], [0, 1 / zoom, y1], [0, 0, 1]], dtype=np.float64)
+    return cv2.warpPerspective(image, homography @ to_template, (out_w, out_h),
+                               flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255))
+
+
+def _synthetic_homography(width, height):
+    """(homography from template pixels into a synthetic photo, photo size)"""
+    scale = SELF_CHECK_PHOTO_SCALE
+    angle = np.deg2rad(SELF_CHECK_ROTATION_DEG)
+    # Keystone: the top edge shrinks as if the phone were tilted back
+    inset = SELF_CHECK_KEYSTONE * width / 2
+    src = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    dst = np.float32([[inset, 0], [width - inset, 0], [width, height], [0, height]]) * scale
+    rotation = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+    homography = rotation @ cv2.getPerspectiveTransform(src, dst)
+    corners = cv2.perspectiveTransform(src.reshape(-1, 1, 2), homography).reshape(-1, 2)
+    # Shift the page inside a photo with a background border around it
+    border = 0.08 * scale * max(width, height)
+    low = corners.min(axis=0)
+    shift = np.array([[1, 0, border - low[0]], [0, 1, border - low[1]], [0, 0, 1]])
+    size = corners.max(axis=0) - low + 2 * border
+    return shift @ homography, (int(size[0]), int(size[1]))
+
+
+def self_check(template, boxes=((0.5, 0.5, 1.0, 1.0),)):
+    """
+    Register a synthetically warped copy of the template image and compare the results.
+
+    Args:
+        template: Template whose image file is warped
+        boxes: Normalized (cx, cy, w, h) boxes whose crops are compared
+
+    Returns:
+        dict: {"ok", "inliers", "matches", "proxy_scale", "corner_error" (share of
+               the page diagonal), "crop_diff" (mean abs grey difference per box)}
+
+    Raises:
+        AlignmentError: The synthetic photo did not register at all
+    """
+    page = cv2.imread(template.path)
+    truth, size = _synthetic_homography(template.width, template.height)
+    photo = cv2.warpPerspective(page, truth, size, flags=cv2.INTER_CUBIC,
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=(90, 90, 90))
+    ctx = ImageContext(photo, source="self-check")
+    alignment = align_context(ctx, template)
+    homography = alignment["homography"]
+
+    w, h = template.width, template.height
+    corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+    found = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+    expected = cv2.perspectiveTransform(corners, truth).reshape(-1, 2)
+    # In template pixels, so the threshold does not depend on the photo size
+    corner_error = float(np.linalg.norm(found - expected, axis=1).max() / SELF_CHECK_PHOTO_SCALE / np.hypot(w, h))
+
+    page_gray = cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)
+    crop_diff = []
+    for box in boxes:
+        # No margin: past the page edge the photo shows background, the template white
+        crop = cv2.cvtColor(warp_norm_box(photo, homography, template, box, margin_ratio=0.0), cv2.COLOR_BGR2GRAY)
+        # The same box cut straight out of the template, at the crop's size
+        reference = warp_norm_box(page_gray, np.eye(3), template, box, margin_ratio=0.0)
+        reference = cv2.resize(reference, (crop.shape[1], crop.shape[0]), interpolation=cv2.INTER_AREA)
+        crop_diff.append(round(float(cv2.absdiff(crop, reference).mean()), 1))
+
+    return {
+        "ok": corner_error <= SELF_CHECK_MAX_CORNER_ERROR and max(crop_diff) <= SELF_CHECK_MAX_CROP_DIFF,
+        "inliers": alignment["inliers"],
+        "matches": alignment["matches"],
+        "proxy_scale": round(ctx.proxy_scale, 3),
+        "corner_error": round(corner_error, 5),
+        "crop_diff": crop_diff,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) >= 2 and sys.argv[1] == "--self-check":
+        template = Template(sys.argv[2] if len(sys.argv) > 2 else COLLEGE_TEMPLATE_PATH)
+        result = self_check(template)
+        print(f"{'OK' if result['ok'] else 'FAILED'}: {result}")
+        sys.exit(0 if result["ok"] else 1)
+    if len(sys.argv) < 3:
+        print("Usage: python template_align.py <template> <photo> [output_dir]")
+        print("       python template_align.py --self-check [template]")
+        sys.exit(1)
+    template = Template(sys.argv[1])
+    photo = cv2.imread(sys.argv[2])
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else "."
+    try:
+        result = align(cv2.cvtColor(photo, cv2.COLOR_BGR2GRAY), template)
+    except AlignmentError as e:
+        print(f"Rejected: {e} {e.alignment}")
+        sys.exit(2)
+    print(f"Aligned: {result['inliers']}/{result['matches']} inliers in {result['ms']} ms")
+    # The whole template page, warped upright
+    page = warp_norm_box(photo, result["homography"], template, (0.5, 0.5, 1.0, 1.0), margin_ratio=0.0)
+    out_path = os.path.join(output_dir, "aligned.jpg")
+    cv2.imwrite(out_path, page)
+    print(f"Wrote {out_path}")
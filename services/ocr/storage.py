@@ -0,0 +1,563 @@
+"""
+Upload storage and retention for the OCR API.
+
+Uploads are streamed into STORAGE_DIR/blobs/<aa>/<sha256><ext> and hashed as
+they are written. /process hands the raw request body to ingest_form(), which
+parses the multipart framing as it arrives instead of spooling the body first.
+The first chunk is sniffed for a JPEG, PNG, TIFF, BMP, WebP or PDF signature.
+Anything else is rejected before more of the body is read, and so is a body
+that grows past OCR_MAX_UPLOAD_MB. The blob extension comes from the sniffed
+format, not from the client's filename. The first two hex digits of the hash
+pick the subdirectory, so no single directory grows past a few thousand entries. An identical
+re-upload ends up at the same path and nothing new is stored.
+
+The display image that the UI loads from /uploads/<server_filename> is
+created with link_or_copy(). It is a hard link to the blob, a reflink where
+hard links are not possible, or a plain copy as a last resort. Hard links only
+work within one filesystem, so when uploads/ is its own volume STORAGE_DIR has
+to live on it as well. The compose file mounts one volume at /app/data and
+uses data/uploads and data/store. STORAGE_DIR must not be inside uploads/,
+which is served publicly. The display file stays valid after its blob is
+swept.
+
+RetentionSweeper runs in the API process. Each pass removes:
+    - partial uploads in STORAGE_DIR/tmp that were abandoned
+    - blobs that have not been uploaded again for OCR_BLOB_TTL_DAYS
+    - derived artifacts older than OCR_ARTIFACT_TTL_HOURS: processed/*.txt,
+      processed/*.json and processed/temp_*.jpg (OCR text, table coordinates,
+      extraction JSON, debug crops), *_preprocessed.jpg, *_annotated.jpg and
+      *_result.json; the OCR cache database (*.sqlite3*) is never touched
+    - further blobs and artifacts, oldest first, while the total is over
+      OCR_STORAGE_MAX_MB
+The marksheets table points at the display images, so they are only removed
+when OCR_DISPLAY_TTL_DAYS is set.
+
+Usage:
+    python storage.py [--dry-run]    # run one retention pass and print what it did
+"""
+
+import asyncio
+import datetime
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    # python-multipart before 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path(os.getenv("OCR_UPLOAD_DIR", "uploads"))
+STORAGE_DIR = Path(os.getenv("OCR_STORAGE_DIR", "storage"))
+PROCESSED_DIR = Path("processed")
+
+BLOB_TTL_DAYS = float(os.getenv("OCR_BLOB_TTL_DAYS", "7"))
+ARTIFACT_TTL_HOURS = float(os.getenv("OCR_ARTIFACT_TTL_HOURS", "24"))
+# 0 keeps display images forever (the marksheets table links to them)
+DISPLAY_TTL_DAYS = float(os.getenv("OCR_DISPLAY_TTL_DAYS", "0"))
+STORAGE_MAX_MB = float(os.getenv("OCR_STORAGE_MAX_MB", "10240"))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("OCR_RETENTION_INTERVAL_SECONDS", "600"))
+MAX_UPLOAD_MB = float(os.getenv("OCR_MAX_UPLOAD_MB", "25"))
+
+# Nothing younger than this is removed, so queued and running jobs keep their inputs
+MIN_AGE_SECONDS = 3600
+CHUNK_SIZE = 1024 * 1024
+# Bytes of a file part gathered before it is sniffed (PDF headers may sit anywhere in the first 1024)
+SNIFF_BYTES = 1024
+# Multipart framing and small form fields around the file itself
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+# (format, stored extension, signature test on the first bytes)
+SIGNATURES = (
+    ("jpeg", ".jpg", lambda head: head.startswith(b"\xff\xd8\xff")),
+    ("png", ".png", lambda head: head.startswith(b"\x89PNG\r\n\x1a\n")),
+    ("tiff", ".tif", lambda head: head[:4] in (b"II*\x00", b"MM\x00*")),
+    ("bmp", ".bmp", lambda head: head.startswith(b"BM")),
+    ("webp", ".webp", lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP"),
+    # PDF readers accept the header anywhere in the first 1024 bytes
+    ("pdf", ".pdf", lambda head: b"%PDF-" in head[:1024]),
+)
+
+# Debug and intermediate outputs the pipeline writes next to an upload
+UPLOAD_ARTIFACT_PATTERNS = ("*_preprocessed.jpg", "*_annotated.jpg", "*_result.json")
+# Outputs in processed/: OCR text, table coordinates, extraction JSON and debug crops.
+# processed/ also holds the OCR cache database (scripts/ocr_cache.py), which
+# workers keep open and which must never be swept.
+PROCESSED_ARTIFACT_PATTERNS = ("*.json", "*.txt", "temp_*.jpg")
+PROTECTED_PATTERNS = ("*.sqlite3*",)
+DISPLAY_PATTERN = "*_display.*"
+
+# Linux FICLONE ioctl: copy-on-write clone on btrfs, XFS and similar filesystems
+_FICLONE = 0x40049409
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_MB"""
+
+
+class UnsupportedUpload(Exception):
+    """Raised when an upload is neither an image format OpenCV reads nor a PDF"""
+
+
+class MalformedUpload(Exception):
+    """Raised when a request body is not a multipart form with the expected file field"""
+
+
+def sniff_format(head):
+    """(format, extension) from the leading bytes of a file, or None if unrecognized"""
+    for kind, extension, matches in SIGNATURES:
+        if matches(head):
+            return kind, extension
+    return None
+
+
+def upload_name(filename, suffix=None):
+    """Stored name of an upload: YYYYMMDD_HHMMSS_<sanitized stem><suffix>"""
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Sanitize original filename (alphanumeric, dots, dashes, underscores)
+    clean_name = "".join(c for c in Path(filename).stem if c.isalnum() or c in "._- ")[:30].replace(" ", "_")
+    if not clean_name:
+        clean_name = "upload"
+    return f"{timestamp}_{clean_name}{suffix if suffix is not None else Path(filename).suffix}"
+
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        try:
+            fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(dst)
+            raise
+
+
+def link_or_copy(src, dst):
+    """
+    Make dst a second name for src without duplicating its bytes where possible.
+
+    Tries a hard link, then a reflink, then falls back to a full copy.
+
+    Returns:
+        str: "link", "reflink" or "copy"
+    """
+    src, dst = Path(src), Path(dst)
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+        return "link"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+            raise
+    try:
+        _reflink(src, dst)
+        return "reflink"
+    except (ImportError, OSError):
+        pass
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class StoredUpload:
+    """A stored upload: the blob to process and the name it was uploaded as"""
+
+    def __init__(self, path, name, digest, size, duplicate, kind=None, data=None, filename=None):
+        self.path = path
+        self.name = name
+        # Name the client sent
+        self.filename = filename
+        self.digest = digest
+        self.size = size
+        self.duplicate = duplicate
+        self.kind = kind
+        # Raw bytes, only when ingest() was asked to keep them
+        self.data = data
+
+    @property
+    def is_pdf(self):
+        return self.kind == "pdf"
+
+
+class UploadStore:
+    """Content-addressed upload blobs plus the flat display directory served at /uploads"""
+
+    def __init__(self, upload_dir=UPLOAD_DIR, storage_dir=STORAGE_DIR, max_mb=MAX_UPLOAD_MB):
+        self.upload_dir = Path(upload_dir)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.storage_dir = Path(storage_dir)
+        self.blob_dir = self.storage_dir / "blobs"
+        self.tmp_dir = self.storage_dir / "tmp"
+        for directory in (self.upload_dir, self.blob_dir, self.tmp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, digest, suffix=""):
+        return self.blob_dir / digest[:2] / f"{digest}{suffix.lower()}"
+
+    def writer(self, filename, keep_bytes=False):
+        """UploadWriter that stores an upload chunk by chunk"""
+        return UploadWriter(self, filename, keep_bytes)
+
+    def ingest(self, fileobj, filename, keep_bytes=False):
+        """
+        Stream a file object into the store, checking its format and size on the way.
+
+        Args:
+            fileobj: Binary file object positioned at the start of the upload
+            filename: Name the client sent (only used to name the upload)
+            keep_bytes: Also return the raw bytes for an in-memory decode
+
+        Returns:
+            StoredUpload: path of the blob; duplicate is True when identical
+            bytes of the same format were already stored
+
+        Raises:
+            UnsupportedUpload: The first chunk matches no known signature
+            UploadTooLarge: The body grew past the size limit
+        """
+        writer = self.writer(filename, keep_bytes)
+        try:
+            chunk = fileobj.read(CHUNK_SIZE)
+            while chunk:
+                writer.write(chunk)
+                chunk = fileobj.read(CHUNK_SIZE)
+            return writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
+
+    async def ingest_form(self, stream, content_type, field="file", keep_bytes=False):
+        """
+        Store the file field of a multipart/form-data body while it is being received.
+
+        Nothing is spooled: the file part goes to an UploadWriter as the body
+        arrives, so an unsupported format is rejected after its first bytes and an
+        oversize body as soon as it passes the limit, with or without a
+        Content-Length. Disk writes run in a thread.
+
+        Args:
+            stream: Async iterator over the raw body chunks (Request.stream())
+            content_type: The request's Content-Type header, with the boundary
+            field: Form field holding the file; other fields are ignored
+            keep_bytes: Also return the raw bytes for an in-memory decode
+
+        Returns:
+            StoredUpload: as from ingest(), with filename set to the part's filename
+
+        Raises:
+            MalformedUpload: Not multipart/form-data, bad framing or no file in field
+            UnsupportedUpload: The file's first bytes match no known signature
+            UploadTooLarge: The file or the whole body grew past the size limit
+        """
+        ctype, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if ctype != b"multipart/form-data" or not boundary:
+            raise MalformedUpload("Expected a multipart/form-data body")
+
+        part = _FilePart(field)
+        parser = MultipartParser(boundary, part.callbacks())
+        writer = None
+        received = 0
+        try:
+            async for chunk in stream:
+                received += len(chunk)
+                if received > self.max_bytes + UPLOAD_OVERHEAD_BYTES:
+                    raise UploadTooLarge(f"Upload exceeds the {self.max_bytes / 1024 / 1024:g} MB limit")
+                try:
+                    parser.write(chunk)
+                except ValueError as e:
+                    raise MalformedUpload(f"Malformed multipart body: {e}")
+                if writer is None and part.filename is not None:
+                    writer = self.writer(part.filename, keep_bytes)
+                if writer is not None and part.pending_bytes and (
+                        part.complete or part.pending_bytes >= CHUNK_SIZE
+                        or (writer.kind is None and part.pending_bytes >= SNIFF_BYTES)):
+                    await asyncio.to_thread(writer.write, part.take())
+            try:
+                parser.finalize()
+            except ValueError as e:
+                raise MalformedUpload(f"Malformed multipart body: {e}")
+            if writer is None:
+                raise MalformedUpload(f"No file in form field '{field}'")
+            if not part.complete:
+                raise MalformedUpload("Body ended inside the file part")
+            if part.pending_bytes:
+                await asyncio.to_thread(writer.write, part.take())
+            return await asyncio.to_thread(writer.finish)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+
+    def discard(self, stored):
+        """Remove a blob stored by ingest() for an upload that was then rejected"""
+        if stored.duplicate:
+            return
+        try:
+            # Another upload may have linked it meanwhile
+            if stored.path.stat().st_nlink == 1:
+                stored.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class UploadWriter:
+    """
+    One upload being written into the store.
+
+    The first write is sniffed, so it has to hold at least SNIFF_BYTES unless
+    the upload is shorter. Call finish() once everything is written, or abort()
+    to drop the partial file after an error.
+    """
+
+    def __init__(self, store, filename, keep_bytes=False):
+        self.store = store
+        self.filename = filename
+        self.kind = None
+        self.extension = None
+        self.size = 0
+        self._sha = hashlib.sha256()
+        self._chunks = [] if keep_bytes else None
+        self._tmp_path = store.tmp_dir / f"{uuid.uuid4().hex}.part"
+        self._out = None
+
+    def write(self, chunk):
+        """
+        Raises:
+            UnsupportedUpload: The first chunk matches no known signature
+            UploadTooLarge: The upload grew past the size limit
+        """
+        if self.kind is None:
+            sniffed = sniff_format(chunk)
+            if sniffed is None:
+                raise UnsupportedUpload(f"{self.filename} is not a JPEG, PNG, TIFF, BMP, WebP image or a PDF")
+            self.kind, self.extension = sniffed
+            self._out = open(self._tmp_path, "wb")
+        self.size += len(chunk)
+        if self.size > self.store.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {self.store.max_bytes / 1024 / 1024:g} MB limit")
+        self._sha.update(chunk)
+        self._out.write(chunk)
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+
+    def finish(self):
+        """Move the written bytes to their blob path; returns a StoredUpload"""
+        if self.kind is None:
+            raise UnsupportedUpload(f"{self.filename} is empty")
+        try:
+            self._out.close()
+            digest = self._sha.hexdigest()
+            path = self.store.blob_path(digest, self.extension)
+            duplicate = path.exists()
+            if duplicate:
+                os.remove(self._tmp_path)
+                # The mtime records the last upload, which the blob TTL counts from
+                os.utime(path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(self._tmp_path, path)
+        except BaseException:
+            self.abort()
+            raise
+        if duplicate:
+            logger.info(f"Upload {self.filename} is a duplicate of {path.name} ({self.size} bytes not stored again)")
+        return StoredUpload(path, upload_name(self.filename, self.extension), digest, self.size, duplicate,
+                            self.kind, b"".join(self._chunks) if self._chunks is not None else None,
+                            filename=self.filename)
+
+    def abort(self):
+        if self._out is not None:
+            self._out.close()
+        if self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+
+class _FilePart:
+    """MultipartParser callbacks that collect the bytes of the first file in one form field"""
+
+    def __init__(self, field):
+        self.field = field.encode()
+        self.filename = None
+        self.complete = False
+        self.pending = []
+        self.pending_bytes = 0
+        self._headers = {}
+        self._name = []
+        self._value = []
+        self._capturing = False
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": lambda data, start, end: self._name.append(data[start:end]),
+            "on_header_value": lambda data, start, end: self._value.append(data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def take(self):
+        data = b"".join(self.pending)
+        self.pending = []
+        self.pending_bytes = 0
+        return data
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_end(self):
+        self._headers[b"".join(self._name).lower()] = b"".join(self._value)
+        self._name = []
+        self._value = []
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        filename = options.get(b"filename")
+        self._capturing = (self.filename is None and options.get(b"name") == self.field
+                           and filename is not None)
+        if self._capturing:
+            self.filename = filename.decode("utf-8", "replace")
+
+    def _part_data(self, data, start, end):
+        if self._capturing:
+            # The parser reuses its buffer, so the slice is copied
+            self.pending.append(bytes(data[start:end]))
+            self.pending_bytes += end - start
+
+    def _part_end(self):
+        if self._capturing:
+            self._capturing = False
+            self.complete = True
+
+
+class RetentionSweeper:
+    """Background thread that keeps uploads, blobs and derived files within their budgets"""
+
+    def __init__(self, store, processed_dir=PROCESSED_DIR, blob_ttl_days=BLOB_TTL_DAYS,
+                 artifact_ttl_hours=ARTIFACT_TTL_HOURS, display_ttl_days=DISPLAY_TTL_DAYS,
+                 max_mb=STORAGE_MAX_MB, interval_seconds=RETENTION_INTERVAL_SECONDS):
+        self.store = store
+        self.processed_dir = Path(processed_dir)
+        self.blob_ttl = blob_ttl_days * 86400
+        self.artifact_ttl = artifact_ttl_hours * 3600
+        self.display_ttl = display_ttl_days * 86400
+        self.max_bytes = max_mb * 1024 * 1024
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ocr-retention", daemon=True)
+        self._thread.start()
+        logger.info(f"Retention sweeper started (every {self.interval_seconds:g}s, budget {self.max_bytes / 1024 / 1024:.0f} MB)")
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def _files(self):
+        """[(kind, path, stat), ...] of everything the sweeper manages"""
+        files = []
+
+        def collect(kind, paths):
+            for path in paths:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if any(path.match(pattern) for pattern in PROTECTED_PATTERNS):
+                    continue
+                if path.is_file():
+                    files.append((kind, path, stat))
+
+        collect("tmp", self.store.tmp_dir.glob("*.part"))
+        collect("blob", self.store.blob_dir.glob("*/*"))
+        if self.processed_dir.exists():
+            for pattern in PROCESSED_ARTIFACT_PATTERNS:
+                collect("artifact", self.processed_dir.glob(pattern))
+        for pattern in UPLOAD_ARTIFACT_PATTERNS:
+            collect("artifact", self.store.upload_dir.glob(pattern))
+        if self.display_ttl:
+            collect("display", self.store.upload_dir.glob(DISPLAY_PATTERN))
+        return files
+
+    def sweep(self, dry_run=False):
+        """
+        Run one retention pass.
+
+        Returns:
+            dict: {"removed": files removed, "freed_mb": space released,
+                   "total_mb": managed size after the pass}
+        """
+        now = time.time()
+        ttls = {"tmp": MIN_AGE_SECONDS, "blob": self.blob_ttl,
+                "artifact": self.artifact_ttl, "display": self.display_ttl}
+        removed = 0
+        freed = 0
+        kept = []
+
+        def remove(path, stat):
+            nonlocal removed, freed
+            if not dry_run:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    return
+            removed += 1
+            # A hard-linked blob only releases space once its last name is gone
+            if stat.st_nlink == 1:
+                freed += stat.st_size
+
+        # Age budget
+        for kind, path, stat in self._files():
+            if now - stat.st_mtime > max(ttls[kind], MIN_AGE_SECONDS):
+                remove(path, stat)
+            else:
+                kept.append((kind, path, stat))
+
+        # Size budget: only files whose removal releases space count towards it
+        total = sum(stat.st_size for _, _, stat in kept if stat.st_nlink == 1)
+        if total > self.max_bytes:
+            for kind, path, stat in sorted(kept, key=lambda item: item[2].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                if kind == "display" or stat.st_nlink > 1 or now - stat.st_mtime < MIN_AGE_SECONDS:
+                    continue
+                remove(path, stat)
+                total -= stat.st_size
+            if total > self.max_bytes:
+                logger.warning(f"Storage still at {total / 1024 / 1024:.0f} MB after sweep (budget {self.max_bytes / 1024 / 1024:.0f} MB)")
+
+        if removed:
+            logger.info(f"Retention sweep removed {removed} files, freed {freed / 1024 / 1024:.1f} MB")
+        return {"removed": removed, "freed_mb": round(freed / 1024 / 1024, 1), "total_mb": round(total / 1024 / 1024, 1)}
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run one upload retention pass")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without deleting")
+    args = parser.parse_args()
+
+    os.chdir(Path(__file__).resolve().parent)
+    stats = RetentionSweeper(UploadStore()).sweep(dry_run=args.dry_run)
+    print(f"{'Would remove' if args.dry_run else 'Removed'} {stats['removed']} files, "
+          f"{stats['freed_mb']} MB freed, {stats['total_mb']} MB managed")